@@ -0,0 +1,42 @@
+import logging
+import itertools
+import pandas as pd
+from benchmarks.harness import register, time_function, summarize
+from benchmarks.bench_pipeline import FEATURE_COLUMNS, feature_frame, trained_model
+from src.modeling.cascade import CascadeModel, calibrate_rule
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def cascade_model(context):
+    """Return the trained forest behind a cascade whose rule is calibrated on the benchmark features, built once per run."""
+    if "cascade" not in context:
+        forest = trained_model(context)
+        features = feature_frame(context)[FEATURE_COLUMNS].head(context["batch_rows"])
+        context["cascade"] = CascadeModel(forest, rule=calibrate_rule(forest, features), registry=None)
+        stages = context["cascade"].score(features)[2]
+        logger.info(f"Cascade stage hits: rule {(stages == 0).mean():.1%}, early exit {(stages == 1).mean():.1%}, "
+                    f"full {(stages == 2).mean():.1%}.")
+    return context["cascade"]
+
+@register("scoring_single_row_cascade")
+def bench_scoring_single_row_cascade(context):
+    """Score one transaction per call through the rule-then-forest cascade, as api_integration.predict does."""
+    model = cascade_model(context)
+    records = feature_frame(context)[FEATURE_COLUMNS].head(context["single_row_calls"]).to_dict(orient="records")
+    records_iter = itertools.cycle(records)
+    timings = time_function(
+        lambda record: model.predict(pd.DataFrame([record])),
+        repeats=len(records),
+        setup=lambda: next(records_iter),
+    )
+    return summarize(timings, 1)
+
+@register("scoring_batch_cascade")
+def bench_scoring_batch_cascade(context):
+    """Score a whole batch through the cascade with one predict call."""
+    model = cascade_model(context)
+    batch = feature_frame(context)[FEATURE_COLUMNS].head(context["batch_rows"])
+    timings = time_function(lambda: model.predict(batch), repeats=context["repeats"])
+    return summarize(timings, len(batch))
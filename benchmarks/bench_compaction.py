@@ -0,0 +1,63 @@
+import logging
+import itertools
+import pandas as pd
+from benchmarks.harness import register, time_function, summarize
+from benchmarks.bench_pipeline import FEATURE_COLUMNS, feature_frame, trained_model
+from src.modeling.compact_model import CompactForest
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COMPACT_DEPTH = 10  # Depth cap of the pruned variant
+COMPACT_TREES = 10  # Trees kept in the pruned variant
+
+def compact_models(context):
+    """Return the trained forest flattened as-is and pruned to a depth cap and fewer trees, built once per run."""
+    if "compact_models" not in context:
+        forest = trained_model(context)
+        context["compact_models"] = {
+            "full": CompactForest(forest),
+            "pruned": CompactForest(forest, tree_indices=range(min(COMPACT_TREES, len(forest.estimators_))),
+                                    max_depth=COMPACT_DEPTH),
+        }
+    return context["compact_models"]
+
+def _bench_single_row(context, variant):
+    """Score one transaction per call through a CompactForest, as api_integration.predict does."""
+    model = compact_models(context)[variant]
+    records = feature_frame(context)[FEATURE_COLUMNS].head(context["single_row_calls"]).to_dict(orient="records")
+    records_iter = itertools.cycle(records)
+    timings = time_function(
+        lambda record: model.predict(pd.DataFrame([record])),
+        repeats=len(records),
+        setup=lambda: next(records_iter),
+    )
+    return summarize(timings, 1)
+
+def _bench_batch(context, variant):
+    """Score a whole batch of transactions with a single CompactForest predict call."""
+    model = compact_models(context)[variant]
+    batch = feature_frame(context)[FEATURE_COLUMNS].head(context["batch_rows"])
+    timings = time_function(lambda: model.predict(batch), repeats=context["repeats"])
+    return summarize(timings, len(batch))
+
+@register("scoring_single_row_compact_full")
+def bench_scoring_single_row_compact_full(context):
+    """Single-row scoring with every tree at full depth, flattened into float32 node arrays."""
+    return _bench_single_row(context, "full")
+
+@register("scoring_batch_compact_full")
+def bench_scoring_batch_compact_full(context):
+    """Batch scoring with every tree at full depth, flattened into float32 node arrays."""
+    return _bench_batch(context, "full")
+
+@register("scoring_single_row_compact_pruned")
+def bench_scoring_single_row_compact_pruned(context):
+    """Single-row scoring with a subset of the trees cut to a depth cap."""
+    return _bench_single_row(context, "pruned")
+
+@register("scoring_batch_compact_pruned")
+def bench_scoring_batch_compact_pruned(context):
+    """Batch scoring with a subset of the trees cut to a depth cap."""
+    return _bench_batch(context, "pruned")
@@ -0,0 +1,59 @@
+import logging
+import itertools
+from benchmarks.harness import register, time_function, summarize
+from benchmarks.bench_pipeline import FEATURE_COLUMNS, feature_frame, trained_model
+from src.monitoring.drift import DriftMonitor, build_baseline
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def drift_inputs(context):
+    """Return (baseline, scored frame, fraud scores) for the drift benchmarks, built once per run.
+
+    The baseline is built from the training rows and the scored frame is the next batch_rows rows,
+    with the raw merchant_id and currency added for the count-min sketches.
+    """
+    if "drift" not in context:
+        model = trained_model(context)
+        features = feature_frame(context)[FEATURE_COLUMNS]
+        frame = features.join(context["data"][["merchant_id", "currency"]])
+        train = frame.head(context["train_rows"])
+        scored = frame.iloc[context["train_rows"]:context["train_rows"] + context["batch_rows"]]
+        if scored.empty:
+            scored = frame.head(context["batch_rows"])
+        baseline = build_baseline(train, model.predict_proba(train[FEATURE_COLUMNS])[:, 1])
+        context["drift"] = (baseline, scored, model.predict_proba(scored[FEATURE_COLUMNS])[:, 1])
+    return context["drift"]
+
+@register("drift_update_single_row")
+def bench_drift_update_single_row(context):
+    """Add one scored request per call to the drift sketches, as the non-batched API and predict consumer do."""
+    baseline, scored, scores = drift_inputs(context)
+    monitor = DriftMonitor(baseline)
+    rows = scored.head(context["single_row_calls"]).to_dict(orient="records")
+    rows_iter = itertools.cycle(zip(rows, scores))
+    timings = time_function(
+        lambda row: monitor.update([row[0]], [row[1]], [0]),
+        repeats=len(rows),
+        setup=lambda: next(rows_iter),
+    )
+    return summarize(timings, 1)
+
+@register("drift_update_batch")
+def bench_drift_update_batch(context):
+    """Add a whole scored batch to the drift sketches with one update call, as the batcher does."""
+    baseline, scored, scores = drift_inputs(context)
+    monitor = DriftMonitor(baseline)
+    labels = (scores > 0.5).astype(int)
+    timings = time_function(lambda: monitor.update(scored, scores, labels), repeats=context["repeats"])
+    return summarize(timings, len(scored))
+
+@register("drift_report")
+def bench_drift_report(context):
+    """Compute PSI/KS for every feature and the fraud score from filled sketches, as each gauge refresh does."""
+    baseline, scored, scores = drift_inputs(context)
+    monitor = DriftMonitor(baseline)
+    monitor.update(scored, scores)
+    timings = time_function(monitor.report, repeats=context["repeats"])
+    return summarize(timings, 1)
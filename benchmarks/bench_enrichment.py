@@ -0,0 +1,62 @@
+import os
+import json
+import logging
+import numpy as np
+import pandas as pd
+from benchmarks.harness import register, time_function, summarize
+from src.processing.enrichment import EnrichmentCache, LocalSnapshotSource
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LONG_TAIL_USERS = 1000  # Users left out of the hot snapshot and served through the LRU
+RECORD_CALLS = 10000
+
+def reference_cache(context):
+    """Write merchant, user and FX snapshots for the synthetic events and load them once per run."""
+    if "enrichment" not in context:
+        events = pd.DataFrame.from_records(context["events"])
+        rng = np.random.default_rng(context["seed"])
+        directory = os.path.join(context["workdir"], "reference")
+        os.makedirs(os.path.join(directory, "users"), exist_ok=True)
+
+        merchants = pd.DataFrame({"merchant_id": events["merchant_id"].unique()})
+        merchants["merchant_category"] = rng.choice(["grocery", "electronics", "travel", "fuel"], size=len(merchants))
+        merchants["merchant_risk_score"] = rng.random(len(merchants)).round(3)
+        merchants.to_csv(os.path.join(directory, "merchants.csv"), index=False)
+
+        users = pd.DataFrame({"user_id": events["user_id"].unique()})
+        users["user_location"] = rng.choice(["US", "DE", "GB", "IN"], size=len(users))
+        users["user_device"] = rng.choice(["ios", "android", "web"], size=len(users))
+        users["previous_transactions"] = rng.integers(0, 500, size=len(users))
+        hot, tail = users.iloc[LONG_TAIL_USERS:], users.iloc[:LONG_TAIL_USERS]
+        hot.to_csv(os.path.join(directory, "users.csv"), index=False)
+        for record in tail.to_dict(orient="records"):
+            with open(os.path.join(directory, "users", f"{record['user_id']}.json"), "w") as user_file:
+                json.dump({key: (value.item() if hasattr(value, "item") else value) for key, value in record.items()}, user_file)
+
+        pd.DataFrame({"currency": ["USD", "EUR", "GBP", "INR", "JPY", "CAD"],
+                      "rate_to_usd": [1.0, 1.08, 1.27, 0.012, 0.0067, 0.73]}).to_csv(os.path.join(directory, "fx_rates.csv"), index=False)
+        cache = EnrichmentCache(LocalSnapshotSource(directory))
+        # Read the long-tail users into the LRU up front, as the background loader would
+        cache.enrich(events)
+        cache.load_long_tail()
+        context["enrichment"] = cache
+    return context["enrichment"]
+
+@register("enrichment_batch")
+def bench_enrichment_batch(context):
+    """Vectorized merchant/user/FX enrichment of a batch of events."""
+    cache = reference_cache(context)
+    frame = pd.DataFrame.from_records(context["events"])
+    timings = time_function(lambda: cache.enrich(frame), repeats=context["repeats"])
+    return summarize(timings, len(frame))
+
+@register("enrichment_single_record")
+def bench_enrichment_single_record(context):
+    """Enrichment of one event dict at a time, as done per request and per consumed event."""
+    cache = reference_cache(context)
+    records = context["events"][:RECORD_CALLS]
+    timings = time_function(lambda: [cache.enrich_record(record) for record in records], repeats=context["repeats"])
+    return summarize(timings, len(records))
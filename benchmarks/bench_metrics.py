@@ -0,0 +1,40 @@
+import logging
+from benchmarks.harness import register, time_function, summarize
+from src.monitoring.metrics import METRICS_SAMPLE_RATE, MetricsRegistry
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EVENTS_PER_RUN = 100000
+
+def _instrumented_events(registry, n_events):
+    """Simulate the instrumentation done per event by the consumers: counter, three stages, checkpoint."""
+    for _ in range(n_events):
+        timer = registry.start_event("bench")
+        with timer.stage("decode"):
+            pass
+        with timer.stage("model"):
+            pass
+        with timer.stage("checkpoint"):
+            pass
+        registry.inc("fraud_checkpoints_total", service="bench", partition="0")
+
+def _bench_overhead(context, sample_rate):
+    """Measure the per-event cost of instrumentation at the given sample rate."""
+    registry = MetricsRegistry(sample_rate=sample_rate)
+    timings = time_function(lambda: _instrumented_events(registry, EVENTS_PER_RUN), repeats=context["repeats"])
+    result = summarize(timings, EVENTS_PER_RUN)
+    result["sample_rate"] = sample_rate
+    result["overhead_per_event_us"] = result["median_s"] / EVENTS_PER_RUN * 1000000
+    return result
+
+@register("metrics_overhead_default_sampling")
+def bench_metrics_overhead_default(context):
+    """Instrumentation cost per event with the default sample rate."""
+    return _bench_overhead(context, METRICS_SAMPLE_RATE)
+
+@register("metrics_overhead_full_sampling")
+def bench_metrics_overhead_full(context):
+    """Instrumentation cost per event when every event is timed."""
+    return _bench_overhead(context, 1.0)
@@ -0,0 +1,123 @@
+import os
+import json
+import itertools
+import logging
+import pandas as pd
+from benchmarks.harness import register, time_function, summarize
+from benchmarks.synthetic_data import write_transactions
+from src.ingestion.local_storage import LocalBlobServiceClient
+from src.processing import data_transformation, feature_engineering
+from src.modeling import train_model
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CONTAINER_NAME = "fraud-events"
+FEATURE_COLUMNS = ["amount", "transaction_hour", "transaction_day", "transaction_month", "high_transaction"]
+
+def local_storage(context):
+    """Return the local blob storage stand-in, wiring it into the processing modules."""
+    if "storage" not in context:
+        storage = LocalBlobServiceClient(os.path.join(context["workdir"], "blob_storage"))
+        data_transformation.BLOB_SERVICE_CLIENT = storage
+        feature_engineering.BLOB_SERVICE_CLIENT = storage
+        train_model.BLOB_SERVICE_CLIENT = storage
+        context["storage"] = storage
+    return context["storage"]
+
+def with_transaction_date(data):
+    """Copy raw transactions, exposing 'timestamp' as the 'transaction_date' column the processing code expects."""
+    return data.rename(columns={"timestamp": "transaction_date"})
+
+def feature_frame(context):
+    """Return the numeric training frame built from the synthetic data, computed once per run."""
+    if "features" not in context:
+        features = feature_engineering.extract_features(with_transaction_date(context["data"]))
+        context["features"] = features[FEATURE_COLUMNS + ["is_fraud"]]
+    return context["features"]
+
+def trained_model(context):
+    """Return a model trained on the synthetic features, computed once per run."""
+    if "model" not in context:
+        context["model"] = train_model.train_model(feature_frame(context).head(context["train_rows"]))
+    return context["model"]
+
+@register("ingestion_decode_event_json")
+def bench_decode_event_json(context):
+    """Decode Event Hub style JSON bodies one by one, as the consumers' on_event handlers do."""
+    bodies = [json.dumps(record) for record in context["events"]]
+    timings = time_function(lambda: [json.loads(body) for body in bodies], repeats=context["repeats"])
+    return summarize(timings, len(bodies))
+
+def _bench_load_blob(context, extension):
+    """Load a synthetic transaction file through data_transformation.load_data_from_blob."""
+    storage = local_storage(context)
+    file_path = f"events/synthetic_transactions.{extension}"
+    local_path = os.path.join(storage.root, CONTAINER_NAME, file_path)
+    if not os.path.exists(local_path):
+        write_transactions(context["data"], local_path)
+
+    # load_data_from_blob downloads to the blob path relative to the working directory
+    os.makedirs(os.path.join(context["workdir"], "events"), exist_ok=True)
+    if data_transformation.load_data_from_blob(file_path) is None:
+        return {"skipped": f"load_data_from_blob could not decode .{extension} files"}
+    timings = time_function(lambda: data_transformation.load_data_from_blob(file_path), repeats=context["repeats"])
+    return summarize(timings, len(context["data"]))
+
+@register("ingestion_load_blob_csv")
+def bench_load_blob_csv(context):
+    """Download and decode a CSV transaction file from local blob storage."""
+    return _bench_load_blob(context, "csv")
+
+@register("ingestion_load_blob_json")
+def bench_load_blob_json(context):
+    """Download and decode a JSON transaction file from local blob storage."""
+    return _bench_load_blob(context, "json")
+
+@register("ingestion_load_blob_xml")
+def bench_load_blob_xml(context):
+    """Download and decode an XML transaction file from local blob storage."""
+    return _bench_load_blob(context, "xml")
+
+@register("processing_clean_and_transform_data")
+def bench_clean_and_transform_data(context):
+    """Run data_transformation.clean_and_transform_data on a fresh copy of the synthetic data."""
+    data = with_transaction_date(context["data"])
+    timings = time_function(data_transformation.clean_and_transform_data, repeats=context["repeats"], setup=data.copy)
+    return summarize(timings, len(data))
+
+@register("processing_extract_features")
+def bench_extract_features(context):
+    """Run feature_engineering.extract_features on a fresh copy of the synthetic data."""
+    data = with_transaction_date(context["data"])
+    timings = time_function(feature_engineering.extract_features, repeats=context["repeats"], setup=data.copy)
+    return summarize(timings, len(data))
+
+@register("modeling_train_model")
+def bench_train_model(context):
+    """Train the RandomForest fraud model with train_model.train_model."""
+    data = feature_frame(context).head(context["train_rows"])
+    timings = time_function(lambda: train_model.train_model(data), repeats=max(1, context["repeats"] // 2), warmup=0)
+    return summarize(timings, len(data))
+
+@register("scoring_single_row")
+def bench_scoring_single_row(context):
+    """Score one transaction per call, building a one-row DataFrame like api_integration.predict."""
+    model = trained_model(context)
+    records = feature_frame(context)[FEATURE_COLUMNS].head(context["single_row_calls"]).to_dict(orient="records")
+    records_iter = itertools.cycle(records)
+    timings = time_function(
+        lambda record: model.predict(pd.DataFrame([record])),
+        repeats=len(records),
+        setup=lambda: next(records_iter),
+    )
+    return summarize(timings, 1)
+
+@register("scoring_batch")
+def bench_scoring_batch(context):
+    """Score a whole batch of transactions with a single predict call."""
+    model = trained_model(context)
+    batch = feature_frame(context)[FEATURE_COLUMNS].head(context["batch_rows"])
+    timings = time_function(lambda: model.predict(batch), repeats=context["repeats"])
+    return summarize(timings, len(batch))
@@ -0,0 +1,40 @@
+import os
+import logging
+from benchmarks.harness import register, time_function, summarize
+from benchmarks.bench_pipeline import FEATURE_COLUMNS, feature_frame, trained_model
+from src.deployment.batching import score_frame
+from src.modeling.shadow import ShadowScorer
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def shadow_batch(context):
+    """Return a scored batch of batch_rows feature rows and the live model's (labels, scores) for it."""
+    model = trained_model(context)
+    batch = feature_frame(context)[FEATURE_COLUMNS].head(context["batch_rows"])
+    return model, batch, score_frame(model, batch)
+
+@register("shadow_submit")
+def bench_shadow_submit(context):
+    """Queue a scored batch for one candidate: the only shadow-scoring cost on the request path."""
+    model, batch, (labels, scores) = shadow_batch(context)
+    # Enough room that no batch is dropped while the candidate catches up
+    scorer = ShadowScorer([("candidate", model)], "bench", os.path.join(context["workdir"], "shadow_logs"),
+                          max_pending=context["repeats"] + 1)
+    try:
+        timings = time_function(lambda: scorer.submit(batch, labels, scores, 0.0, model.classes_), repeats=context["repeats"])
+    finally:
+        scorer.close()
+    return summarize(timings, len(batch))
+
+@register("shadow_candidate_batch")
+def bench_shadow_candidate_batch(context):
+    """Score and log a batch with one candidate on the shadow worker, including the columnar log append."""
+    model, batch, (labels, scores) = shadow_batch(context)
+    scorer = ShadowScorer([("candidate", model)], "bench", os.path.join(context["workdir"], "shadow_logs"))
+    try:
+        timings = time_function(lambda: scorer._score(batch, labels, scores, 0.0, model.classes_), repeats=context["repeats"])
+    finally:
+        scorer.close()
+    return summarize(timings, len(batch))
@@ -0,0 +1,65 @@
+import os
+import logging
+from benchmarks.harness import register, time_function, summarize
+from src.processing.sql_sink import SqlSink
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ROW_BY_ROW_ROWS = 2000  # Rows written one commit at a time; enough for a stable rate without dominating the run
+
+def sql_rows(context, name, n_rows=None):
+    """Return a fresh SQLite stand-in sink in the workdir and the (columns, rows) of n_rows transactions."""
+    sink = SqlSink(f"sqlite:///{os.path.join(context['workdir'], f'{name}.db')}")
+    sink.ensure_table()
+    columns, rows = sink.prepare(context["data"].head(n_rows or context["batch_rows"]))
+    return sink, columns, rows
+
+def reset_table(sink, payload):
+    """Empty the table so every repeat inserts rather than updates, and return the payload to write."""
+    with sink.pool.connection() as conn:
+        conn.execute(f'DELETE FROM "{sink.table}"')
+        conn.commit()
+    return payload
+
+@register("sql_upsert_batched")
+def bench_sql_upsert_batched(context):
+    """Upsert transactions through SqlSink.write: multi-row statements, one transaction per SQL_BATCH_ROWS rows."""
+    sink, _, _ = sql_rows(context, "batched")
+    frame = context["data"].head(context["batch_rows"])
+    try:
+        timings = time_function(sink.write, repeats=context["repeats"], setup=lambda: reset_table(sink, frame))
+    finally:
+        sink.close()
+    return summarize(timings, len(frame))
+
+@register("sql_upsert_row_by_row")
+def bench_sql_upsert_row_by_row(context):
+    """Upsert transactions one statement and one commit per row, the pattern the batched sink replaces."""
+    sink, columns, rows = sql_rows(context, "row_by_row", ROW_BY_ROW_ROWS)
+    statement = sink.dialect.upsert_sql(sink.table, columns, 1)
+
+    def write_rows(rows):
+        with sink.pool.connection() as conn:
+            for row in rows:
+                conn.execute(statement, row)
+                conn.commit()
+
+    try:
+        timings = time_function(write_rows, repeats=context["repeats"], setup=lambda: reset_table(sink, rows))
+    finally:
+        sink.close()
+    return summarize(timings, len(rows))
+
+@register("sql_upsert_existing_rows")
+def bench_sql_upsert_existing_rows(context):
+    """Re-write transactions that are already in the table, as a retried blob or re-run job does."""
+    sink, _, _ = sql_rows(context, "existing")
+    frame = context["data"].head(context["batch_rows"])
+    sink.write(frame)
+    try:
+        timings = time_function(lambda: sink.write(frame), repeats=context["repeats"])
+    finally:
+        sink.close()
+    return summarize(timings, len(frame))
@@ -0,0 +1,42 @@
+import logging
+import pandas as pd
+from jsonschema import Draft7Validator, FormatChecker
+from benchmarks.harness import register, time_function, summarize
+from src.processing.schema_validation import TRANSACTION_SCHEMA, TRANSACTION_VALIDATOR
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Per-record jsonschema is slow; the baseline runs on a slice so the suite stays quick
+BASELINE_RECORDS = 10000
+
+@register("validation_batch_records")
+def bench_validation_batch_records(context):
+    """Column-wise validation of a batch of event dicts, including building the frame."""
+    events = context["events"]
+    timings = time_function(lambda: TRANSACTION_VALIDATOR.validate_batch(events), repeats=context["repeats"])
+    return summarize(timings, len(events))
+
+@register("validation_batch_dataframe")
+def bench_validation_batch_dataframe(context):
+    """Column-wise validation of events already loaded as a DataFrame."""
+    frame = pd.DataFrame.from_records(context["events"])
+    timings = time_function(lambda: TRANSACTION_VALIDATOR.validate_batch(frame), repeats=context["repeats"])
+    return summarize(timings, len(frame))
+
+@register("validation_single_record")
+def bench_validation_single_record(context):
+    """Compiled scalar validation of one event at a time, as done per request and per consumed event."""
+    events = context["events"][:BASELINE_RECORDS]
+    timings = time_function(lambda: [TRANSACTION_VALIDATOR.validate_record(event) for event in events],
+                            repeats=context["repeats"])
+    return summarize(timings, len(events))
+
+@register("validation_jsonschema_per_record")
+def bench_validation_jsonschema_per_record(context):
+    """Baseline: a prebuilt jsonschema validator called once per event."""
+    validator = Draft7Validator(TRANSACTION_SCHEMA, format_checker=FormatChecker())
+    events = context["events"][:BASELINE_RECORDS]
+    timings = time_function(lambda: [validator.is_valid(event) for event in events], repeats=max(1, context["repeats"] // 2))
+    return summarize(timings, len(events))
@@ -0,0 +1,134 @@
+import os
+import gc
+import json
+import time
+import logging
+import platform
+import subprocess
+from datetime import datetime
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Registered benchmarks, in registration order: name -> function(context) returning a result dict
+BENCHMARKS = {}
+
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+DEFAULT_REGRESSION_THRESHOLD = 0.10  # Flag a benchmark when its median gets 10% slower
+
+def register(name):
+    """Register a benchmark function under the given name."""
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+def time_function(func, repeats=5, warmup=1, setup=None):
+    """Time func over several repeats and return the wall-clock durations in seconds.
+
+    If setup is given it is called before every run (outside the timed region) and its
+    return value is passed to func, so benchmarks of in-place operations get fresh input.
+    """
+    timings = []
+    for i in range(warmup + repeats):
+        args = (setup(),) if setup is not None else ()
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            func(*args)
+            elapsed = time.perf_counter() - start
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        if i >= warmup:
+            timings.append(elapsed)
+    return timings
+
+def summarize(timings, items_per_run):
+    """Summarise run durations into latency percentiles and throughput."""
+    timings = np.asarray(timings, dtype=np.float64)
+    median = float(np.median(timings))
+    return {
+        "runs": int(timings.size),
+        "items_per_run": int(items_per_run),
+        "min_s": float(timings.min()),
+        "median_s": median,
+        "mean_s": float(timings.mean()),
+        "p95_s": float(np.percentile(timings, 95)),
+        "p99_s": float(np.percentile(timings, 99)),
+        "items_per_sec": float(items_per_run / median) if median > 0 else None,
+    }
+
+def git_commit():
+    """Return the short hash of the current git commit, or None outside a git checkout."""
+    try:
+        output = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return output.stdout.strip()
+    except Exception:
+        return None
+
+def environment_info():
+    """Describe the machine and library versions the benchmarks ran on."""
+    import pandas as pd
+    import sklearn
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "scikit-learn": sklearn.__version__,
+    }
+
+def save_results(report, output_dir=DEFAULT_RESULTS_DIR):
+    """Save a benchmark report as JSON, named by run time and git commit."""
+    os.makedirs(output_dir, exist_ok=True)
+    file_name = f"{report['started_at'].replace(':', '').replace('-', '')}_{report['commit'] or 'nocommit'}.json"
+    output_file_path = os.path.join(output_dir, file_name)
+    with open(output_file_path, "w") as json_file:
+        json.dump(report, json_file, indent=4)
+    logger.info(f"Benchmark results saved to {output_file_path}.")
+    return output_file_path
+
+def load_results(file_path):
+    """Load a benchmark report saved by save_results."""
+    with open(file_path) as json_file:
+        return json.load(json_file)
+
+def latest_results(output_dir=DEFAULT_RESULTS_DIR, exclude=None):
+    """Return the path of the most recent saved report, or None if there is none."""
+    if not os.path.isdir(output_dir):
+        return None
+    paths = sorted(
+        os.path.join(output_dir, name) for name in os.listdir(output_dir)
+        if name.endswith(".json")
+    )
+    paths = [path for path in paths if exclude is None or os.path.abspath(path) != os.path.abspath(exclude)]
+    return paths[-1] if paths else None
+
+def compare_results(baseline, current, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """Compare median timings of two reports and return (name, baseline_s, current_s, change) for regressions."""
+    regressions = []
+    for name, result in current["benchmarks"].items():
+        previous = baseline["benchmarks"].get(name)
+        if not previous or previous.get("skipped") or result.get("skipped"):
+            continue
+        change = (result["median_s"] - previous["median_s"]) / previous["median_s"]
+        logger.info(f"{name}: {previous['median_s']:.6f}s -> {result['median_s']:.6f}s ({change:+.1%})")
+        if change > threshold:
+            regressions.append((name, previous["median_s"], result["median_s"], change))
+    return regressions
+
+def new_report(params):
+    """Create an empty report for a benchmark run."""
+    return {
+        "started_at": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "environment": environment_info(),
+        "params": params,
+        "benchmarks": {},
+    }
@@ -0,0 +1,176 @@
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import tempfile
+import threading
+import subprocess
+import http.client
+from datetime import datetime
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from benchmarks.harness import DEFAULT_RESULTS_DIR, git_commit
+from benchmarks.synthetic_data import generate_transactions
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FEATURE_COLUMNS = ["amount", "transaction_hour", "transaction_day", "transaction_month", "high_transaction"]
+SERVER_COMMANDS = {
+    # Flask's development server, as started by api_integration's app.run(), on a configurable port
+    "dev": [sys.executable, "-m", "flask", "--app", "src.deployment.api_integration:app", "run", "--port", "{port}"],
+    "gunicorn": [sys.executable, "-m", "src.deployment.serve"],
+    "gunicorn-batched": [sys.executable, "-m", "src.deployment.serve"],
+}
+# Extra environment per server; batching needs enough threads per worker to have concurrent requests to coalesce
+SERVER_ENV = {
+    "gunicorn-batched": {"BATCHING_ENABLED": "1", "WEB_THREADS": "16"},
+}
+READY_TIMEOUT_SECONDS = 60
+
+def build_payloads(n_rows, seed):
+    """Build /predict payloads and labels from synthetic transactions."""
+    data = generate_transactions(n_rows, seed=seed)
+    features = {
+        "amount": data["amount"],
+        "transaction_hour": data["timestamp"].dt.hour,
+        "transaction_day": data["timestamp"].dt.day,
+        "transaction_month": data["timestamp"].dt.month,
+        "high_transaction": (data["amount"] > 1000).astype(int),
+    }
+    frame = data.assign(**features)[FEATURE_COLUMNS]
+    return frame, data["is_fraud"]
+
+def train_load_test_model(model_path, seed):
+    """Train a production-sized forest on the payload features and save it for the servers to load."""
+    frame, labels = build_payloads(20000, seed)
+    model = RandomForestClassifier(n_estimators=100, random_state=42)
+    model.fit(frame, labels)
+    joblib.dump(model, model_path)
+    return model_path
+
+def wait_until_ready(port, process):
+    """Poll /readyz until the server answers 200."""
+    deadline = time.monotonic() + READY_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode} before becoming ready.")
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/readyz")
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Server did not become ready in time.")
+
+def start_server(kind, port, model_path, workers=None):
+    """Start the dev server or the gunicorn server on the given port."""
+    env = dict(os.environ, MODEL_LOCAL_PATH=model_path, PORT=str(port), METRICS_SAMPLE_RATE="0.1")
+    if workers:
+        env["WEB_CONCURRENCY"] = str(workers)
+    env.update(SERVER_ENV.get(kind, {}))
+    command = [part.format(port=port) for part in SERVER_COMMANDS[kind]]
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_until_ready(port, process)
+    return process
+
+def run_clients(port, payloads, concurrency, duration):
+    """Send /predict requests from concurrent keep-alive clients and collect per-request latencies."""
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    deadline = time.perf_counter() + duration
+
+    def client(index):
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        headers = {"Content-Type": "application/json"}
+        i = index
+        while time.perf_counter() < deadline:
+            body = payloads[i % len(payloads)]
+            i += concurrency
+            start = time.perf_counter()
+            try:
+                connection.request("POST", "/predict", body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    errors[index] += 1
+            except (OSError, http.client.HTTPException):
+                errors[index] += 1
+                connection.close()
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+                continue
+            latencies[index].append(time.perf_counter() - start)
+        connection.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    all_latencies = np.concatenate([np.asarray(values) for values in latencies]) if any(latencies) else np.zeros(0)
+    return {
+        "concurrency": concurrency,
+        "duration_s": elapsed,
+        "requests": int(all_latencies.size),
+        "errors": int(sum(errors)),
+        "requests_per_sec": float(all_latencies.size / elapsed),
+        "p50_ms": float(np.percentile(all_latencies, 50) * 1000) if all_latencies.size else None,
+        "p99_ms": float(np.percentile(all_latencies, 99) * 1000) if all_latencies.size else None,
+    }
+
+def parse_args(argv=None):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Load test the /predict API on the dev server and under gunicorn.")
+    parser.add_argument("--servers", default="dev,gunicorn", help="Comma-separated: dev, gunicorn, gunicorn-batched")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per server")
+    parser.add_argument("--workers", type=int, help="Gunicorn workers (defaults to the core count)")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output-dir", default=os.path.join(DEFAULT_RESULTS_DIR, "load_test"))
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Run the load test against each server and save req/s and latency percentiles."""
+    args = parse_args(argv)
+    frame, _ = build_payloads(5000, args.seed + 1)
+    payloads = [json.dumps(record) for record in frame.to_dict(orient="records")]
+
+    report = {
+        "started_at": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "cpu_count": os.cpu_count(),
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="fraud_load_test_") as workdir:
+        model_path = train_load_test_model(os.path.join(workdir, "fraud_detection_model.pkl"), args.seed)
+        for kind in [name.strip() for name in args.servers.split(",") if name.strip()]:
+            logger.info(f"Load testing the {kind} server for {args.duration:.0f}s at concurrency {args.concurrency}...")
+            process = start_server(kind, args.port, model_path, workers=args.workers)
+            try:
+                result = run_clients(args.port, payloads, args.concurrency, args.duration)
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+            report["results"][kind] = result
+            logger.info(f"{kind}: {result['requests_per_sec']:.0f} req/s, p50 {result['p50_ms']:.2f} ms, "
+                        f"p99 {result['p99_ms']:.2f} ms, {result['errors']} errors")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    output_file_path = os.path.join(args.output_dir, f"{report['started_at'].replace(':', '').replace('-', '')}.json")
+    with open(output_file_path, "w") as json_file:
+        json.dump(report, json_file, indent=4)
+    logger.info(f"Load test results saved to {output_file_path}.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import tempfile
+import threading
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from benchmarks.harness import DEFAULT_RESULTS_DIR, git_commit
+from benchmarks.synthetic_data import generate_events
+from src.ingestion.dead_letter import CheckpointTracker, DeadLetterQueue, RetryQueue
+from src.ingestion.event_source import create_consumer_client
+from src.ingestion.local_event_hub import get_local_event_hub
+from src.ingestion.local_storage import LocalBlobServiceClient
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CONSUMERS = ("predict", "eventhub_source")
+LAG_SAMPLE_INTERVAL_SECONDS = 0.25
+
+class CountingSink:
+    """Dead-letter sink that only counts records, so poison events show up in the report."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        with self._lock:
+            self.count += 1
+        return True
+
+def read_events(paths):
+    """Read recorded transactions from data/raw/events-style .json, .jsonl or .csv files."""
+    events = []
+    for path in paths:
+        if path.endswith(".jsonl"):
+            with open(path) as events_file:
+                events.extend(json.loads(line) for line in events_file if line.strip())
+        elif path.endswith(".json"):
+            with open(path) as events_file:
+                content = json.load(events_file)
+            events.extend(content if isinstance(content, list) else [content])
+        elif path.endswith(".csv"):
+            frame = pd.read_csv(path, dtype={"user_id": str, "merchant_id": str})
+            frame["timestamp"] = pd.to_datetime(frame["timestamp"]).dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+            events.extend(frame.to_dict(orient="records"))
+        else:
+            raise ValueError(f"Unsupported event file: {path}")
+    logger.info(f"Read {len(events)} recorded events from {len(paths)} file(s).")
+    return events
+
+def prediction_payloads(events):
+    """Turn raw transaction events into the feature payloads the predict consumer scores."""
+    frame = pd.DataFrame(events)
+    timestamp = pd.to_datetime(frame["timestamp"], utc=True)
+    amount = pd.to_numeric(frame["amount"])
+    payloads = pd.DataFrame({
+        "transaction_id": frame["transaction_id"],
+        "amount": amount,
+        "transaction_hour": timestamp.dt.hour,
+        "transaction_day": timestamp.dt.day,
+        "transaction_month": timestamp.dt.month,
+        "high_transaction": (amount > 1000).astype(int),
+    })
+    return payloads.to_dict(orient="records")
+
+def prepare_consumer(name, workdir, model_path=None, seed=42):
+    """Point a consumer at local storage and return (on_event handler, payload builder, dead-letter sink)."""
+    sink = CountingSink()
+    if name == "predict":
+        import joblib
+        from benchmarks.load_test import train_load_test_model
+        from src.modeling import predict
+        from src.modeling.cascade import wrap_model
+
+        model_path = model_path or train_load_test_model(os.path.join(workdir, "fraud_detection_model.pkl"), seed)
+        predict.model = wrap_model(joblib.load(model_path), predict.SERVICE_NAME)
+        predict.DEAD_LETTERS = DeadLetterQueue(predict.SERVICE_NAME, sink=sink)
+        predict.RETRIES = RetryQueue(predict.DEAD_LETTERS)
+        predict.CHECKPOINTS = CheckpointTracker(predict.SERVICE_NAME)
+        return predict.on_event, prediction_payloads, sink
+    if name == "eventhub_source":
+        from src.ingestion import EventHub_source
+
+        EventHub_source.blob_service_client = LocalBlobServiceClient(os.path.join(workdir, "blob"))
+        EventHub_source.DEAD_LETTERS = DeadLetterQueue(EventHub_source.SERVICE_NAME, sink=sink)
+        EventHub_source.RETRIES = RetryQueue(EventHub_source.DEAD_LETTERS)
+        EventHub_source.CHECKPOINTS = CheckpointTracker(EventHub_source.SERVICE_NAME)
+        return EventHub_source.on_event, list, sink
+    raise ValueError(f"Unknown consumer: {name}")
+
+def consumer_lag(hub, checkpoint_store, consumer_group):
+    """Return the number of events per partition that are enqueued but not yet checkpointed."""
+    checkpoints = {checkpoint["partition_id"]: checkpoint["sequence_number"]
+                   for checkpoint in checkpoint_store.list_checkpoints(hub.name, consumer_group)}
+    return {partition.partition_id: len(partition.events) - (checkpoints.get(partition.partition_id, -1) + 1)
+            for partition in hub.partitions}
+
+def pump(hub, events, n_events, rate):
+    """Send n_events, cycling through events, at rate events/sec (0 for as fast as possible); returns the elapsed time."""
+    started = time.perf_counter()
+    for i in range(n_events):
+        if rate > 0:
+            delay = started + i / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        key, payload = events[i % len(events)]
+        hub.send(payload, partition_key=key)
+    return time.perf_counter() - started
+
+def replay(on_event, events, n_events, rate=0.0, partitions=4, drain_timeout=60.0, hub_name=None):
+    """Replay events through a local Event Hub into on_event and measure throughput, latency and lag."""
+    hub_name = hub_name or f"replay-{os.getpid()}-{time.monotonic_ns()}"
+    hub = get_local_event_hub(hub_name, partition_count=partitions)
+    client = create_consumer_client(None, hub_name, source="local")
+    latencies = []
+
+    def handle(partition_context, event):
+        on_event(partition_context, event)
+        latencies.append(time.time() - event.enqueued_time.timestamp())
+
+    receiver = threading.Thread(target=client.receive, kwargs={"on_event": handle, "starting_position": "-1",
+                                                               "track_last_enqueued_event_properties": True},
+                                name="replay-consumer", daemon=True)
+    receiver.start()
+
+    lag_samples = []
+    producer_result = {}
+    producer = threading.Thread(target=lambda: producer_result.update(elapsed=pump(hub, events, n_events, rate)),
+                                name="replay-producer", daemon=True)
+    started = time.perf_counter()
+    producer.start()
+    deadline = None
+    while len(latencies) < n_events:
+        lag_samples.append(sum(consumer_lag(hub, client.checkpoint_store, client.consumer_group).values()))
+        if deadline is None and not producer.is_alive():
+            deadline = time.perf_counter() + drain_timeout
+        if deadline is not None and time.perf_counter() > deadline:
+            logger.warning(f"Stopped waiting with {n_events - len(latencies)} events unprocessed.")
+            break
+        time.sleep(LAG_SAMPLE_INTERVAL_SECONDS)
+    elapsed = time.perf_counter() - started
+    producer.join()
+    client.close()
+    receiver.join(timeout=10)
+
+    processed = np.asarray(latencies[:], dtype=np.float64) * 1000
+    final_lag = consumer_lag(hub, client.checkpoint_store, client.consumer_group)
+    return {
+        "events_sent": n_events,
+        "events_processed": int(processed.size),
+        "partitions": partitions,
+        "target_rate": rate,
+        "send_rate": float(n_events / producer_result["elapsed"]) if producer_result.get("elapsed") else None,
+        "duration_s": elapsed,
+        "events_per_sec": float(processed.size / elapsed) if elapsed else None,
+        "latency_ms": {name: float(np.percentile(processed, q)) if processed.size else None
+                       for name, q in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100))},
+        "lag_events": {
+            "max": int(max(lag_samples, default=0)),
+            "mean": float(np.mean(lag_samples)) if lag_samples else 0.0,
+            "final": final_lag,
+        },
+    }
+
+def parse_args(argv=None):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Replay transactions through a local Event Hub into a consumer.")
+    parser.add_argument("--consumer", choices=CONSUMERS, default="predict")
+    parser.add_argument("--input", nargs="*", help="Recorded .json/.jsonl/.csv event files (default: synthetic events)")
+    parser.add_argument("--synthetic", type=int, default=20000, help="Synthetic events to generate without --input")
+    parser.add_argument("--events", type=int, help="Events to send, cycling through the input (default: all of it)")
+    parser.add_argument("--rate", type=float, default=0.0, help="Events/sec to send; 0 sends as fast as possible")
+    parser.add_argument("--partitions", type=int, default=4)
+    parser.add_argument("--model", help="Pickled model for the predict consumer (default: train one)")
+    parser.add_argument("--drain-timeout", type=float, default=60.0, help="Seconds to wait for the consumer after sending")
+    parser.add_argument("--log-events", action="store_true", help="Keep the consumer's per-event INFO logging")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output-dir", default=os.path.join(DEFAULT_RESULTS_DIR, "replay"))
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Replay events into a consumer and save sustained events/sec, latency percentiles and consumer lag."""
+    args = parse_args(argv)
+    raw_events = read_events(args.input) if args.input else generate_events(args.synthetic, seed=args.seed)
+    if not args.log_events:
+        # Per-event INFO logs would dominate the measurement; keep the consumers' warnings and errors
+        logging.getLogger().setLevel(logging.WARNING)
+        logger.setLevel(logging.INFO)
+
+    with tempfile.TemporaryDirectory(prefix="fraud_replay_") as workdir:
+        try:
+            on_event, build_payloads, sink = prepare_consumer(args.consumer, workdir, args.model, args.seed)
+        except ImportError as e:
+            logger.error(f"Cannot import the {args.consumer} consumer: {str(e)}")
+            return 1
+        keys = [str(event.get("user_id")) if event.get("user_id") is not None else None for event in raw_events]
+        events = list(zip(keys, build_payloads(raw_events)))
+        n_events = args.events or len(events)
+        logger.info(f"Replaying {n_events} events into {args.consumer} over {args.partitions} partitions "
+                    f"at {f'{args.rate:.0f} events/s' if args.rate else 'full speed'}...")
+        result = replay(on_event, events, n_events, args.rate, args.partitions, args.drain_timeout)
+        result["dead_letters"] = sink.count
+
+    report = {
+        "started_at": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "cpu_count": os.cpu_count(),
+        "consumer": args.consumer,
+        "result": result,
+    }
+    latency = result["latency_ms"]
+    logger.info(f"{result['events_processed']}/{result['events_sent']} events in {result['duration_s']:.1f}s: "
+                f"{result['events_per_sec']:.0f} events/s, latency p50 {latency['p50']:.1f} ms, "
+                f"p99 {latency['p99']:.1f} ms, max lag {result['lag_events']['max']} events, "
+                f"{result['dead_letters']} dead letters")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    output_file_path = os.path.join(args.output_dir, f"{report['started_at'].replace(':', '').replace('-', '')}.json")
+    with open(output_file_path, "w") as json_file:
+        json.dump(report, json_file, indent=4)
+    logger.info(f"Replay results saved to {output_file_path}.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+import os
+import sys
+import argparse
+import logging
+import tempfile
+import importlib
+from benchmarks.harness import (
+    BENCHMARKS,
+    DEFAULT_RESULTS_DIR,
+    DEFAULT_REGRESSION_THRESHOLD,
+    compare_results,
+    latest_results,
+    load_results,
+    new_report,
+    save_results,
+)
+from benchmarks.synthetic_data import DEFAULT_SEED, generate_events, generate_transactions
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Modules whose @register'ed benchmarks make up the suite
+BENCHMARK_MODULES = [
+    "benchmarks.bench_pipeline",
+    "benchmarks.bench_metrics",
+    "benchmarks.bench_validation",
+    "benchmarks.bench_enrichment",
+    "benchmarks.bench_compaction",
+    "benchmarks.bench_cascade",
+    "benchmarks.bench_drift",
+    "benchmarks.bench_shadow",
+    "benchmarks.bench_sql_sink",
+]
+
+def parse_args(argv=None):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Run the fraud detection benchmark suite.")
+    parser.add_argument("--rows", type=int, default=100000, help="Synthetic transactions per dataset")
+    parser.add_argument("--train-rows", type=int, default=20000, help="Rows used for model training")
+    parser.add_argument("--batch-rows", type=int, default=10000, help="Rows per batch scoring call")
+    parser.add_argument("--single-row-calls", type=int, default=200, help="Calls for single-row scoring latency")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--only", help="Comma-separated benchmark names (or prefixes) to run")
+    parser.add_argument("--output-dir", default=DEFAULT_RESULTS_DIR)
+    parser.add_argument("--compare", help="Report to compare against (defaults to the latest saved report)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    return parser.parse_args(argv)
+
+def selected_benchmarks(only):
+    """Return the registered benchmarks matching the --only filter."""
+    if not only:
+        return dict(BENCHMARKS)
+    prefixes = [name.strip() for name in only.split(",") if name.strip()]
+    return {name: func for name, func in BENCHMARKS.items() if any(name.startswith(prefix) for prefix in prefixes)}
+
+def main(argv=None):
+    """Run the selected benchmarks, save the results and compare them with a previous run."""
+    args = parse_args(argv)
+    for module_name in BENCHMARK_MODULES:
+        importlib.import_module(module_name)
+
+    params = {
+        "rows": args.rows,
+        "train_rows": args.train_rows,
+        "batch_rows": args.batch_rows,
+        "single_row_calls": args.single_row_calls,
+        "repeats": args.repeats,
+        "seed": args.seed,
+    }
+    report = new_report(params)
+    baseline_path = args.compare or latest_results(args.output_dir)
+
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="fraud_bench_") as workdir:
+        context = dict(params)
+        context["workdir"] = workdir
+        context["data"] = generate_transactions(args.rows, seed=args.seed)
+        context["events"] = generate_events(min(args.rows, 50000), seed=args.seed)
+
+        # The processing functions write downloads relative to the working directory
+        os.chdir(workdir)
+        try:
+            for name, func in selected_benchmarks(args.only).items():
+                logger.info(f"Running benchmark {name}...")
+                try:
+                    result = func(context)
+                except Exception as e:
+                    logger.error(f"Benchmark {name} failed: {str(e)}")
+                    result = {"skipped": f"failed: {e}"}
+                report["benchmarks"][name] = result
+                if "median_s" in result:
+                    logger.info(f"{name}: median {result['median_s']:.6f}s, {result['items_per_sec']:.0f} items/s")
+        finally:
+            os.chdir(original_dir)
+
+    output_file_path = save_results(report, args.output_dir)
+
+    regressions = []
+    if baseline_path:
+        logger.info(f"Comparing against {baseline_path}")
+        regressions = compare_results(load_results(baseline_path), report, threshold=args.threshold)
+        for name, previous, current, change in regressions:
+            logger.warning(f"Regression in {name}: {previous:.6f}s -> {current:.6f}s ({change:+.1%})")
+
+    if regressions and args.fail_on_regression:
+        return 1
+    return 0 if output_file_path else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import os
+import json
+import argparse
+import logging
+import numpy as np
+import pandas as pd
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Column order of the raw transaction files in data/raw
+TRANSACTION_COLUMNS = ["transaction_id", "timestamp", "user_id", "amount", "currency", "merchant_id", "is_fraud"]
+
+# Currency mix, dominated by USD like the sample data
+CURRENCIES = ["USD", "EUR", "GBP", "INR", "JPY", "CAD"]
+CURRENCY_WEIGHTS = [0.62, 0.16, 0.09, 0.06, 0.04, 0.03]
+
+DEFAULT_SEED = 42
+DEFAULT_FRAUD_RATE = 0.002  # Card fraud is typically well under 1% of transactions
+
+def _zipf_ids(rng, n_rows, n_ids, exponent):
+    """Draw ids in [0, n_ids) with a Zipf-like popularity skew."""
+    ranks = np.arange(1, n_ids + 1, dtype=np.float64)
+    weights = ranks ** -exponent
+    weights /= weights.sum()
+    return rng.choice(n_ids, size=n_rows, p=weights)
+
+def generate_transactions(n_rows, seed=DEFAULT_SEED, fraud_rate=DEFAULT_FRAUD_RATE, n_users=None,
+                          n_merchants=None, start="2024-10-10 00:00:00", duration_days=30):
+    """Generate a seeded synthetic transaction DataFrame matching the raw transaction schema."""
+    rng = np.random.default_rng(seed)
+    n_users = n_users or max(10, n_rows // 20)
+    n_merchants = n_merchants or max(5, n_rows // 500)
+
+    # Heavy users and big merchants account for most of the traffic
+    user_idx = _zipf_ids(rng, n_rows, n_users, exponent=1.1)
+    merchant_idx = _zipf_ids(rng, n_rows, n_merchants, exponent=1.3)
+
+    is_fraud = (rng.random(n_rows) < fraud_rate).astype(np.int64)
+
+    # Legitimate amounts are log-normal around ~50; fraud skews towards large amounts
+    amount = rng.lognormal(mean=3.9, sigma=1.0, size=n_rows)
+    n_fraud = int(is_fraud.sum())
+    amount[is_fraud == 1] = rng.lognormal(mean=6.5, sigma=1.2, size=n_fraud)
+    amount = np.round(amount, 2)
+
+    # Daytime peak for legitimate traffic, fraud concentrated at night
+    start_ts = pd.Timestamp(start)
+    day = rng.integers(0, duration_days, size=n_rows)
+    hour = np.clip(rng.normal(14, 4, size=n_rows), 0, 23.99)
+    hour[is_fraud == 1] = rng.uniform(0, 6, size=n_fraud)
+    seconds = day * 86400 + (hour * 3600).astype(np.int64)
+    timestamp = start_ts + pd.to_timedelta(seconds, unit="s")
+
+    data = pd.DataFrame({
+        "timestamp": timestamp,
+        "user_id": 10000 + user_idx,
+        "amount": amount,
+        "currency": rng.choice(CURRENCIES, size=n_rows, p=CURRENCY_WEIGHTS),
+        "merchant_id": pd.Series(merchant_idx + 1).map("merchant_{:03d}".format).to_numpy(),
+        "is_fraud": is_fraud,
+    })
+
+    # Transaction ids follow arrival order, as they would from the source system
+    data = data.sort_values("timestamp", kind="stable").reset_index(drop=True)
+    data["transaction_id"] = np.arange(1, n_rows + 1, dtype=np.int64)
+    logger.info(f"Generated {n_rows} synthetic transactions ({n_fraud} fraudulent, seed={seed}).")
+    return data[TRANSACTION_COLUMNS]
+
+def generate_events(n_rows, seed=DEFAULT_SEED, **kwargs):
+    """Generate synthetic transactions as JSON-serialisable event dicts like the Event Hub payloads."""
+    data = generate_transactions(n_rows, seed=seed, **kwargs)
+    data["timestamp"] = data["timestamp"].dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+    data["user_id"] = data["user_id"].astype(str)
+    return data.to_dict(orient="records")
+
+def write_transactions(data, output_file_path):
+    """Write transactions to CSV, JSON or XML, following the layout of the files in data/raw."""
+    os.makedirs(os.path.dirname(output_file_path) or ".", exist_ok=True)
+    data = data.copy()
+    data["timestamp"] = pd.to_datetime(data["timestamp"]).dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    if output_file_path.endswith(".csv"):
+        data.to_csv(output_file_path, index=False)
+    elif output_file_path.endswith(".json"):
+        with open(output_file_path, "w") as json_file:
+            json.dump(data.to_dict(orient="records"), json_file)
+    elif output_file_path.endswith(".xml"):
+        data.to_xml(output_file_path, index=False, root_name="transactions", row_name="transaction", parser="etree")
+    else:
+        raise ValueError(f"Unsupported file format: {output_file_path}")
+
+    logger.info(f"Wrote {len(data)} transactions to {output_file_path}.")
+    return output_file_path
+
+def main():
+    """Write a synthetic transaction file from the command line."""
+    parser = argparse.ArgumentParser(description="Generate synthetic fraud transactions.")
+    parser.add_argument("output_file_path", help="Destination .csv, .json or .xml file")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--fraud-rate", type=float, default=DEFAULT_FRAUD_RATE)
+    args = parser.parse_args()
+
+    data = generate_transactions(args.rows, seed=args.seed, fraud_rate=args.fraud_rate)
+    write_transactions(data, args.output_file_path)
+
+if __name__ == "__main__":
+    main()
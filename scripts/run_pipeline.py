@@ -0,0 +1,294 @@
+import os
+import sys
+import copy
+import json
+import time
+import glob
+import hashlib
+import argparse
+import logging
+import subprocess
+from datetime import datetime
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.getenv("PIPELINE_CACHE_DIR", ".pipeline_cache")
+STATE_FILE = "state.json"
+REPORT_FILE = "last_run.json"
+NOTEBOOK_OUTPUT_DIR = "build/notebooks"
+NOTEBOOKS = ["data_exploration.ipynb", "data_preprocessing.ipynb", "model_training.ipynb", "model_evaluation.ipynb"]
+
+# Stage outcomes; a stage may start once all its dependencies are 'ran' or 'cached'
+RAN, CACHED, FAILED, BLOCKED = "ran", "cached", "failed", "blocked"
+
+class Stage:
+    """A pipeline step: a command, the stages it depends on and the files that define its cache key."""
+
+    def __init__(self, name, command, deps=(), inputs=(), outputs=(), code=(), cache=True):
+        self.name = name
+        self.command = list(command)
+        self.deps = list(deps)
+        self.inputs = list(inputs)  # Local files or globs the stage reads
+        self.outputs = list(outputs)  # Local files the stage writes; all must exist for a cache hit
+        self.code = list(code)  # Source files whose changes invalidate the cache
+        self.cache = cache  # False for stages whose real inputs are remote and tracked by the stage itself
+
+def module_stage(name, module, deps=(), inputs=(), outputs=(), code=(), cache=True):
+    """Stage running a module's main() with `python -m`, keyed on the module's own source file."""
+    module_file = module.replace(".", "/") + ".py"
+    return Stage(name, [sys.executable, "-m", module], deps=deps, inputs=inputs, outputs=outputs,
+                 code=[module_file] + list(code), cache=cache)
+
+# The batch stages of scripts/run_pipeline.sh. The Event Hub consumers and the API are
+# long-running services and are started separately.
+STAGES = [
+    # The processing stages discover new event blobs themselves (see src/ingestion/blob_discovery.py),
+    # so they always run and a run with no new blobs is cheap
+    module_stage("transform", "src.processing.data_transformation", cache=False),
+    module_stage("features", "src.processing.feature_engineering", cache=False),
+    module_stage("detect", "src.processing.fraud_detection", cache=False),
+    module_stage(
+        "labels", "src.processing.label_join", deps=["features"],
+        inputs=["data/transformed/*", "data/processed/fraud_labels/*.json"],
+    ),
+    module_stage(
+        "train", "src.modeling.train_model", deps=["labels"],
+        inputs=["data/labeled/**/*.csv"], code=["src/processing/label_join.py"],
+        outputs=["fraud_detection_model.pkl", "fraud_detection_model_baseline.json", "fraud_detection_model_holdout.csv"],
+    ),
+    module_stage(
+        "compact", "src.modeling.compact_model", deps=["train"],
+        inputs=["fraud_detection_model.pkl", "fraud_detection_model_holdout.csv", "data/labeled/**/*.csv"],
+        code=["src/processing/label_join.py", "src/modeling/train_model.py"],
+        outputs=["fraud_detection_model_compact.pkl", "compaction_report.json"],
+    ),
+    module_stage(
+        "cascade", "src.modeling.cascade", deps=["train"],
+        inputs=["fraud_detection_model.pkl", "fraud_detection_model_holdout.csv", "data/labeled/**/*.csv"],
+        code=["src/processing/label_join.py", "src/modeling/train_model.py", "src/modeling/compact_model.py"],
+        outputs=["cascade_report.json"],
+    ),
+    module_stage(
+        "deploy", "src.deployment.deploy_model", deps=["train"],
+        inputs=["fraud_detection_model.pkl"],
+    ),
+    # The tests build their own data and models in temporary directories, so they need no other stage
+    Stage(
+        "tests", [sys.executable, "-m", "pytest", "-q", "tests"],
+        code=["src/**/*.py", "tests/*.py"],
+    ),
+    # Executed copies go to NOTEBOOK_OUTPUT_DIR so the source notebooks, the stage's cache key, stay unchanged
+    Stage(
+        "notebooks",
+        ["jupyter", "nbconvert", "--to", "notebook", "--execute", "--output-dir", NOTEBOOK_OUTPUT_DIR]
+        + [f"notebooks/{name}" for name in NOTEBOOKS],
+        deps=["transform", "train"],
+        inputs=[f"notebooks/{name}" for name in NOTEBOOKS],
+        outputs=[f"{NOTEBOOK_OUTPUT_DIR}/{name}" for name in NOTEBOOKS],
+    ),
+]
+
+def topological_order(stages):
+    """Return the stages in dependency order, raising ValueError on unknown dependencies or cycles."""
+    by_name = {stage.name: stage for stage in stages}
+    order, visiting, done = [], set(), set()
+
+    def visit(stage):
+        if stage.name in done:
+            return
+        if stage.name in visiting:
+            raise ValueError(f"Dependency cycle through stage '{stage.name}'.")
+        visiting.add(stage.name)
+        for dep in stage.deps:
+            if dep not in by_name:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'.")
+            visit(by_name[dep])
+        visiting.discard(stage.name)
+        done.add(stage.name)
+        order.append(stage)
+
+    for stage in stages:
+        visit(stage)
+    return order
+
+def expand(patterns, root):
+    """Expand file globs relative to root into a sorted list of existing files."""
+    paths = set()
+    for pattern in patterns:
+        for path in glob.glob(os.path.join(root, pattern), recursive=True):
+            if os.path.isfile(path):
+                paths.add(os.path.relpath(path, root))
+    return sorted(paths)
+
+def stage_hash(stage, dep_hashes, root):
+    """Hash a stage's command, code, inputs and the hashes of its dependencies."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps(stage.command).encode("utf-8"))
+    for dep in sorted(stage.deps):
+        digest.update(f"dep:{dep}:{dep_hashes[dep]}".encode("utf-8"))
+    for path in expand(stage.code + stage.inputs, root):
+        digest.update(f"file:{path}".encode("utf-8"))
+        with open(os.path.join(root, path), "rb") as input_file:
+            for chunk in iter(lambda: input_file.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+def load_state(cache_dir):
+    """Load the hashes of previous successful runs."""
+    try:
+        with open(os.path.join(cache_dir, STATE_FILE)) as state_file:
+            return json.load(state_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_state(state, cache_dir):
+    """Persist the hashes of successful runs."""
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = os.path.join(cache_dir, STATE_FILE + ".tmp")
+    with open(tmp_path, "w") as state_file:
+        json.dump(state, state_file, indent=4)
+    os.replace(tmp_path, os.path.join(cache_dir, STATE_FILE))
+
+def run_stage(stage, root):
+    """Run a stage's command and return (succeeded, duration_s)."""
+    started = time.perf_counter()
+    try:
+        result = subprocess.run(stage.command, cwd=root)
+    except OSError as e:
+        logger.error(f"Stage '{stage.name}' could not start: {str(e)}")
+        return False, time.perf_counter() - started
+    duration = time.perf_counter() - started
+    missing = [path for path in stage.outputs if not os.path.exists(os.path.join(root, path))]
+    if result.returncode != 0:
+        logger.error(f"Stage '{stage.name}' exited with code {result.returncode}.")
+        return False, duration
+    if missing:
+        logger.error(f"Stage '{stage.name}' did not produce {', '.join(missing)}.")
+        return False, duration
+    return True, duration
+
+def critical_path(order, results):
+    """Return (stage names, seconds) of the longest dependency chain by run time."""
+    finish, previous = {}, {}
+    for stage in order:
+        duration = results[stage.name].get("duration_s", 0.0)
+        best_dep = max(stage.deps, key=lambda dep: finish[dep], default=None)
+        finish[stage.name] = duration + (finish[best_dep] if best_dep else 0.0)
+        previous[stage.name] = best_dep
+    if not finish:
+        return [], 0.0
+    name = max(finish, key=finish.get)
+    total = finish[name]
+    path = []
+    while name is not None:
+        path.append(name)
+        name = previous[name]
+    return list(reversed(path)), total
+
+def run_pipeline(stages, jobs=None, force=False, root=REPO_ROOT, cache_dir=None, only=None):
+    """Run stages in parallel as their dependencies finish, skipping stages whose hash is unchanged."""
+    cache_dir = cache_dir or os.path.join(root, CACHE_DIR)
+    if only:
+        stages = _with_dependencies([stage for stage in stages if stage.name in only], stages)
+    order = topological_order(stages)
+    state = load_state(cache_dir)
+    results, hashes = {}, {}
+    pending = {stage.name: stage for stage in order}
+    running = {}
+    started_at = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+        while pending or running:
+            for stage in [stage for stage in order if stage.name in pending]:
+                dep_status = [results.get(dep, {}).get("status") for dep in stage.deps]
+                if any(status in (FAILED, BLOCKED) for status in dep_status):
+                    del pending[stage.name]
+                    results[stage.name] = {"status": BLOCKED, "duration_s": 0.0}
+                    logger.warning(f"Stage '{stage.name}' blocked by a failed dependency.")
+                    continue
+                if not all(status in (RAN, CACHED) for status in dep_status):
+                    continue
+                del pending[stage.name]
+                hashes[stage.name] = stage_hash(stage, hashes, root)
+                outputs_present = all(os.path.exists(os.path.join(root, path)) for path in stage.outputs)
+                if not force and stage.cache and outputs_present and state.get(stage.name, {}).get("hash") == hashes[stage.name]:
+                    results[stage.name] = {"status": CACHED, "duration_s": 0.0, "start_s": time.perf_counter() - started_at}
+                    logger.info(f"Stage '{stage.name}' is up to date; skipping.")
+                    continue
+                logger.info(f"Starting stage '{stage.name}'...")
+                results[stage.name] = {"start_s": time.perf_counter() - started_at}
+                running[pool.submit(run_stage, stage, root)] = stage
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                succeeded, duration = future.result()
+                results[stage.name].update({"status": RAN if succeeded else FAILED, "duration_s": duration})
+                if succeeded:
+                    state[stage.name] = {"hash": hashes[stage.name], "duration_s": duration,
+                                         "finished_at": datetime.now().strftime("%Y-%m-%dT%H:%M:%S")}
+                    save_state(state, cache_dir)
+                logger.info(f"Stage '{stage.name}' {results[stage.name]['status']} in {duration:.2f}s.")
+
+    path, path_seconds = critical_path(order, results)
+    report = {
+        "wall_s": time.perf_counter() - started_at,
+        "stages": results,
+        "critical_path": path,
+        "critical_path_s": path_seconds,
+    }
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, REPORT_FILE), "w") as report_file:
+        json.dump(report, report_file, indent=4)
+    return report
+
+def _with_dependencies(selected, stages):
+    """Return the selected stages plus everything they transitively depend on."""
+    by_name = {stage.name: stage for stage in stages}
+    names, todo = set(), [stage.name for stage in selected]
+    while todo:
+        name = todo.pop()
+        if name not in names:
+            names.add(name)
+            todo.extend(by_name[name].deps)
+    return [stage for stage in stages if stage.name in names]
+
+def log_report(report):
+    """Log the per-stage timing breakdown and the critical path."""
+    logger.info(f"{'stage':<12} {'status':<8} {'start':>8} {'duration':>9}")
+    for name, result in sorted(report["stages"].items(), key=lambda item: item[1].get("start_s", float("inf"))):
+        start = f"{result['start_s']:.2f}s" if "start_s" in result else "-"
+        logger.info(f"{name:<12} {result['status']:<8} {start:>8} {result['duration_s']:>8.2f}s")
+    busy = sum(result["duration_s"] for result in report["stages"].values())
+    logger.info(f"Wall time {report['wall_s']:.2f}s for {busy:.2f}s of stage time; critical path "
+                f"{' -> '.join(report['critical_path'])} ({report['critical_path_s']:.2f}s).")
+
+def main(argv=None):
+    """Run the pipeline from the command line."""
+    parser = argparse.ArgumentParser(description="Run the fraud detection batch pipeline.")
+    parser.add_argument("--jobs", type=int, help="Stages to run in parallel (defaults to the core count)")
+    parser.add_argument("--force", action="store_true", help="Ignore the cache and run every stage")
+    parser.add_argument("--only", help="Comma-separated stages to run, together with their dependencies")
+    parser.add_argument("--skip", default="", help="Comma-separated stages to leave out, e.g. notebooks")
+    args = parser.parse_args(argv)
+
+    skip = {name.strip() for name in args.skip.split(",") if name.strip()}
+    # Copies, so the module's STAGES keep their dependencies for the next call in this process
+    stages = [copy.copy(stage) for stage in STAGES if stage.name not in skip]
+    for stage in stages:
+        stage.deps = [dep for dep in stage.deps if dep not in skip]
+    only = {name.strip() for name in args.only.split(",")} if args.only else None
+
+    report = run_pipeline(stages, jobs=args.jobs, force=args.force, only=only)
+    log_report(report)
+    failed = [name for name, result in report["stages"].items() if result["status"] in (FAILED, BLOCKED)]
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,18 @@
 import os
 import json
 import logging
-import joblib
-from flask import Flask, request, jsonify
-from azure.storage.blob import BlobServiceClient
+import threading
+import time
+from flask import Flask, Response, request, jsonify
 import pandas as pd
+from src.deployment.batching import DynamicBatcher, score_frame
+from src.modeling.cascade import wrap_model
+from src.modeling.shadow import load_candidates, observe_shadow, set_shadow_candidates
+from src.monitoring.drift import baseline_path, load_baseline, observe_drift, read_baseline_blob, set_drift_baseline
+from src.monitoring.metrics import METRICS, PROMETHEUS_CONTENT_TYPE
+from src.processing.enrichment import enrich_record
+from src.processing.schema_validation import PREDICTION_REQUEST_VALIDATOR, SchemaValidationError
+from src.monitoring.profiling import ADMIN_TOKEN_HEADER, handle_profile_request, install_signal_handler
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -14,6 +22,9 @@ logger = logging.getLogger(__name__)
 AZURE_BLOB_CONNECTION_STRING = os.getenv("AZURE_BLOB_CONNECTION_STRING")
 BLOB_CONTAINER_NAME = "fraud-events"  # Name of the blob container
 MODEL_BLOB_NAME = "fraud_detection_model.pkl"  # Name of the saved model in Blob Storage
+MODEL_LOCAL_PATH = os.getenv("MODEL_LOCAL_PATH")  # Load the model from this file instead of Blob Storage when set
+SERVICE_NAME = "api"  # Service label used in the exported metrics
+BATCHING_ENABLED = os.getenv("BATCHING_ENABLED", "0") == "1"  # Coalesce concurrent requests into one model call
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -21,6 +32,8 @@ app = Flask(__name__)
 def load_model_from_blob():
     """Load the trained model from Azure Blob Storage."""
     try:
+        import joblib
+        from azure.storage.blob import BlobServiceClient
         blob_service_client = BlobServiceClient.from_connection_string(AZURE_BLOB_CONNECTION_STRING)
         blob_client = blob_service_client.get_blob_client(container=BLOB_CONTAINER_NAME, blob=MODEL_BLOB_NAME)
 
@@ -32,36 +45,152 @@ def load_model_from_blob():
         # Load the model using joblib
         model = joblib.load(MODEL_BLOB_NAME)
         logger.info("Model loaded successfully from Azure Blob Storage.")
+        # Drift is measured against the training baseline stored next to the model
+        set_drift_baseline(read_baseline_blob(blob_service_client, BLOB_CONTAINER_NAME, MODEL_BLOB_NAME))
         return model
     except Exception as e:
         logger.error(f"Failed to load model from blob: {str(e)}")
         return None
 
-# Load the model on startup
-model = load_model_from_blob()
+def load_model_from_file(model_path):
+    """Load the trained model from a local file."""
+    try:
+        import joblib
+        model = joblib.load(model_path)
+        logger.info(f"Model loaded successfully from {model_path}.")
+        set_drift_baseline(load_baseline(baseline_path(model_path)))
+        return model
+    except Exception as e:
+        logger.error(f"Failed to load model from {model_path}: {str(e)}")
+        return None
+
+def load_model():
+    """Load the model from MODEL_LOCAL_PATH if set, otherwise from Azure Blob Storage, behind the cascade if enabled.
+
+    Candidates listed in SHADOW_MODELS are loaded with it and scored in its shadow.
+    """
+    if MODEL_LOCAL_PATH:
+        new_model = wrap_model(load_model_from_file(MODEL_LOCAL_PATH), SERVICE_NAME)
+    else:
+        new_model = wrap_model(load_model_from_blob(), SERVICE_NAME)
+    if new_model is not None:
+        set_shadow_candidates(load_candidates())
+    return new_model
+
+def reload_model():
+    """Load a fresh copy of the model and swap it in; keeps the current model if loading fails."""
+    global model
+    new_model = load_model()
+    if new_model is None:
+        logger.error("Model reload failed; keeping the current model.")
+        return False
+    # Rebinding the global is atomic, so in-flight requests finish with the model they started with
+    model = new_model
+    logger.info("Model reloaded.")
+    return True
+
+# The model is loaded on first use, not at import; serve.py loads it in the gunicorn master before forking
+model = None
+model_load_attempted = False
+model_lock = threading.Lock()
+
+def get_model():
+    """Return the serving model, loading it on first use; None if it could not be loaded."""
+    global model, model_load_attempted
+    if model is None and not model_load_attempted:
+        with model_lock:
+            if model is None and not model_load_attempted:
+                model = load_model()
+                model_load_attempted = True
+    return model
+
+# Per-process request batcher, created on first use so its thread starts in the worker, not the gunicorn master
+batcher = None
+batcher_pid = None
+batcher_lock = threading.Lock()
+
+def get_batcher():
+    """Return this process's DynamicBatcher, creating it on first use."""
+    global batcher, batcher_pid
+    if batcher is None or batcher_pid != os.getpid():
+        with batcher_lock:
+            if batcher is None or batcher_pid != os.getpid():
+                batcher = DynamicBatcher(get_model, service=SERVICE_NAME, validator=PREDICTION_REQUEST_VALIDATOR)
+                batcher_pid = os.getpid()
+    return batcher
 
 @app.route('/predict', methods=['POST'])
 def predict():
     """Endpoint to make predictions on transaction data."""
+    timer = METRICS.start_event(SERVICE_NAME)
     try:
-        # Get JSON data from the request
-        data = request.get_json()
+        with timer.stage("decode"):
+            # Get JSON data from the request
+            data = request.get_json()
 
-        # Convert the JSON data to a DataFrame
-        transaction_data = pd.DataFrame([data])
+        if not BATCHING_ENABLED:
+            # Reject malformed transactions up front; the batcher validates its rows a whole batch at a time
+            with timer.stage("validate"):
+                PREDICTION_REQUEST_VALIDATOR.check_record(data)
 
         # Make prediction
-        prediction = model.predict(transaction_data)
+        with timer.stage("model"):
+            if BATCHING_ENABLED:
+                # Queue the row; it is scored in one call together with other concurrent requests
+                label, _ = get_batcher().predict(data)
+            else:
+                # Convert the JSON data, with any merchant/user/FX reference attributes, to a DataFrame
+                record = enrich_record(data)
+                frame = pd.DataFrame([record])
+                scoring_model = get_model()
+                started = time.perf_counter()
+                labels, scores = score_frame(scoring_model, frame)
+                observe_shadow(SERVICE_NAME, frame, labels, scores, time.perf_counter() - started, scoring_model.classes_)
+                observe_drift(SERVICE_NAME, [record], scores, labels)
+                label = labels[0]
         result = {
             "transaction_id": data.get("transaction_id"),
-            "is_fraud": int(prediction[0])  # Convert to integer for easier readability
+            "is_fraud": int(label)  # Convert to integer for easier readability
         }
 
         return jsonify(result), 200
+    except SchemaValidationError as e:
+        METRICS.inc("fraud_errors_total", service=SERVICE_NAME, stage="validate")
+        return jsonify({"error": "Invalid transaction.", "details": e.errors}), 400
     except Exception as e:
+        METRICS.inc("fraud_errors_total", service=SERVICE_NAME, stage="process")
         logger.error(f"Prediction error: {str(e)}")
         return jsonify({"error": "Failed to process the request."}), 400
 
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness probe: the worker is up and serving requests."""
+    return jsonify({"status": "ok"}), 200
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness probe: the worker has a model and can take traffic."""
+    if get_model() is None:
+        return jsonify({"status": "model not loaded"}), 503
+    return jsonify({"status": "ready"}), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Endpoint exposing latency histograms and counters in the Prometheus text format."""
+    return Response(METRICS.render_prometheus(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.route('/admin/profile', methods=['POST'])
+def admin_profile():
+    """Admin endpoint starting a sampling profile of this worker for ?seconds=N."""
+    status, result = handle_profile_request(SERVICE_NAME, request.headers.get(ADMIN_TOKEN_HEADER), request.args.get("seconds"))
+    return jsonify(result), status
+
 if __name__ == "__main__":
+    # Allow `kill -USR2 <pid>` to profile the running server
+    install_signal_handler(SERVICE_NAME)
+
+    # Load the model before taking traffic
+    get_model()
+
     # Run the Flask app
     app.run(host='0.0.0.0', port=5000)
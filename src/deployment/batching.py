@@ -0,0 +1,181 @@
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+import numpy as np
+import pandas as pd
+from src.modeling.cascade import score_rows
+from src.modeling.shadow import observe_shadow
+from src.monitoring.drift import observe_drift
+from src.monitoring.metrics import METRICS
+from src.processing.enrichment import enrich_frame
+from src.processing.schema_validation import SchemaValidationError
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Batching configuration
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "32"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "2"))
+BATCH_RESULT_TIMEOUT_SECONDS = float(os.getenv("BATCH_RESULT_TIMEOUT_SECONDS", "5"))
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+class _PendingRow:
+    """A queued request row and the future its caller is waiting on."""
+
+    __slots__ = ("record", "future", "enqueued_at")
+
+    def __init__(self, record):
+        self.record = record
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+class DynamicBatcher:
+    """Coalesces concurrent single-row prediction requests into one vectorized predict_proba call.
+
+    A background thread takes the first queued row, then keeps collecting until the batch holds
+    max_batch_size rows or max_wait_ms has passed since that first row, scores the batch once and
+    hands each caller its own (label, fraud_score). With a validator, each batch is validated
+    column-wise first and invalid rows fail with SchemaValidationError without reaching the model.
+    """
+
+    def __init__(self, model_getter, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS,
+                 service="api", registry=METRICS, validator=None):
+        self.model_getter = model_getter
+        self.validator = validator
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.service = service
+        self.registry = registry
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="dynamic-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, record):
+        """Queue a transaction dict for scoring and return a Future for its (label, fraud_score)."""
+        if self._closed:
+            raise RuntimeError("Batcher is closed.")
+        if not isinstance(record, dict):
+            raise ValueError("Transaction must be a JSON object.")
+        pending = _PendingRow(record)
+        self._queue.put(pending)
+        return pending.future
+
+    def predict(self, record, timeout=BATCH_RESULT_TIMEOUT_SECONDS):
+        """Score one transaction through the batcher and return (label, fraud_score)."""
+        return self.submit(record).result(timeout=timeout)
+
+    def close(self):
+        """Stop the flusher thread after the rows already queued have been scored."""
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self, first):
+        """Gather rows for one batch, starting with the given row."""
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                # Rows already waiting are taken without blocking, even once the deadline has passed
+                pending = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if pending is None:
+                self._queue.put(None)
+                break
+            batch.append(pending)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            try:
+                self._score(batch)
+            except Exception as e:
+                logger.error(f"Batch scoring failed: {str(e)}")
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+
+    def _score(self, batch):
+        """Score a batch with one model call, falling back to row-by-row if the batch is rejected."""
+        started = time.perf_counter()
+        for pending in batch:
+            self.registry.observe("fraud_batch_queue_delay_seconds", started - pending.enqueued_at, service=self.service)
+        self.registry.observe_value("fraud_batch_size", len(batch), BATCH_SIZE_BUCKETS, service=self.service)
+
+        if self.validator is not None:
+            batch = self._reject_invalid(batch)
+            if not batch:
+                return
+        model = self.model_getter()
+        if model is None:
+            raise RuntimeError("Model is not loaded.")
+        try:
+            results = score_records(model, [pending.record for pending in batch], self.service)
+        except Exception as e:
+            # One malformed row (e.g. missing or extra fields) must not fail its neighbours
+            if len(batch) == 1:
+                raise
+            logger.warning(f"Batch of {len(batch)} rejected ({str(e)}); scoring rows individually.")
+            for pending in batch:
+                try:
+                    pending.future.set_result(score_records(model, [pending.record], self.service)[0])
+                except Exception as row_error:
+                    pending.future.set_exception(row_error)
+            return
+        for pending, result in zip(batch, results):
+            pending.future.set_result(result)
+
+    def _reject_invalid(self, batch):
+        """Fail the callers of rows that do not match the schema and return the valid rows."""
+        result = self.validator.validate_batch([pending.record for pending in batch])
+        if not result.invalid_count:
+            return batch
+        valid = []
+        for row, pending in enumerate(batch):
+            if result.valid[row]:
+                valid.append(pending)
+            else:
+                pending.future.set_exception(SchemaValidationError(result.row_errors(row)))
+        return valid
+
+def score_frame(model, frame):
+    """Score a feature frame with a single predict_proba call and return (labels, fraud scores).
+
+    Transactions also carry metadata such as transaction_id and string reference attributes; a
+    model fit on a DataFrame is given only the columns it was trained on. Rows a cascade decided
+    before the last tree have a NaN score, which the drift and shadow monitors leave out.
+    """
+    features = getattr(model, "feature_names_in_", None)
+    if features is not None:
+        frame = frame[list(features)]
+    return score_rows(model, frame)
+
+def score_records(model, records, service=None):
+    """Score transaction dicts with a single predict_proba call and return (label, fraud_score) per row.
+
+    With a service name, the scored batch is also added to that service's drift sketches and
+    handed to its shadow candidates, which reuse the enriched frame instead of rebuilding it.
+    """
+    frame = pd.DataFrame.from_records(records)
+    # A field given by some rows of the batch but not others is missing, not a value for the model
+    given = [name for name in getattr(model, "feature_names_in_", ()) if name in frame.columns]
+    if frame[given].isna().to_numpy().any():
+        raise ValueError("Transactions are missing model features.")
+    frame = enrich_frame(frame)
+    started = time.perf_counter()
+    labels, scores = score_frame(model, frame)
+    if service is not None:
+        observe_shadow(service, frame, labels, scores, time.perf_counter() - started, model.classes_)
+        observe_drift(service, frame, scores, labels)
+    return [(label.item(), float(score)) for label, score in zip(labels, scores)]
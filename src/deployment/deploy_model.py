@@ -1,11 +1,6 @@
 import os
+import sys
 import logging
-import joblib
-from azure.storage.blob import BlobServiceClient
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report
-import pandas as pd
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -15,9 +10,15 @@ logger = logging.getLogger(__name__)
 AZURE_BLOB_CONNECTION_STRING = os.getenv("AZURE_BLOB_CONNECTION_STRING")
 BLOB_CONTAINER_NAME = "fraud-events"  # Name of the blob container
 MODEL_BLOB_NAME = "fraud_detection_model.pkl"  # Name of the saved model in Blob Storage
+MODEL_LOCAL_PATH = os.getenv("MODEL_LOCAL_PATH", "fraud_detection_model.pkl")  # Model written by train_model
 
 def train_model(data):
     """Train a fraud detection model."""
+    # scikit-learn is imported on first use so importing this module stays cheap
+    from sklearn.model_selection import train_test_split
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import classification_report
+
     # Split data into features and target
     X = data.drop(columns=['is_fraud'])  # Assuming 'is_fraud' is the target column
     y = data['is_fraud']
@@ -39,6 +40,9 @@ def train_model(data):
 def save_model_to_blob(model):
     """Save the trained model to Azure Blob Storage."""
     try:
+        import joblib
+        from azure.storage.blob import BlobServiceClient
+
         # Serialize the model using joblib
         joblib.dump(model, MODEL_BLOB_NAME)
 
@@ -53,17 +57,27 @@ def save_model_to_blob(model):
     except Exception as e:
         logger.error(f"Failed to save model to blob: {str(e)}")
 
-def main():
-    """Main function to train and deploy the model."""
-    # Load your data for training (assuming data is in a suitable format)
-    # You would replace this part with actual data ingestion code
-    data = pd.read_csv("path/to/your/fraud_data.csv")  # Update with your data source
+def deploy_model_file(model_path=MODEL_LOCAL_PATH):
+    """Upload a trained model file to Azure Blob Storage; returns True on success."""
+    try:
+        from azure.storage.blob import BlobServiceClient
 
-    # Train the model
-    model = train_model(data)
+        blob_service_client = BlobServiceClient.from_connection_string(AZURE_BLOB_CONNECTION_STRING)
+        blob_client = blob_service_client.get_blob_client(container=BLOB_CONTAINER_NAME, blob=MODEL_BLOB_NAME)
 
-    # Save the model to Azure Blob Storage
-    save_model_to_blob(model)
+        with open(model_path, "rb") as model_file:
+            blob_client.upload_blob(model_file, overwrite=True)
+
+        logger.info(f"Model {model_path} deployed to Azure Blob Storage as {MODEL_BLOB_NAME} successfully.")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to deploy model {model_path}: {str(e)}")
+        return False
+
+def main():
+    """Main function to deploy the model trained by src.modeling.train_model."""
+    # The train stage writes the model file; deploying it does not retrain
+    return 0 if deploy_model_file() else 1
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,94 @@
+import os
+import gc
+import logging
+from gunicorn.app.base import BaseApplication
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Serving configuration; WEB_CONCURRENCY is the conventional gunicorn worker-count variable
+CPU_COUNT = os.cpu_count() or 1
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '5000')}")
+# Scoring is CPU-bound, so one worker per core; two threads per core in total overlap request I/O,
+# and fewer workers than cores get more threads each so the cores stay busy
+workers = int(os.getenv("WEB_CONCURRENCY", str(CPU_COUNT)))
+threads = int(os.getenv("WEB_THREADS", str(max(2, 2 * CPU_COUNT // max(1, workers)))))
+worker_class = "gthread" if threads > 1 else "sync"
+# Load the app (and the model) once in the master so forked workers share its pages copy-on-write
+preload_app = True
+timeout = int(os.getenv("WEB_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("WEB_KEEPALIVE", "5"))
+# Recycle workers occasionally to bound memory growth; jitter avoids restarting them all at once
+max_requests = int(os.getenv("WEB_MAX_REQUESTS", "0"))
+max_requests_jitter = max(1, max_requests // 10) if max_requests else 0
+accesslog = os.getenv("WEB_ACCESS_LOG")  # Disabled by default; one line per request is costly at high rates
+
+def when_ready(server):
+    """Freeze the preloaded heap so garbage collection in workers doesn't dirty the shared pages."""
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"Serving with {workers} workers x {threads} threads ({worker_class}).")
+
+def on_reload(server):
+    """On SIGHUP, reload the model in the master before gunicorn forks new workers.
+
+    The new workers inherit the new model copy-on-write while the old ones finish their
+    in-flight requests within graceful_timeout, so no request is dropped.
+    """
+    from src.deployment import api_integration
+    gc.unfreeze()
+    api_integration.reload_model()
+    gc.collect()
+    gc.freeze()
+
+def post_worker_init(worker):
+    """Install the profiling signal handler after gunicorn has reset the worker's signals."""
+    from src.deployment import api_integration
+    from src.monitoring.profiling import install_signal_handler
+    install_signal_handler(api_integration.SERVICE_NAME)
+
+def gunicorn_options():
+    """Return the settings above as a gunicorn options dict."""
+    return {
+        "bind": bind,
+        "workers": workers,
+        "threads": threads,
+        "worker_class": worker_class,
+        "preload_app": preload_app,
+        "timeout": timeout,
+        "graceful_timeout": graceful_timeout,
+        "keepalive": keepalive,
+        "max_requests": max_requests,
+        "max_requests_jitter": max_requests_jitter,
+        "accesslog": accesslog,
+        "when_ready": when_ready,
+        "on_reload": on_reload,
+        "post_worker_init": post_worker_init,
+    }
+
+class FraudDetectionApplication(BaseApplication):
+    """Gunicorn application serving the Flask app from api_integration."""
+
+    def __init__(self, options=None):
+        self.options = options or {}
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        from src.deployment import api_integration
+        # With preload_app this runs in the master, so the model is loaded once and shared by the workers
+        api_integration.get_model()
+        return api_integration.app
+
+def main():
+    """Run the API under gunicorn. Send SIGHUP to the master to reload the model without downtime."""
+    FraudDetectionApplication(gunicorn_options()).run()
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,12 @@ import os
 import json
 import logging
 import time
-from azure.eventhub import EventHubConsumerClient, EventHubError
-from azure.storage.blob import BlobServiceClient, BlobServiceError
-from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+from src.ingestion.blob_discovery import partition_path
+from src.ingestion.dead_letter import CheckpointTracker, DeadLetterQueue, RetryQueue
+from src.ingestion.event_source import create_consumer_client
+from src.processing.schema_validation import TRANSACTION_VALIDATOR
+from src.monitoring.metrics import METRICS, record_eventhub_lag, start_metrics_server
+from src.monitoring.profiling import admin_routes, install_signal_handler
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -14,72 +17,122 @@ EVENT_HUB_CONNECTION_STRING = os.getenv("EVENT_HUB_CONNECTION_STRING", "Endpoint
 EVENT_HUB_NAME = os.getenv("EVENT_HUB_NAME", "fraudDetectionHub")
 BLOB_CONNECTION_STRING = os.getenv("BLOB_CONNECTION_STRING", "DefaultEndpointsProtocol=https;AccountName=myblobstorageaccount;AccountKey=myBlobStorageKey;EndpointSuffix=core.windows.net")
 BLOB_CONTAINER_NAME = os.getenv("BLOB_CONTAINER_NAME", "fraud-events")
+METRICS_PORT = int(os.getenv("EVENTHUB_SOURCE_METRICS_PORT", "9101"))  # Sidecar port, distinct from the predict consumer
+SERVICE_NAME = "eventhub_source"  # Service label used in the exported metrics
 
-# Create a Blob Service Client
-blob_service_client = BlobServiceClient.from_connection_string(BLOB_CONNECTION_STRING)
+# Blob Service Client, created on first use by get_blob_service_client(); assign a client to inject one
+blob_service_client = None
 
-def save_event_to_blob(event_data):
+def get_blob_service_client():
+    """Return the blob service client, creating it from the connection string on first use."""
+    global blob_service_client
+    if blob_service_client is None:
+        from azure.storage.blob import BlobServiceClient
+        blob_service_client = BlobServiceClient.from_connection_string(BLOB_CONNECTION_STRING)
+    return blob_service_client
+
+# Poison events go to the dead-letter sink and failed blob writes are retried off the hot path; the
+# checkpoint only passes events that were stored or dead-lettered, so a pending retry is never lost
+DEAD_LETTERS = DeadLetterQueue(SERVICE_NAME)
+RETRIES = RetryQueue(DEAD_LETTERS)
+CHECKPOINTS = CheckpointTracker(SERVICE_NAME)
+
+def save_event_to_blob(event_data, enqueued_time=None):
     """Save the event data to Azure Blob Storage."""
+    # The SDK's exception types are imported here, so the module itself imports without the Azure SDKs
+    from azure.core.exceptions import AzureError, ResourceExistsError, ResourceNotFoundError
     try:
         # Convert the event data to a JSON string
         json_data = json.dumps(event_data)
-        # Create a blob client for the specified container
-        blob_client = blob_service_client.get_blob_client(container=BLOB_CONTAINER_NAME, blob=f"events/{event_data['transaction_id']}.json")
+        # Create a blob client for the specified container; blobs are partitioned by hour so the
+        # processing stages can list only recent partitions
+        blob_name = f"{partition_path(enqueued_time)}{event_data['transaction_id']}.json"
+        blob_client = get_blob_service_client().get_blob_client(container=BLOB_CONTAINER_NAME, blob=blob_name)
         
         # Upload the JSON data to the blob
         blob_client.upload_blob(json_data, overwrite=True)
         logging.info(f"Uploaded event data to blob: {event_data['transaction_id']}.json")
+        return True
     except ResourceExistsError:
         logging.warning(f"Blob {event_data['transaction_id']}.json already exists. Overwriting...")
         blob_client.upload_blob(json_data, overwrite=True)
+        return True
     except ResourceNotFoundError:
         logging.error(f"Blob container {BLOB_CONTAINER_NAME} not found.")
-    except BlobServiceError as e:
+    except AzureError as e:
         logging.error(f"Blob service error: {e}")
     except Exception as e:
         logging.error(f"Error saving event to blob: {e}")
+    return False
 
 def on_event(partition_context, event):
     """Event handler for processing incoming events."""
+    timer = METRICS.start_event(SERVICE_NAME)
+    record_eventhub_lag(SERVICE_NAME, partition_context, event)
+    entry = CHECKPOINTS.track(partition_context, event)
+
+    def resolve_later(handled):
+        # Called by the retry thread once a retried operation or dead-letter write has an outcome
+        CHECKPOINTS.resolve(partition_context, entry, handled)
+
+    handled = False  # True once stored or dead-lettered; None while a retry is pending
     try:
         # Deserialize the event data
-        event_data = json.loads(event.body_as_str())
+        with timer.stage("decode"):
+            event_data = json.loads(event.body_as_str())
         logging.info(f"Received event: {event_data}")
 
-        # Save the event data to Azure Blob Storage
-        save_event_to_blob(event_data)
-        
-        # Checkpoint after processing the event
-        partition_context.update_checkpoint(event)
+        # Malformed events are not stored; they are dead-lettered and the checkpoint advances past them
+        with timer.stage("validate"):
+            errors = TRANSACTION_VALIDATOR.validate_record(event_data)
+        if errors:
+            METRICS.inc("fraud_errors_total", service=SERVICE_NAME, stage="validate")
+            handled = RETRIES.dead_letter("validate", ", ".join(errors), partition_context, event, resolve_later)
+        else:
+            # Save the event data to Azure Blob Storage; a failed write is retried in the background
+            # and the retry resolves the event's checkpoint once it is stored or dead-lettered
+            with timer.stage("blob_io"):
+                handled = save_event_to_blob(event_data, event.enqueued_time) or None
+                if handled is None:
+                    RETRIES.submit(lambda: save_event_to_blob(event_data, event.enqueued_time), partition_context, event,
+                                   reason="blob_io", on_done=resolve_later)
     except json.JSONDecodeError as e:
-        logging.error(f"Error decoding JSON: {e}")
+        METRICS.inc("fraud_errors_total", service=SERVICE_NAME, stage="decode")
+        handled = RETRIES.dead_letter("decode", e, partition_context, event, resolve_later)
     except Exception as e:
-        logging.error(f"Error processing event: {e}")
+        METRICS.inc("fraud_errors_total", service=SERVICE_NAME, stage="process")
+        handled = RETRIES.dead_letter("process", e, partition_context, event, resolve_later)
+
+    # Checkpoint past this event, and any resolved ones before it, unless its retry is still pending
+    if handled is not None:
+        with timer.stage("checkpoint"):
+            CHECKPOINTS.resolve(partition_context, entry, handled)
 
 def main():
     """Main function to start the Event Hub consumer."""
     # Create a consumer client for Event Hubs
-    client = EventHubConsumerClient.from_connection_string(
-        conn_str=EVENT_HUB_CONNECTION_STRING,
-        consumer_group="$Default",
-        eventhub_name=EVENT_HUB_NAME
-    )
+    client = create_consumer_client(EVENT_HUB_CONNECTION_STRING, EVENT_HUB_NAME)
+
+    # Expose metrics and the admin profiling trigger on a sidecar port, since the consumer has no web server
+    start_metrics_server(METRICS_PORT, post_routes=admin_routes(SERVICE_NAME))
+    install_signal_handler(SERVICE_NAME)
 
     try:
         # Start receiving events
         with client:
-            client.receive(on_event=on_event, starting_position="@latest")
+            client.receive(on_event=on_event, starting_position="@latest", track_last_enqueued_event_properties=True)
             logging.info("Listening for events...")
             # Keep the script running
             while True:
                 time.sleep(1)  # Sleep to reduce CPU usage
     except KeyboardInterrupt:
         logging.info("Event processing stopped.")
-    except EventHubError as e:
-        logging.error(f"Event Hub error: {e}")
     except Exception as e:
-        logging.error(f"Unexpected error: {e}")
+        # Event Hub SDK errors (EventHubError and its subclasses) end up here too; name the type in the log
+        logging.error(f"Event Hub consumer stopped with {type(e).__name__}: {e}")
     finally:
+        # Resolve the pending retries first, so their checkpoints can still be written
+        RETRIES.close()
         client.close()
         logging.info("Event Hub consumer client closed.")
 
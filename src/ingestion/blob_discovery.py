@@ -0,0 +1,160 @@
+import os
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Discovery configuration
+EVENTS_PREFIX = "events/"  # Event blobs live under events/YYYY/MM/DD/HH/
+PARTITION_FORMAT = "%Y/%m/%d/%H/"
+PARTITION_LENGTH = len("YYYY/MM/DD/HH/")
+MANIFEST_DIR = os.getenv("DISCOVERY_MANIFEST_DIR", "data/manifests")
+# Partitions behind the watermark that are still relisted, so late or rewritten blobs are picked up
+LATE_ARRIVAL_HOURS = int(os.getenv("DISCOVERY_LATE_ARRIVAL_HOURS", "2"))
+SUPPORTED_SUFFIXES = (".json", ".csv", ".xml")  # Formats the processing stages can load
+
+def partition_path(timestamp=None, prefix=EVENTS_PREFIX):
+    """Return the hourly partition prefix for a timestamp, e.g. events/2024/05/01/13/."""
+    timestamp = timestamp or datetime.now(timezone.utc)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc)
+    return prefix + timestamp.strftime(PARTITION_FORMAT)
+
+def partition_time(blob_name, prefix=EVENTS_PREFIX):
+    """Return the UTC hour a partitioned blob name belongs to, or None for blobs outside the layout."""
+    if not blob_name.startswith(prefix):
+        return None
+    try:
+        hour = datetime.strptime(blob_name[len(prefix):len(prefix) + PARTITION_LENGTH], PARTITION_FORMAT)
+    except ValueError:
+        return None
+    return hour.replace(tzinfo=timezone.utc)
+
+def partition_prefixes(since, until, prefix=EVENTS_PREFIX):
+    """Return the hourly partition prefixes from since to until, both inclusive."""
+    hour = since.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    prefixes = []
+    while hour <= until:
+        prefixes.append(partition_path(hour, prefix))
+        hour += timedelta(hours=1)
+    return prefixes
+
+class BlobManifest:
+    """Durable record of processed blobs (name, ETag, size) and the listing watermark, kept as local JSON."""
+
+    def __init__(self, path):
+        self.path = path
+        self.watermark = None
+        self.blobs = {}
+        self.load()
+
+    def load(self):
+        """Load the manifest, starting empty if it does not exist yet."""
+        try:
+            with open(self.path) as manifest_file:
+                state = json.load(manifest_file)
+        except FileNotFoundError:
+            return
+        except json.JSONDecodeError as e:
+            logger.error(f"Manifest {self.path} is corrupt, rediscovering from scratch: {str(e)}")
+            return
+        self.watermark = datetime.fromisoformat(state["watermark"]) if state.get("watermark") else None
+        self.blobs = state.get("blobs", {})
+
+    def save(self):
+        """Write the manifest atomically so a crash never leaves it half written."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        state = {
+            "watermark": self.watermark.isoformat() if self.watermark else None,
+            "blobs": self.blobs,
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as manifest_file:
+            json.dump(state, manifest_file, indent=4)
+        os.replace(tmp_path, self.path)
+
+    def is_processed(self, blob):
+        """Return True if this exact version of the blob has already been processed."""
+        entry = self.blobs.get(blob.name)
+        return entry is not None and entry["etag"] == blob.etag and entry["size"] == blob.size
+
+    def record(self, blob):
+        """Record a processed blob version."""
+        self.blobs[blob.name] = {"etag": blob.etag, "size": blob.size}
+
+class IncrementalBlobSource:
+    """Hands a processing stage only the blobs that are new or changed since its previous run.
+
+    The first run lists the whole prefix once. Later runs list only the hourly partitions from
+    LATE_ARRIVAL_HOURS before the watermark up to now, so list calls and reprocessing grow with
+    new data rather than with the container's history. Blobs outside the partitioned layout are
+    only picked up by the first, full listing.
+    """
+
+    def __init__(self, container_client, manifest_path, prefix=EVENTS_PREFIX, late_arrival_hours=LATE_ARRIVAL_HOURS,
+                 suffixes=SUPPORTED_SUFFIXES):
+        self.container_client = container_client
+        self.prefix = prefix
+        self.suffixes = tuple(suffixes)
+        self.late_arrival = timedelta(hours=late_arrival_hours)
+        self.manifest = BlobManifest(manifest_path)
+        self._listed_until = None
+        self._pending = {}
+
+    def discover(self, now=None):
+        """List the partitions in the window and return properties of unprocessed blobs in name order."""
+        now = now or datetime.now(timezone.utc)
+        if self.manifest.watermark is None:
+            prefixes = [self.prefix]
+        else:
+            prefixes = partition_prefixes(self.manifest.watermark - self.late_arrival, now, self.prefix)
+
+        discovered = []
+        for prefix in prefixes:
+            for blob in self.container_client.list_blobs(name_starts_with=prefix):
+                if blob.name.endswith(self.suffixes) and not self.manifest.is_processed(blob):
+                    discovered.append(blob)
+        self._listed_until = now
+        self._pending = {blob.name: blob for blob in discovered}
+        logger.info(f"Discovered {len(discovered)} new or changed blobs in {len(prefixes)} listed prefixes.")
+        return discovered
+
+    def mark_processed(self, blob):
+        """Record a blob as processed; persisted immediately so a crash does not redo finished work."""
+        self.manifest.record(blob)
+        self._pending.pop(blob.name, None)
+        self.manifest.save()
+
+    def advance_watermark(self):
+        """Move the watermark up to the last listing, holding it back for blobs that failed to process.
+
+        Entries for partitions that will never be listed again are dropped to keep the manifest small.
+        """
+        if self._listed_until is None:
+            return self.manifest.watermark
+        pending_hours = [partition_time(name, self.prefix) for name in self._pending]
+        if None in pending_hours and self.manifest.watermark is None:
+            # A blob outside the layout failed on the full listing; keep listing everything until it succeeds
+            self.manifest.save()
+            logger.warning(f"{len(self._pending)} blobs were not processed and will be retried on the next run.")
+            return None
+        watermark = min([hour for hour in pending_hours if hour is not None] + [self._listed_until])
+        if self.manifest.watermark is None or watermark > self.manifest.watermark:
+            self.manifest.watermark = watermark
+
+        horizon = (self.manifest.watermark - self.late_arrival).replace(minute=0, second=0, microsecond=0)
+        self.manifest.blobs = {
+            name: entry for name, entry in self.manifest.blobs.items()
+            if (partition_time(name, self.prefix) or datetime.min.replace(tzinfo=timezone.utc)) >= horizon
+        }
+        self.manifest.save()
+        if self._pending:
+            logger.warning(f"{len(self._pending)} blobs were not processed and will be retried on the next run.")
+        return self.manifest.watermark
+
+def manifest_path(consumer, manifest_dir=MANIFEST_DIR):
+    """Return the manifest file for a processing stage; each stage tracks its own progress."""
+    return os.path.join(manifest_dir, f"{consumer}.json")
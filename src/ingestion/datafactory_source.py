@@ -1,18 +1,6 @@
 import os
 import json
 import logging
-from azure.identity import DefaultAzureCredential
-from azure.mgmt.datafactory import DataFactoryManagementClient
-from azure.mgmt.datafactory.models import (
-    DataFactory,
-    PipelineResource,
-    DatasetResource,
-    LinkedServiceResource,
-    CopyActivity,
-    BlobSink,
-    BlobSource,
-    AzureBlobStorageLinkedService,
-)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -39,19 +27,28 @@ DATA_SOURCES = {
     },
 }
 
-# Initialize Azure Data Factory client
-credential = DefaultAzureCredential()
-data_factory_client = DataFactoryManagementClient(credential, AZURE_SUBSCRIPTION_ID)
+# Azure Data Factory client, created on first use by get_data_factory_client(); assign a client to inject one
+data_factory_client = None
+
+def get_data_factory_client():
+    """Return the Data Factory management client, authenticating with DefaultAzureCredential on first use."""
+    global data_factory_client
+    if data_factory_client is None:
+        from azure.identity import DefaultAzureCredential
+        from azure.mgmt.datafactory import DataFactoryManagementClient
+        data_factory_client = DataFactoryManagementClient(DefaultAzureCredential(), AZURE_SUBSCRIPTION_ID)
+    return data_factory_client
 
 def create_linked_service():
     """Create a linked service to Azure Blob Storage."""
     try:
+        from azure.mgmt.datafactory.models import AzureBlobStorageLinkedService, LinkedServiceResource
         linked_service_name = "AzureBlobStorageLinkedService"
         linked_service = AzureBlobStorageLinkedService(
             connection_string=os.getenv("AZURE_BLOB_CONNECTION_STRING")
         )
         
-        data_factory_client.linked_services.create_or_update(
+        get_data_factory_client().linked_services.create_or_update(
             RESOURCE_GROUP_NAME,
             DATA_FACTORY_NAME,
             linked_service_name,
@@ -64,6 +61,7 @@ def create_linked_service():
 def create_datasets():
     """Create datasets for each data source."""
     try:
+        from azure.mgmt.datafactory.models import DatasetResource
         for name, config in DATA_SOURCES.items():
             dataset = {
                 "name": name,
@@ -74,7 +72,7 @@ def create_datasets():
                     "path": config["path"],
                 }
             }
-            data_factory_client.datasets.create_or_update(
+            get_data_factory_client().datasets.create_or_update(
                 RESOURCE_GROUP_NAME,
                 DATA_FACTORY_NAME,
                 name,
@@ -87,6 +85,7 @@ def create_datasets():
 def create_pipeline():
     """Create a pipeline for copying data from Blob storage to the Data Lake."""
     try:
+        from azure.mgmt.datafactory.models import BlobSink, BlobSource, CopyActivity, PipelineResource
         pipeline_name = "CopyDataPipeline"
         activities = []
         
@@ -105,7 +104,7 @@ def create_pipeline():
             description="Pipeline to copy transaction data from Blob storage"
         )
 
-        data_factory_client.pipelines.create_or_update(
+        get_data_factory_client().pipelines.create_or_update(
             RESOURCE_GROUP_NAME,
             DATA_FACTORY_NAME,
             pipeline_name,
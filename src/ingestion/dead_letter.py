@@ -0,0 +1,323 @@
+import os
+import json
+import time
+import heapq
+import base64
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from src.monitoring.metrics import METRICS, record_checkpoint
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Dead-letter configuration; a blob container takes precedence over the local directory when set
+DEAD_LETTER_DIR = os.getenv("DEAD_LETTER_DIR", "dead_letter")
+DEAD_LETTER_CONTAINER = os.getenv("DEAD_LETTER_CONTAINER")
+DEAD_LETTER_PREFIX = os.getenv("DEAD_LETTER_PREFIX", "dead-letter/")
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "5"))
+RETRY_BASE_DELAY_SECONDS = float(os.getenv("RETRY_BASE_DELAY_SECONDS", "0.5"))
+RETRY_MAX_DELAY_SECONDS = float(os.getenv("RETRY_MAX_DELAY_SECONDS", "30"))
+RETRY_QUEUE_SIZE = int(os.getenv("RETRY_QUEUE_SIZE", "10000"))  # Beyond this, failures are dead-lettered at once
+
+def event_body(event):
+    """Return the event body as text, or base64 if it is not valid UTF-8."""
+    try:
+        return event.body_as_str(encoding="UTF-8"), "utf-8"
+    except Exception:
+        try:
+            return base64.b64encode(b"".join(event.body)).decode("ascii"), "base64"
+        except Exception:
+            return None, None
+
+def dead_letter_record(service, reason, error, partition_context=None, event=None, attempts=1):
+    """Build the dead-letter record for an event: why it failed, where it came from and its raw body."""
+    body, encoding = event_body(event) if event is not None else (None, None)
+    enqueued_time = getattr(event, "enqueued_time", None)
+    return {
+        "service": service,
+        "reason": reason,
+        "error": str(error),
+        "attempts": attempts,
+        "partition_id": getattr(partition_context, "partition_id", None),
+        "sequence_number": getattr(event, "sequence_number", None),
+        "offset": getattr(event, "offset", None),
+        "enqueued_time": enqueued_time.isoformat() if enqueued_time is not None else None,
+        "dead_lettered_at": datetime.now(timezone.utc).isoformat(),
+        "body": body,
+        "body_encoding": encoding,
+    }
+
+class LocalDeadLetterSink:
+    """Appends dead-letter records as JSON lines to one file per service and day."""
+
+    def __init__(self, directory=DEAD_LETTER_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        """Append a record; returns True if it was written."""
+        day = record["dead_lettered_at"][:10].replace("-", "")
+        path = os.path.join(self.directory, record["service"], f"{day}.jsonl")
+        try:
+            with self._lock:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "a") as dead_letter_file:
+                    dead_letter_file.write(json.dumps(record) + "\n")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to write dead letter to {path}: {str(e)}")
+            return False
+
+class BlobDeadLetterSink:
+    """Writes each dead-letter record as its own blob under prefix/service/partition/."""
+
+    def __init__(self, container_client, prefix=DEAD_LETTER_PREFIX):
+        self.container_client = container_client
+        self.prefix = prefix
+
+    def write(self, record):
+        """Upload a record; returns True if it was written."""
+        name = (f"{self.prefix}{record['service']}/{record['partition_id']}/"
+                f"{record['sequence_number']}-{record['dead_lettered_at'].replace(':', '')}.json")
+        try:
+            self.container_client.get_blob_client(name).upload_blob(json.dumps(record), overwrite=True)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to write dead letter to blob {name}: {str(e)}")
+            return False
+
+class DeadLetterQueue:
+    """Sends poison events to a sink and counts them, so the consumer can checkpoint past them."""
+
+    def __init__(self, service, sink=None):
+        self.service = service
+        self._sink = sink
+
+    @property
+    def sink(self):
+        """The sink records are written to, created from the environment on first use."""
+        if self._sink is None:
+            self._sink = create_dead_letter_sink()
+        return self._sink
+
+    def send(self, reason, error, partition_context=None, event=None, attempts=1):
+        """Dead-letter an event; returns True if the sink accepted it."""
+        record = dead_letter_record(self.service, reason, error, partition_context, event, attempts)
+        METRICS.inc("fraud_dead_letters_total", service=self.service, reason=reason)
+        logger.warning(f"Dead-lettering event {record['sequence_number']} of partition {record['partition_id']} ({reason}): {error}")
+        return self.sink.write(record)
+
+class _RetryTask:
+    """A failed operation waiting for its next attempt."""
+
+    __slots__ = ("operation", "partition_context", "event", "reason", "on_done", "attempts", "last_error")
+
+    def __init__(self, operation, partition_context, event, reason, on_done):
+        self.operation = operation
+        self.partition_context = partition_context
+        self.event = event
+        self.reason = reason
+        self.on_done = on_done
+        self.attempts = 1
+        self.last_error = None
+
+    def done(self, handled):
+        """Report whether the event ended up written or dead-lettered."""
+        if self.on_done is not None:
+            self.on_done(handled)
+
+class RetryQueue:
+    """Retries failed operations on a background thread with bounded attempts and exponential backoff.
+
+    The consumer hands over an operation that failed once and moves on, so a transient blob error
+    does not hold up the partition. An operation fails when it raises or returns False; after
+    max_attempts it is dead-lettered. When the queue is full, new failures are dead-lettered at once.
+    The queue is in memory only: on_done(handled) is called once the operation succeeded (True) or
+    its dead-lettering did or did not succeed, so the caller can hold the checkpoint until then.
+    """
+
+    def __init__(self, dead_letters, max_attempts=RETRY_MAX_ATTEMPTS, base_delay=RETRY_BASE_DELAY_SECONDS,
+                 max_delay=RETRY_MAX_DELAY_SECONDS, max_size=RETRY_QUEUE_SIZE):
+        self.dead_letters = dead_letters
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_size = max_size
+        self._heap = []  # (due time, tie-breaker, task)
+        self._counter = 0
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = None
+
+    def submit(self, operation, partition_context=None, event=None, reason="retry_exhausted", on_done=None):
+        """Schedule a retry of an operation that has already failed once."""
+        task = _RetryTask(operation, partition_context, event, reason, on_done)
+        with self._condition:
+            if self._closed or len(self._heap) >= self.max_size:
+                full = True
+            else:
+                full = False
+                self._schedule(task)
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="retry-queue", daemon=True)
+                    self._thread.start()
+        if full:
+            task.done(self.dead_letters.send("retry_queue_full", "Retry queue is full.", partition_context, event,
+                                             task.attempts))
+
+    def dead_letter(self, reason, error, partition_context=None, event=None, on_done=None):
+        """Dead-letter an event; returns True if the sink accepted it.
+
+        If the sink rejects it, the write is retried in the background and on_done(handled) reports
+        whether it was eventually accepted.
+        """
+        if self.dead_letters.send(reason, error, partition_context, event):
+            return True
+        record_error = str(error)
+        self.submit(lambda: self.dead_letters.sink.write(dead_letter_record(self.dead_letters.service, reason, record_error,
+                                                                             partition_context, event)),
+                    partition_context, event, reason=reason, on_done=on_done)
+        return False
+
+    def pending(self):
+        """Number of operations waiting for a retry."""
+        with self._condition:
+            return len(self._heap)
+
+    def close(self, timeout=None):
+        """Stop retrying and dead-letter whatever is still waiting, so no event is silently dropped."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        with self._condition:
+            remaining = [task for _, _, task in self._heap]
+            self._heap.clear()
+        for task in remaining:
+            task.done(self.dead_letters.send("shutdown", task.last_error or "Retry pending at shutdown.",
+                                             task.partition_context, task.event, task.attempts))
+
+    def _schedule(self, task):
+        delay = min(self.max_delay, self.base_delay * 2 ** (task.attempts - 1))
+        self._counter += 1
+        heapq.heappush(self._heap, (time.monotonic() + delay, self._counter, task))
+        self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and (not self._heap or self._heap[0][0] > time.monotonic()):
+                    self._condition.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                if self._closed:
+                    return
+                _, _, task = heapq.heappop(self._heap)
+
+            task.attempts += 1
+            METRICS.inc("fraud_retries_total", service=self.dead_letters.service)
+            try:
+                succeeded = task.operation() is not False
+            except Exception as e:
+                task.last_error = str(e)
+                succeeded = False
+            if succeeded:
+                task.done(True)
+            elif task.attempts >= self.max_attempts:
+                task.done(self.dead_letters.send(task.reason, task.last_error or "Operation failed.",
+                                                 task.partition_context, task.event, task.attempts))
+            else:
+                with self._condition:
+                    self._schedule(task)
+
+class _PartitionEvents:
+    """The events of one partition not yet checkpointed past, in arrival order."""
+
+    __slots__ = ("entries", "lock", "stalled")
+
+    def __init__(self):
+        self.entries = deque()  # [event, outcome]; outcome None while pending, then True or False
+        self.lock = threading.Lock()
+        self.stalled = False
+
+class CheckpointTracker:
+    """Advances each partition's checkpoint only past events that were processed or dead-lettered.
+
+    The consumer tracks every event as it arrives and resolves it once its outcome is known, possibly
+    later from the retry thread. The checkpoint moves to the newest event whose predecessors are all
+    resolved, so an event with a retry pending is replayed after a restart rather than lost. An event
+    that could neither be processed nor dead-lettered stalls its partition: nothing after it is
+    checkpointed, and fraud_partition_stalled is set so the failure is visible. Later events are
+    still tracked; once the blocking event is resolved again as handled, for instance by a retried
+    dead-letter write, the partition resumes and the gauge is cleared.
+    """
+
+    def __init__(self, service, registry=METRICS):
+        self.service = service
+        self.registry = registry
+        self._partitions = {}
+        self._lock = threading.Lock()
+
+    def _events(self, partition_id):
+        with self._lock:
+            return self._partitions.setdefault(partition_id, _PartitionEvents())
+
+    def track(self, partition_context, event):
+        """Register an arriving event; returns the entry to resolve once the event is handled."""
+        entry = [event, None]
+        partition = self._events(partition_context.partition_id)
+        with partition.lock:
+            partition.entries.append(entry)
+        return entry
+
+    def resolve(self, partition_context, entry, handled):
+        """Record whether an event was processed or dead-lettered, and checkpoint past what is resolved.
+
+        An event may be resolved again, e.g. once a retry dead-letters it; a handled event stays handled.
+        """
+        partition = self._events(partition_context.partition_id)
+        with partition.lock:
+            if entry[1] is not True:
+                entry[1] = bool(handled)
+            last = None
+            while partition.entries and partition.entries[0][1]:
+                last = partition.entries.popleft()[0]
+            blocked = bool(partition.entries) and partition.entries[0][1] is False
+            if blocked and not partition.stalled:
+                # Later events cannot be checkpointed past this one until it is handled
+                partition.stalled = True
+                self.registry.set_gauge("fraud_partition_stalled", 1, service=self.service,
+                                        partition=partition_context.partition_id)
+                logger.error(f"Event {getattr(partition.entries[0][0], 'sequence_number', None)} of partition "
+                             f"{partition_context.partition_id} was neither processed nor dead-lettered; "
+                             f"the partition's checkpoint will not advance until it is.")
+            elif not blocked and partition.stalled:
+                partition.stalled = False
+                self.registry.set_gauge("fraud_partition_stalled", 0, service=self.service,
+                                        partition=partition_context.partition_id)
+                logger.info(f"Partition {partition_context.partition_id} resumed checkpointing.")
+            if last is None:
+                return False
+            # Checkpoints of one partition are written in order, under its lock
+            try:
+                partition_context.update_checkpoint(last)
+                record_checkpoint(self.service, partition_context)
+                return True
+            except Exception as e:
+                self.registry.inc("fraud_errors_total", service=self.service, stage="checkpoint")
+                logger.error(f"Error updating checkpoint: {e}")
+                return False
+
+    def stalled(self, partition_id):
+        """Whether a partition's checkpoint is held by an event that was lost."""
+        return self._events(partition_id).stalled
+
+def create_dead_letter_sink():
+    """Return the blob sink when DEAD_LETTER_CONTAINER is set, otherwise the local-file sink."""
+    if DEAD_LETTER_CONTAINER:
+        from azure.storage.blob import BlobServiceClient
+        client = BlobServiceClient.from_connection_string(os.getenv("AZURE_BLOB_CONNECTION_STRING"))
+        return BlobDeadLetterSink(client.get_container_client(DEAD_LETTER_CONTAINER))
+    return LocalDeadLetterSink()
@@ -0,0 +1,27 @@
+import logging
+from src.ingestion.local_event_hub import LocalConsumerClient, get_local_event_hub
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def create_consumer_client(connection_string, eventhub_name, consumer_group="$Default", source="eventhub"):
+    """Return a consumer client for Azure Event Hubs, or with source="local" for the in-process stand-in.
+
+    Both clients offer receive(on_event, starting_position, track_last_enqueued_event_properties),
+    close() and use as a context manager, so the consumers' handlers run unchanged on either source.
+    The stand-in only exists inside one process: it is for callers that also produce the events,
+    such as benchmarks/replay.py, not for a consumer started on its own.
+    """
+    if source == "local":
+        logger.info(f"Consuming {eventhub_name} from the local Event Hub stand-in.")
+        return LocalConsumerClient(get_local_event_hub(eventhub_name), consumer_group=consumer_group)
+    if source != "eventhub":
+        raise ValueError(f"Unknown event source: {source}")
+    # The SDK is imported here so importing a consumer stays cheap
+    from azure.eventhub import EventHubConsumerClient
+    return EventHubConsumerClient.from_connection_string(
+        conn_str=connection_string,
+        consumer_group=consumer_group,
+        eventhub_name=eventhub_name
+    )
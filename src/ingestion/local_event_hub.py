@@ -0,0 +1,241 @@
+import os
+import json
+import zlib
+import logging
+import threading
+from datetime import datetime, timezone
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Local Event Hub configuration
+LOCAL_EVENT_HUB_PARTITIONS = int(os.getenv("LOCAL_EVENT_HUB_PARTITIONS", "4"))
+LOCAL_RECEIVE_BATCH_SIZE = int(os.getenv("LOCAL_RECEIVE_BATCH_SIZE", "100"))  # Events handed to a partition reader at once
+LOCAL_RECEIVE_WAIT_SECONDS = 0.1  # How long an idle partition reader waits before checking for close()
+
+class LocalEventData:
+    """Stand-in for a received azure.eventhub.EventData."""
+
+    def __init__(self, body, sequence_number, offset, enqueued_time, partition_key=None, properties=None):
+        self.body = [body]
+        self.sequence_number = sequence_number
+        self.offset = offset
+        self.enqueued_time = enqueued_time
+        self.partition_key = partition_key
+        self.properties = properties or {}
+
+    def body_as_str(self, encoding="UTF-8"):
+        """Return the body decoded as text."""
+        return b"".join(self.body).decode(encoding)
+
+    def body_as_json(self, encoding="UTF-8"):
+        """Return the body parsed as JSON."""
+        return json.loads(self.body_as_str(encoding))
+
+class LocalEventHubPartition:
+    """Append-only event log of one partition."""
+
+    def __init__(self, partition_id):
+        self.partition_id = partition_id
+        self.events = []
+        self.next_offset = 0
+        self.condition = threading.Condition()
+
+class LocalEventHub:
+    """In-process stand-in for an Event Hub: partitioned, append-only logs with sequence numbers and offsets.
+
+    Events with the same partition key land in the same partition, as on Event Hubs; events without one
+    are spread round-robin. Sequence numbers start at 0 per partition and offsets are byte positions.
+    """
+
+    def __init__(self, name="fraudDetectionHub", partition_count=LOCAL_EVENT_HUB_PARTITIONS):
+        self.name = name
+        self.partitions = [LocalEventHubPartition(str(i)) for i in range(partition_count)]
+        self._round_robin = 0
+        self._lock = threading.Lock()
+
+    def get_partition_ids(self):
+        """Return the partition ids, like EventHubConsumerClient.get_partition_ids()."""
+        return [partition.partition_id for partition in self.partitions]
+
+    def partition(self, partition_id):
+        """Return the partition with the given id."""
+        return self.partitions[int(partition_id)]
+
+    def send(self, body, partition_key=None, partition_id=None, properties=None):
+        """Append an event and return it; dicts are sent as JSON and strings as UTF-8."""
+        if isinstance(body, dict):
+            body = json.dumps(body)
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        if partition_id is None:
+            if partition_key is not None:
+                partition_id = zlib.crc32(str(partition_key).encode("utf-8")) % len(self.partitions)
+            else:
+                with self._lock:
+                    partition_id = self._round_robin
+                    self._round_robin = (self._round_robin + 1) % len(self.partitions)
+        partition = self.partition(partition_id)
+        with partition.condition:
+            event = LocalEventData(body, len(partition.events), str(partition.next_offset),
+                                   datetime.now(timezone.utc), partition_key, properties)
+            partition.events.append(event)
+            partition.next_offset += len(body)
+            partition.condition.notify_all()
+        return event
+
+    def last_enqueued_event_properties(self, partition_id):
+        """Return the properties of the newest event in the partition, or None if it is empty."""
+        partition = self.partition(partition_id)
+        with partition.condition:
+            if not partition.events:
+                return None
+            last = partition.events[-1]
+        return {
+            "sequence_number": last.sequence_number,
+            "offset": last.offset,
+            "enqueued_time": last.enqueued_time,
+            "retrieval_time": datetime.now(timezone.utc),
+        }
+
+    def read(self, partition_id, start, max_count=LOCAL_RECEIVE_BATCH_SIZE, timeout=LOCAL_RECEIVE_WAIT_SECONDS):
+        """Return up to max_count events from sequence number start, waiting up to timeout for new ones."""
+        partition = self.partition(partition_id)
+        with partition.condition:
+            if len(partition.events) <= start:
+                partition.condition.wait(timeout)
+            return partition.events[start:start + max_count]
+
+    def wake(self):
+        """Wake every waiting reader, e.g. so a closing consumer notices at once."""
+        for partition in self.partitions:
+            with partition.condition:
+                partition.condition.notify_all()
+
+class LocalCheckpointStore:
+    """In-memory stand-in for the blob checkpoint store: the last processed event per partition."""
+
+    def __init__(self):
+        self._checkpoints = {}
+        self._lock = threading.Lock()
+
+    def update_checkpoint(self, checkpoint):
+        """Store a checkpoint dict with eventhub_name, consumer_group, partition_id, sequence_number and offset."""
+        key = (checkpoint["eventhub_name"], checkpoint["consumer_group"], checkpoint["partition_id"])
+        with self._lock:
+            self._checkpoints[key] = dict(checkpoint)
+
+    def list_checkpoints(self, eventhub_name, consumer_group):
+        """Return the checkpoints of a consumer group."""
+        with self._lock:
+            return [dict(checkpoint) for (hub, group, _), checkpoint in self._checkpoints.items()
+                    if hub == eventhub_name and group == consumer_group]
+
+class LocalPartitionContext:
+    """Stand-in for azure.eventhub.PartitionContext."""
+
+    def __init__(self, hub, partition_id, consumer_group, checkpoint_store, track_last_enqueued_event_properties=False):
+        self.eventhub_name = hub.name
+        self.consumer_group = consumer_group
+        self.partition_id = partition_id
+        self._hub = hub
+        self._checkpoint_store = checkpoint_store
+        self._track = track_last_enqueued_event_properties
+
+    @property
+    def last_enqueued_event_properties(self):
+        """Properties of the newest event in the partition; None unless tracking was requested."""
+        return self._hub.last_enqueued_event_properties(self.partition_id) if self._track else None
+
+    def update_checkpoint(self, event):
+        """Record the event as the last one processed in this partition."""
+        self._checkpoint_store.update_checkpoint({
+            "eventhub_name": self.eventhub_name,
+            "consumer_group": self.consumer_group,
+            "partition_id": self.partition_id,
+            "sequence_number": event.sequence_number,
+            "offset": event.offset,
+        })
+
+class LocalConsumerClient:
+    """Stand-in for azure.eventhub.EventHubConsumerClient reading from a LocalEventHub.
+
+    receive() runs one reader thread per partition and blocks until close(), like the SDK. A
+    partition resumes after its checkpoint when there is one, otherwise at starting_position:
+    "-1" for the first event, "@latest" for new events only, or a sequence number to start after.
+    This client owns every partition; there is no load balancing between consumers.
+    """
+
+    def __init__(self, hub, consumer_group="$Default", checkpoint_store=None):
+        self.hub = hub
+        self.consumer_group = consumer_group
+        self.checkpoint_store = checkpoint_store if checkpoint_store is not None else LocalCheckpointStore()
+        self._closed = threading.Event()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get_partition_ids(self):
+        """Return the partition ids of the hub."""
+        return self.hub.get_partition_ids()
+
+    def receive(self, on_event, starting_position="@latest", track_last_enqueued_event_properties=False,
+                partition_id=None, on_error=None):
+        """Call on_event(partition_context, event) for every event until close() is called."""
+        checkpoints = {checkpoint["partition_id"]: checkpoint["sequence_number"]
+                       for checkpoint in self.checkpoint_store.list_checkpoints(self.hub.name, self.consumer_group)}
+        partition_ids = [partition_id] if partition_id is not None else self.hub.get_partition_ids()
+        threads = []
+        for pid in partition_ids:
+            context = LocalPartitionContext(self.hub, pid, self.consumer_group, self.checkpoint_store,
+                                            track_last_enqueued_event_properties)
+            start = self._start(pid, checkpoints.get(pid), starting_position)
+            thread = threading.Thread(target=self._read_partition, args=(context, start, on_event, on_error),
+                                      name=f"local-eventhub-{pid}", daemon=True)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+    def close(self):
+        """Stop receiving; receive() returns once each partition reader has finished its current event."""
+        self._closed.set()
+        self.hub.wake()
+
+    def _start(self, partition_id, checkpoint, starting_position):
+        if checkpoint is not None:
+            return checkpoint + 1
+        if starting_position == "-1":
+            return 0
+        if starting_position == "@latest":
+            return len(self.hub.partition(partition_id).events)
+        return int(starting_position) + 1
+
+    def _read_partition(self, context, position, on_event, on_error):
+        while not self._closed.is_set():
+            for event in self.hub.read(context.partition_id, position):
+                if self._closed.is_set():
+                    return
+                position = event.sequence_number + 1
+                try:
+                    on_event(context, event)
+                except Exception as e:
+                    if on_error is not None:
+                        on_error(context, e)
+                    else:
+                        logger.error(f"Unhandled error in on_event for partition {context.partition_id}: {str(e)}")
+
+# Hubs shared by name within the process, so a producer and consumers find the same logs
+_hubs = {}
+_hubs_lock = threading.Lock()
+
+def get_local_event_hub(name, partition_count=LOCAL_EVENT_HUB_PARTITIONS):
+    """Return the process-wide local hub with this name, creating it on first use."""
+    with _hubs_lock:
+        if name not in _hubs:
+            _hubs[name] = LocalEventHub(name, partition_count)
+        return _hubs[name]
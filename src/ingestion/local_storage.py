@@ -0,0 +1,135 @@
+import os
+import hashlib
+import logging
+from datetime import datetime, timezone
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Root directory used when no explicit root is given
+LOCAL_STORAGE_ROOT = os.getenv("LOCAL_STORAGE_ROOT", "data/local_blob_storage")
+
+class LocalBlobProperties:
+    """Subset of azure.storage.blob.BlobProperties returned when listing a local container."""
+
+    def __init__(self, name, size, etag, last_modified):
+        self.name = name
+        self.size = size
+        self.etag = etag
+        self.last_modified = last_modified
+
+class LocalBlobDownloader:
+    """Stand-in for azure.storage.blob.StorageStreamDownloader."""
+
+    def __init__(self, path):
+        self._path = path
+
+    def readall(self):
+        """Return the whole blob content as bytes."""
+        with open(self._path, "rb") as blob_file:
+            return blob_file.read()
+
+    def readinto(self, stream):
+        """Write the blob content into the given stream and return the number of bytes written."""
+        data = self.readall()
+        stream.write(data)
+        return len(data)
+
+class LocalBlobClient:
+    """Stand-in for azure.storage.blob.BlobClient backed by a file on local disk."""
+
+    def __init__(self, root, container, blob):
+        self.container_name = container
+        self.blob_name = blob
+        self._path = os.path.join(root, container, blob)
+
+    def exists(self):
+        """Return True if the blob exists."""
+        return os.path.isfile(self._path)
+
+    def download_blob(self):
+        """Return a downloader for the blob, raising ResourceNotFoundError if it is missing."""
+        if not self.exists():
+            raise ResourceNotFoundError(f"Blob {self.container_name}/{self.blob_name} not found.")
+        return LocalBlobDownloader(self._path)
+
+    def upload_blob(self, data, overwrite=False):
+        """Write bytes, str or a readable file object to the blob."""
+        if self.exists() and not overwrite:
+            raise ResourceExistsError(f"Blob {self.container_name}/{self.blob_name} already exists.")
+        if hasattr(data, "read"):
+            data = data.read()
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        tmp_path = f"{self._path}.tmp"
+        with open(tmp_path, "wb") as blob_file:
+            blob_file.write(data)
+        os.replace(tmp_path, self._path)
+
+    def delete_blob(self):
+        """Delete the blob, raising ResourceNotFoundError if it is missing."""
+        if not self.exists():
+            raise ResourceNotFoundError(f"Blob {self.container_name}/{self.blob_name} not found.")
+        os.remove(self._path)
+
+    def get_blob_properties(self):
+        """Return name, size, ETag and last-modified time of the blob."""
+        if not self.exists():
+            raise ResourceNotFoundError(f"Blob {self.container_name}/{self.blob_name} not found.")
+        return _blob_properties(self._path, self.blob_name)
+
+class LocalContainerClient:
+    """Stand-in for azure.storage.blob.ContainerClient backed by a local directory."""
+
+    def __init__(self, root, container):
+        self.container_name = container
+        self._root = root
+        self._path = os.path.join(root, container)
+
+    def get_blob_client(self, blob):
+        """Return a client for a blob in this container."""
+        return LocalBlobClient(self._root, self.container_name, blob)
+
+    def list_blobs(self, name_starts_with=None):
+        """Yield blob properties in name order, optionally filtered by prefix."""
+        if not os.path.isdir(self._path):
+            return
+        # Only walk the directories that can contain the prefix
+        prefix_dir = os.path.dirname(name_starts_with) if name_starts_with else ""
+        walk_root = os.path.join(self._path, prefix_dir)
+        names = []
+        for dir_path, _, file_names in os.walk(walk_root):
+            for file_name in file_names:
+                if file_name.endswith(".tmp"):
+                    continue
+                name = os.path.relpath(os.path.join(dir_path, file_name), self._path).replace(os.sep, "/")
+                if name_starts_with is None or name.startswith(name_starts_with):
+                    names.append(name)
+        for name in sorted(names):
+            yield _blob_properties(os.path.join(self._path, name), name)
+
+class LocalBlobServiceClient:
+    """Stand-in for azure.storage.blob.BlobServiceClient that keeps containers under a local directory."""
+
+    def __init__(self, root=LOCAL_STORAGE_ROOT):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def get_blob_client(self, container, blob):
+        """Return a client for a blob in the given container."""
+        return LocalBlobClient(self.root, container, blob)
+
+    def get_container_client(self, container):
+        """Return a client for the given container."""
+        return LocalContainerClient(self.root, container)
+
+def _blob_properties(path, name):
+    """Build blob properties for a local file, using size and mtime as the ETag."""
+    stat = os.stat(path)
+    etag = hashlib.md5(f"{stat.st_size}-{stat.st_mtime_ns}".encode("utf-8")).hexdigest()
+    last_modified = datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
+    return LocalBlobProperties(name=name, size=stat.st_size, etag=f'"{etag}"', last_modified=last_modified)
@@ -0,0 +1,254 @@
+import os
+import json
+import time
+import logging
+import numpy as np
+import pandas as pd
+from src.modeling.compact_model import CompactForest, load_holdout, measure_latency, positive_index, recall_precision
+from src.monitoring.metrics import METRICS
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Cascade configuration; scoring goes through the cascade only when CASCADE_ENABLED=1
+CASCADE_ENABLED = os.getenv("CASCADE_ENABLED", "0") == "1"
+CASCADE_CLEAR_AMOUNT = os.getenv("CASCADE_CLEAR_AMOUNT")  # Overrides the cut-off calibrated in the cascade report
+CASCADE_MAX_MERCHANT_RISK = os.getenv("CASCADE_MAX_MERCHANT_RISK")  # Also require a known merchant at or below this risk
+CASCADE_TREE_CHUNK = int(os.getenv("CASCADE_TREE_CHUNK", "10"))  # Trees evaluated between early-exit checks
+CASCADE_MAX_RECALL_LOSS = float(os.getenv("CASCADE_MAX_RECALL_LOSS", "0.01"))  # Share of forest alerts the rule may clear
+
+# Input and output files of the calibration report
+MODEL_PATH = os.getenv("CASCADE_MODEL_PATH", "fraud_detection_model.pkl")
+REPORT_PATH = os.getenv("CASCADE_REPORT_PATH", "cascade_report.json")
+
+# Stage that resolved each row
+STAGE_RULE, STAGE_EARLY_EXIT, STAGE_FULL = 0, 1, 2
+STAGE_NAMES = ("rule", "early_exit", "full")
+
+class AmountRule:
+    """First-stage rule marking clearly legitimate rows: amounts at or below max_amount.
+
+    With max_merchant_risk set, the merchant must also be known (an enriched merchant_risk_score)
+    and at or below that risk. Rows the rule cannot decide, or that lack the columns, are ambiguous.
+    Without a max_amount the rule clears nothing and every row goes to the forest.
+    """
+
+    def __init__(self, max_amount=None, max_merchant_risk=None):
+        self.max_amount = max_amount
+        self.max_merchant_risk = max_merchant_risk
+
+    def clear(self, frame):
+        """Return a boolean mask of the rows resolved as legitimate."""
+        if self.max_amount is None or not isinstance(frame, pd.DataFrame) or "amount" not in frame.columns:
+            return np.zeros(len(frame), dtype=bool)
+        amount = pd.to_numeric(frame["amount"], errors="coerce").to_numpy(dtype=np.float64)
+        with np.errstate(invalid="ignore"):
+            clear = amount <= self.max_amount
+            if self.max_merchant_risk is not None:
+                if "merchant_risk_score" not in frame.columns:
+                    return np.zeros(len(frame), dtype=bool)
+                risk = pd.to_numeric(frame["merchant_risk_score"], errors="coerce").to_numpy(dtype=np.float64)
+                clear &= risk <= self.max_merchant_risk
+        return clear
+
+class CascadeModel:
+    """Scores rows in two stages behind the predict/predict_proba/classes_ interface of the forest.
+
+    Rows the first-stage rule clears are labeled legitimate with a fraud score of 0. The rest go to
+    the forest, evaluated tree_chunk trees at a time. A row stops as soon as the trees left can no
+    longer change its majority vote, so its label is the full forest's label. Its fraud score is the
+    mean of the trees evaluated so far. Rows resolved per stage and trees evaluated are counted in
+    the metrics registry.
+    """
+
+    def __init__(self, model, rule=None, tree_chunk=CASCADE_TREE_CHUNK, service=None, registry=METRICS):
+        self.forest = model if isinstance(model, CompactForest) else CompactForest(model)
+        if len(self.forest.classes_) != 2:
+            raise ValueError("Cascade scoring supports binary classifiers only.")
+        self.classes_ = self.forest.classes_
+        self.n_features_in_ = self.forest.n_features_in_
+        self.feature_names_in_ = self.forest.feature_names_in_
+        self.rule = rule if rule is not None else AmountRule()
+        self.tree_chunk = max(1, int(tree_chunk))
+        self.service = service
+        self.registry = registry
+        self.positive = positive_index(self.classes_)
+
+    def score(self, X):
+        """Return (fraud label mask, fraud score, resolving stage, trees evaluated) per row."""
+        n_rows, n_trees = len(X), self.forest.n_trees
+        fraud = np.zeros(n_rows, dtype=bool)
+        scores = np.zeros(n_rows, dtype=np.float64)
+        stages = np.full(n_rows, STAGE_RULE, dtype=np.int8)
+        evaluated = np.zeros(n_rows, dtype=np.int64)
+
+        ambiguous = np.flatnonzero(~self.rule.clear(X))
+        if ambiguous.size:
+            features = self.forest._as_array(X.iloc[ambiguous] if isinstance(X, pd.DataFrame) else np.asarray(X)[ambiguous])
+            total = np.zeros(ambiguous.size, dtype=np.float64)
+            pending = np.arange(ambiguous.size)
+            half = n_trees / 2
+            # argmax over [other, fraud] ties go to the first class, as in predict()
+            positive_first = self.positive == 0
+            for start in range(0, n_trees, self.tree_chunk):
+                done = min(start + self.tree_chunk, n_trees)
+                votes = self.forest.tree_proba(features[pending], trees=slice(start, done))[:, :, self.positive]
+                total[pending] += votes.sum(axis=1, dtype=np.float64)
+                evaluated[ambiguous[pending]] = done
+                remaining = n_trees - done
+                partial = total[pending]
+                if positive_first:
+                    decided = (partial >= half) | (partial + remaining < half)
+                else:
+                    decided = (partial > half) | (partial + remaining <= half)
+                pending = pending[~decided]
+                if not pending.size:
+                    break
+            fraud[ambiguous] = total >= half if positive_first else total > half
+            scores[ambiguous] = total / evaluated[ambiguous]
+            stages[ambiguous] = np.where(evaluated[ambiguous] < n_trees, STAGE_EARLY_EXIT, STAGE_FULL)
+
+        if self.registry is not None:
+            for stage, name in enumerate(STAGE_NAMES):
+                hits = int((stages == stage).sum())
+                if hits:
+                    self.registry.inc("fraud_cascade_rows_total", hits, service=self.service, stage=name)
+            self.registry.inc("fraud_cascade_trees_total", int(evaluated.sum()), service=self.service)
+        return fraud, scores, stages, evaluated
+
+    def predict_proba(self, X):
+        """Return [other, fraud] probabilities; the fraud column is the cascade's fraud score."""
+        _, scores, _, _ = self.score(X)
+        probabilities = np.empty((len(scores), 2), dtype=np.float64)
+        probabilities[:, self.positive] = scores
+        probabilities[:, 1 - self.positive] = 1.0 - scores
+        return probabilities
+
+    def predict(self, X):
+        """Return the label of each row."""
+        fraud, _, _, _ = self.score(X)
+        return np.where(fraud, self.classes_[self.positive], self.classes_[1 - self.positive])
+
+def score_rows(model, X):
+    """Return (labels, fraud scores) of the rows with one scoring call.
+
+    Behind a CascadeModel, rows the rule cleared or that exited early get a NaN score: 0 and a
+    partial-tree mean are not forest scores, so monitoring leaves them out of the score
+    distributions. Their labels are the ones served and still count.
+    """
+    positive = positive_index(model.classes_)
+    if isinstance(model, CascadeModel):
+        fraud, scores, stages, _ = model.score(X)
+        labels = np.where(fraud, model.classes_[positive], model.classes_[1 - positive])
+        return labels, np.where(stages == STAGE_FULL, scores, np.nan)
+    probabilities = model.predict_proba(X)
+    # argmax over the class probabilities is exactly what predict() returns
+    return model.classes_[np.argmax(probabilities, axis=1)], probabilities[:, positive]
+
+def create_rule(report_path=REPORT_PATH):
+    """Build the first-stage rule: CASCADE_CLEAR_AMOUNT if set, otherwise the cut-off calibrated in the cascade report.
+
+    Without either the rule stage is off, since an uncalibrated cut-off clears rows the forest would flag.
+    """
+    if CASCADE_CLEAR_AMOUNT:
+        max_risk = float(CASCADE_MAX_MERCHANT_RISK) if CASCADE_MAX_MERCHANT_RISK else None
+        return AmountRule(float(CASCADE_CLEAR_AMOUNT), max_risk)
+    try:
+        with open(report_path) as report_file:
+            report = json.load(report_file)
+        return AmountRule(report["clear_amount"], report.get("max_merchant_risk"))
+    except Exception as e:
+        logger.warning(f"No calibrated cascade rule in {report_path} ({str(e)}); every row goes to the forest.")
+        return AmountRule()
+
+def wrap_model(model, service=None):
+    """Return the model behind a CascadeModel when CASCADE_ENABLED=1, otherwise the model itself."""
+    if model is None or not CASCADE_ENABLED:
+        return model
+    try:
+        return CascadeModel(model, rule=create_rule(), service=service)
+    except Exception as e:
+        logger.error(f"Cascade scoring unavailable for this model; using it directly: {str(e)}")
+        return model
+
+def calibrate_rule(model, X, max_recall_loss=CASCADE_MAX_RECALL_LOSS, max_merchant_risk=None):
+    """Return an AmountRule whose cut-off clears at most max_recall_loss of the rows the forest flags on X."""
+    fraud = model.predict(X) == model.classes_[positive_index(model.classes_)]
+    flagged = np.sort(pd.to_numeric(X.loc[fraud, "amount"], errors="coerce").dropna().to_numpy(dtype=np.float64))
+    if not flagged.size:
+        return AmountRule(float(pd.to_numeric(X["amount"], errors="coerce").max()), max_merchant_risk)
+    allowed = int(max_recall_loss * flagged.size)
+    if allowed >= flagged.size:
+        return AmountRule(float(flagged[-1]), max_merchant_risk)
+    # Strictly below the (allowed + 1)-th smallest flagged amount, so at most `allowed` alerts are cleared
+    return AmountRule(float(np.nextafter(flagged[allowed], -np.inf)), max_merchant_risk)
+
+def evaluate_cascade(model, cascade, X, y):
+    """Compare the cascade with the plain model on (X, y): stage-hit rates, accuracy and latency."""
+    positive = model.classes_[positive_index(model.classes_)]
+    actual = np.asarray(y) == positive
+    full_fraud = np.asarray(model.predict(X)) == positive
+    registry, cascade.registry = cascade.registry, None
+    try:
+        cascade_fraud, _, stages, evaluated = cascade.score(X)
+        full_recall, full_precision = recall_precision(full_fraud, actual)
+        cascade_recall, cascade_precision = recall_precision(cascade_fraud, actual)
+        full_latency_ms, full_rows_per_sec = measure_latency(model, X)
+        cascade_latency_ms, cascade_rows_per_sec = measure_latency(cascade, X)
+    finally:
+        cascade.registry = registry
+    return {
+        "rows": int(len(X)),
+        "clear_amount": cascade.rule.max_amount,
+        "max_merchant_risk": cascade.rule.max_merchant_risk,
+        "tree_chunk": cascade.tree_chunk,
+        "stage_hit_rates": {name: float((stages == stage).mean()) for stage, name in enumerate(STAGE_NAMES)},
+        "trees_per_row": float(evaluated.mean()),
+        "trees_per_forest_row": float(evaluated[stages != STAGE_RULE].mean()) if (stages != STAGE_RULE).any() else 0.0,
+        "agreement_with_model": float((cascade_fraud == full_fraud).mean()),
+        "model": {"recall": float(full_recall), "precision": float(full_precision),
+                  "single_row_latency_ms": full_latency_ms, "batch_rows_per_sec": full_rows_per_sec},
+        "cascade": {"recall": float(cascade_recall), "precision": float(cascade_precision),
+                    "single_row_latency_ms": cascade_latency_ms, "batch_rows_per_sec": cascade_rows_per_sec},
+    }
+
+def log_report(report):
+    """Log the stage-hit rates and the latency comparison."""
+    rates = ", ".join(f"{name} {rate:.1%}" for name, rate in report["stage_hit_rates"].items())
+    logger.info(f"Stage hits: {rates}; {report['trees_per_forest_row']:.1f} trees per row reaching the forest.")
+    for name in ("model", "cascade"):
+        entry = report[name]
+        logger.info(f"{name:<8} recall {entry['recall']:.4f}  precision {entry['precision']:.4f}  "
+                    f"1-row {entry['single_row_latency_ms']:.3f} ms  batch {entry['batch_rows_per_sec']:.0f} rows/s")
+    logger.info(f"Cascade agrees with the model on {report['agreement_with_model']:.2%} of rows; "
+                f"calibrated clear amount {report['clear_amount']}.")
+
+def main():
+    """Main function to calibrate the first-stage rule on the training holdout and report the cascade's savings."""
+    import joblib
+    try:
+        model = joblib.load(MODEL_PATH)
+    except Exception as e:
+        logger.error(f"Failed to load model from {MODEL_PATH}: {str(e)}")
+        return
+
+    holdout = load_holdout()
+    if holdout is None:
+        return
+    X_holdout, y_holdout = holdout
+
+    max_risk = float(CASCADE_MAX_MERCHANT_RISK) if CASCADE_MAX_MERCHANT_RISK else None
+    started = time.perf_counter()
+    cascade = CascadeModel(model, rule=calibrate_rule(model, X_holdout, max_merchant_risk=max_risk))
+    report = evaluate_cascade(model, cascade, X_holdout, y_holdout)
+    log_report(report)
+    try:
+        with open(REPORT_PATH, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+        logger.info(f"Cascade report written to {REPORT_PATH} in {time.perf_counter() - started:.1f}s.")
+    except Exception as e:
+        logger.error(f"Failed to write cascade report: {str(e)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+import os
+import json
+import time
+import pickle
+import logging
+import numpy as np
+import pandas as pd
+from src.modeling.train_model import holdout_path
+from src.processing.label_join import load_training_data
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Compaction configuration; a candidate is accepted if its holdout recall and precision drop by at most the tolerance
+RECALL_TOLERANCE = float(os.getenv("COMPACTION_RECALL_TOLERANCE", "0.01"))
+PRECISION_TOLERANCE = float(os.getenv("COMPACTION_PRECISION_TOLERANCE", "0.01"))
+DEPTH_CAPS = os.getenv("COMPACTION_DEPTHS", "none,16,12,10,8,6")  # "none" keeps the trees' full depth
+LATENCY_CALLS = int(os.getenv("COMPACTION_LATENCY_CALLS", "200"))  # Single-row predictions timed per candidate
+BATCH_ROWS = int(os.getenv("COMPACTION_BATCH_ROWS", "10000"))  # Rows per batch when timing throughput
+PREDICT_CHUNK_ROWS = 10000  # Rows walked through the trees at once, bounding the (rows x trees) work arrays
+
+# Input and output files
+MODEL_PATH = os.getenv("COMPACTION_MODEL_PATH", "fraud_detection_model.pkl")  # Written by train_model.save_model
+COMPACT_MODEL_PATH = os.getenv("COMPACT_MODEL_PATH", "fraud_detection_model_compact.pkl")
+REPORT_PATH = os.getenv("COMPACTION_REPORT_PATH", "compaction_report.json")
+CONTAINER_NAME = "fraud-events"  # The container the compact model is uploaded to when blob storage is configured
+
+def parse_depths(value):
+    """Parse a comma-separated list of depth caps; 'none' means no cap."""
+    return [None if item.strip().lower() == "none" else int(item) for item in value.split(",") if item.strip()]
+
+def float32_floor(values):
+    """Round float64 thresholds down to float32.
+
+    Features are compared as float32, so for any float32 x, x <= t exactly when x <= floor32(t):
+    the smaller thresholds give the same splits as the originals.
+    """
+    rounded = values.astype(np.float32)
+    above = rounded.astype(np.float64) > values
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+class CompactForest:
+    """A random forest flattened into node arrays, optionally with a subset of its trees cut to a depth cap.
+
+    All trees share one set of arrays: split feature (int32), float32 threshold, the side missing
+    values take, child offsets and per-node class probabilities (float32). A node at the depth cap becomes a leaf that predicts its
+    training class distribution. Unreachable nodes are dropped. Prediction walks every (row, tree)
+    pair down one level per step with numpy gathers, touching only the pairs that have not yet
+    reached a leaf. The predict/predict_proba/classes_ interface matches the sklearn forest it came from.
+    """
+
+    def __init__(self, forest, tree_indices=None, max_depth=None):
+        estimators = forest.estimators_
+        tree_indices = list(range(len(estimators))) if tree_indices is None else list(tree_indices)
+        self.classes_ = forest.classes_
+        self.n_features_in_ = forest.n_features_in_
+        self.feature_names_in_ = getattr(forest, "feature_names_in_", None)
+        self.tree_indices = tree_indices
+        self.max_depth = max_depth
+
+        features, thresholds, missing_lefts, lefts, rights, values, roots = [], [], [], [], [], [], []
+        offset = 0
+        for index in tree_indices:
+            feature, threshold, missing_left, left, right, value = self._flatten(estimators[index].tree_, max_depth)
+            roots.append(offset)
+            features.append(feature)
+            thresholds.append(threshold)
+            missing_lefts.append(missing_left)
+            lefts.append(np.where(left >= 0, left + offset, -1))
+            rights.append(np.where(right >= 0, right + offset, -1))
+            values.append(value)
+            offset += len(feature)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.feature = np.concatenate(features).astype(np.int32)
+        self.threshold = float32_floor(np.concatenate(thresholds))
+        self.missing_left = np.concatenate(missing_lefts).astype(bool)
+        self.left = np.concatenate(lefts).astype(np.int32)
+        self.right = np.concatenate(rights).astype(np.int32)
+        self.value = np.concatenate(values).astype(np.float32)
+
+    @staticmethod
+    def _flatten(tree, max_depth):
+        """Return the nodes of an sklearn tree down to the depth cap, renumbered, with the nodes at the cap as leaves."""
+        children_left, children_right = tree.children_left, tree.children_right
+        depth = np.zeros(tree.node_count, dtype=np.int64)
+        frontier = np.array([0])
+        while frontier.size:
+            frontier = frontier[children_left[frontier] >= 0]
+            depth[children_left[frontier]] = depth[frontier] + 1
+            depth[children_right[frontier]] = depth[frontier] + 1
+            frontier = np.concatenate([children_left[frontier], children_right[frontier]])
+        keep = np.ones(tree.node_count, dtype=bool) if max_depth is None else depth <= max_depth
+        split = children_left >= 0 if max_depth is None else (children_left >= 0) & (depth < max_depth)
+        position = np.cumsum(keep) - 1
+        left = np.where(split, position[np.maximum(children_left, 0)], -1)[keep]
+        right = np.where(split, position[np.maximum(children_right, 0)], -1)[keep]
+        order = np.flatnonzero(keep)
+        # sklearn >= 1.4 stores class fractions per node, older versions weighted counts; normalize both
+        value = tree.value[order, 0, :].astype(np.float64)
+        value /= value.sum(axis=1, keepdims=True)
+        # sklearn >= 1.3 learns where NaNs go at each split; before that they always went right
+        missing_left = getattr(tree, "missing_go_to_left", np.zeros(tree.node_count, dtype=np.uint8))
+        return tree.feature[order], tree.threshold[order], missing_left[order], left, right, value
+
+    @property
+    def n_trees(self):
+        """Number of trees kept."""
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        """Total number of nodes across the kept trees."""
+        return len(self.feature)
+
+    def _as_array(self, X):
+        """Return X as a float32 array with the columns in training order."""
+        if isinstance(X, pd.DataFrame) and self.feature_names_in_ is not None:
+            X = X[list(self.feature_names_in_)]
+        return np.ascontiguousarray(np.asarray(X, dtype=np.float32))
+
+    def tree_proba(self, X, trees=None):
+        """Return the kept trees' class probabilities, shape (rows, trees, classes); trees selects a subset."""
+        X = self._as_array(X)
+        roots = self.roots if trees is None else self.roots[trees]
+        chunks = [self._leaves(X[start:start + PREDICT_CHUNK_ROWS], roots) for start in range(0, len(X), PREDICT_CHUNK_ROWS)]
+        leaves = np.concatenate(chunks) if chunks else np.empty((0, len(roots)), dtype=np.int32)
+        return self.value[leaves]
+
+    def _leaves(self, X, roots):
+        """Walk each (row, tree) pair from the given roots to its leaf and return the leaf offsets, shape (rows, trees)."""
+        n_rows, n_trees = len(X), len(roots)
+        nodes = np.tile(roots, n_rows)
+        rows = np.repeat(np.arange(n_rows), n_trees)
+        active = np.flatnonzero(self.left[nodes] >= 0)
+        while active.size:
+            current = nodes[active]
+            values = X[rows[active], self.feature[current]]
+            # NaN compares False, so a missing value goes left only where the split sends missing values left
+            go_left = (values <= self.threshold[current]) | (np.isnan(values) & self.missing_left[current])
+            nodes[active] = np.where(go_left, self.left[current], self.right[current])
+            active = active[self.left[nodes[active]] >= 0]
+        return nodes.reshape(n_rows, n_trees)
+
+    def predict_proba(self, X):
+        """Average the kept trees' class probabilities, like RandomForestClassifier.predict_proba."""
+        return self.tree_proba(X).mean(axis=1)
+
+    def predict(self, X):
+        """Return the most probable class of each row."""
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+def positive_index(classes):
+    """Index of the fraud class in classes_: the label 1 if present, otherwise the last class."""
+    return list(classes).index(1) if 1 in classes else len(classes) - 1
+
+def recall_precision(predicted, actual):
+    """Recall and precision of boolean predictions, row-wise over the last axis; 0 when undefined."""
+    true_positives = (predicted & actual).sum(axis=-1)
+    positives, predicted_positives = actual.sum(), predicted.sum(axis=-1)
+    recall = true_positives / positives if positives else np.zeros_like(true_positives, dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        precision = np.where(predicted_positives > 0, true_positives / np.maximum(predicted_positives, 1), 0.0)
+    return recall, precision
+
+def select_trees(tree_scores, actual, positive_first, target_recall, target_precision):
+    """Greedily pick trees until the ensemble's holdout recall and precision reach the targets.
+
+    tree_scores holds each tree's fraud probability per holdout row, shape (trees, rows). Each step
+    adds the tree whose inclusion gives the best F1, so the first qualifying prefix is small.
+    Returns (selected tree positions, whether the targets were met).
+    """
+    remaining = list(range(len(tree_scores)))
+    selected, total = [], np.zeros(tree_scores.shape[1], dtype=np.float32)
+    while remaining:
+        count = len(selected) + 1
+        candidates = total[None, :] + tree_scores[remaining]
+        # argmax over [other, fraud] class averages; ties go to the first class, as in predict()
+        predicted = candidates >= count / 2 if positive_first else candidates > count / 2
+        recall, precision = recall_precision(predicted, actual[None, :])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            f1 = np.nan_to_num(2 * recall * precision / (recall + precision))
+        best = int(np.argmax(f1))
+        selected.append(remaining.pop(best))
+        total += tree_scores[selected[-1]]
+        if recall[best] >= target_recall and precision[best] >= target_precision:
+            return selected, True
+    return selected, False
+
+def model_size(model):
+    """Size of the pickled model in bytes."""
+    return len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+
+def measure_latency(model, X, latency_calls=LATENCY_CALLS, batch_rows=BATCH_ROWS):
+    """Return (median single-row latency in ms, batch throughput in rows/s) for predict on X."""
+    timings = []
+    for i in range(min(latency_calls, len(X))):
+        row = X.iloc[[i]]
+        start = time.perf_counter()
+        model.predict(row)
+        timings.append(time.perf_counter() - start)
+    batch = X.head(batch_rows)
+    batch_timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        model.predict(batch)
+        batch_timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000), float(len(batch) / min(batch_timings))
+
+def describe(name, model, X, y, n_trees, max_depth, n_nodes, targets=None):
+    """Build one report entry: model shape, size, recall/precision on (X, y), latency and whether it meets targets."""
+    predicted = model.predict(X)
+    positive = model.classes_[positive_index(model.classes_)]
+    recall, precision = recall_precision(np.asarray(predicted) == positive, np.asarray(y) == positive)
+    latency_ms, rows_per_sec = measure_latency(model, X)
+    return {
+        "name": name,
+        "n_trees": n_trees,
+        "max_depth": max_depth,
+        "n_nodes": n_nodes,
+        "size_bytes": model_size(model),
+        "recall": float(recall),
+        "precision": float(precision),
+        "single_row_latency_ms": latency_ms,
+        "batch_rows_per_sec": rows_per_sec,
+        "within_tolerance": targets is None or bool(recall >= targets[0] and precision >= targets[1]),
+    }
+
+def compact_forest(forest, X_holdout, y_holdout, depths=None, recall_tolerance=RECALL_TOLERANCE,
+                   precision_tolerance=PRECISION_TOLERANCE):
+    """Search depth caps and tree subsets of a fitted binary RandomForestClassifier.
+
+    The holdout is split in two halves. On the selection half, trees are added greedily for each depth cap
+    until recall and precision are within the tolerances of the original forest. The evaluation half is used
+    for the report and for acceptance, so the choice is not judged on the rows it was tuned on. Returns
+    (chosen CompactForest, report dict). The chosen model is the smallest accepted candidate, or every tree
+    at full depth if no candidate is accepted.
+    """
+    from sklearn.model_selection import train_test_split
+    if len(forest.classes_) != 2:
+        raise ValueError("Forest compaction supports binary classifiers only.")
+    depths = parse_depths(DEPTH_CAPS) if depths is None else depths
+    positive = positive_index(forest.classes_)
+    y_holdout = np.asarray(y_holdout)
+    stratify = y_holdout if np.bincount(y_holdout == forest.classes_[positive]).min() >= 2 else None
+    X_select, X_eval, y_select, y_eval = train_test_split(X_holdout, y_holdout, test_size=0.5, random_state=42,
+                                                          stratify=stratify)
+    actual = y_select == forest.classes_[positive]
+
+    # Targets on the selection half drive the greedy search; targets on the evaluation half decide acceptance
+    select_recall, select_precision = recall_precision(forest.predict(X_select) == forest.classes_[positive], actual)
+    original = describe("original", forest, X_eval, y_eval, len(forest.estimators_),
+                        forest.max_depth, int(sum(tree.tree_.node_count for tree in forest.estimators_)))
+    targets = (original["recall"] - recall_tolerance, original["precision"] - precision_tolerance)
+    logger.info(f"Original forest: recall {original['recall']:.4f}, precision {original['precision']:.4f}.")
+
+    candidates, models = [original], {}
+    for depth in depths:
+        capped = CompactForest(forest, max_depth=depth)
+        tree_scores = capped.tree_proba(X_select)[:, :, positive].T
+        selected, _ = select_trees(tree_scores, actual, positive == 0, select_recall - recall_tolerance,
+                                   select_precision - precision_tolerance)
+        compact = CompactForest(forest, tree_indices=sorted(selected), max_depth=depth)
+        name = f"depth={depth if depth is not None else 'none'},trees={compact.n_trees}"
+        models[name] = compact
+        candidates.append(describe(name, compact, X_eval, y_eval, compact.n_trees, depth, compact.n_nodes, targets))
+
+    accepted = [c for c in candidates[1:] if c["within_tolerance"]]
+    if accepted:
+        chosen = min(accepted, key=lambda c: (c["size_bytes"], c["single_row_latency_ms"]))
+        model = models[chosen["name"]]
+    else:
+        logger.warning("No compacted candidate stayed within tolerance; keeping every tree at full depth.")
+        model = CompactForest(forest)
+        chosen = describe("depth=none,trees=all", model, X_eval, y_eval, model.n_trees, None, model.n_nodes)
+        candidates.append(chosen)
+
+    report = {
+        "source_model": {"n_estimators": forest.n_estimators, "max_depth": forest.max_depth},
+        "selection_rows": int(len(X_select)),
+        "evaluation_rows": int(len(X_eval)),
+        "recall_tolerance": recall_tolerance,
+        "precision_tolerance": precision_tolerance,
+        "candidates": candidates,
+        "chosen": chosen["name"],
+    }
+    return model, report
+
+def log_report(report):
+    """Log the candidates as a table."""
+    logger.info(f"{'candidate':<24} {'trees':>5} {'nodes':>9} {'size KB':>9} {'recall':>7} {'prec':>7} "
+                f"{'1-row ms':>9} {'rows/s':>10}  ok")
+    for c in report["candidates"]:
+        logger.info(f"{c['name']:<24} {c['n_trees']:>5} {c['n_nodes']:>9} {c['size_bytes'] / 1024:>9.1f} "
+                    f"{c['recall']:>7.4f} {c['precision']:>7.4f} {c['single_row_latency_ms']:>9.3f} "
+                    f"{c['batch_rows_per_sec']:>10.0f}  {'yes' if c['within_tolerance'] else 'no'}")
+    logger.info(f"Chosen: {report['chosen']}")
+
+def save_compact_model(model, report, model_path=COMPACT_MODEL_PATH, report_path=REPORT_PATH):
+    """Save the compact model and the report locally, and upload the model when blob storage is configured."""
+    import joblib
+    try:
+        joblib.dump(model, model_path)
+        with open(report_path, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+        connection_string = os.getenv("AZURE_BLOB_CONNECTION_STRING")
+        if connection_string:
+            from azure.storage.blob import BlobServiceClient
+            blob_client = BlobServiceClient.from_connection_string(connection_string).get_blob_client(
+                container=CONTAINER_NAME, blob=os.path.basename(model_path))
+            with open(model_path, "rb") as model_file:
+                blob_client.upload_blob(model_file, overwrite=True)
+        logger.info(f"Compact model saved to {model_path}; report written to {report_path}.")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to save compact model: {str(e)}")
+        return False
+
+def load_holdout(model_path=MODEL_PATH):
+    """Return (X, y) of the labeled rows train_model held out for testing, or None if they are unavailable."""
+    path = holdout_path(model_path)
+    try:
+        ids = pd.read_csv(path)["transaction_id"]
+    except Exception as e:
+        logger.error(f"Failed to read the holdout ids saved with the model from {path}: {str(e)}")
+        return None
+    # Only the holdout rows are read from the label store, which has grown since training
+    data = load_training_data(ids=ids)
+    if data is None:
+        return None
+    # The same columns train_model.main fits on: the numeric ones
+    X = data.drop(columns=['transaction_id', 'is_fraud']).select_dtypes(include="number")
+    y = data['is_fraud']
+    return X, y
+
+def main():
+    """Main function to compact the trained model against the holdout split used in training."""
+    import joblib
+    try:
+        forest = joblib.load(MODEL_PATH)
+    except Exception as e:
+        logger.error(f"Failed to load model from {MODEL_PATH}: {str(e)}")
+        return
+
+    holdout = load_holdout()
+    if holdout is None:
+        return
+    X_holdout, y_holdout = holdout
+
+    model, report = compact_forest(forest, X_holdout, y_holdout)
+    log_report(report)
+    save_compact_model(model, report)
+
+if __name__ == "__main__":
+    main()
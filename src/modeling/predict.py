@@ -1,10 +1,19 @@
 import os
 import logging
 import json
+import time
+import threading
 import pandas as pd
-import joblib
-from azure.storage.blob import BlobServiceClient
-from azure.eventhub import EventHubConsumerClient
+from src.deployment.batching import score_frame
+from src.ingestion.event_source import create_consumer_client
+from src.ingestion.dead_letter import CheckpointTracker, DeadLetterQueue, RetryQueue
+from src.modeling.cascade import wrap_model
+from src.modeling.shadow import load_candidates, observe_shadow, set_shadow_candidates
+from src.monitoring.drift import observe_drift, read_baseline_blob, set_drift_baseline
+from src.monitoring.metrics import METRICS, METRICS_PORT, record_eventhub_lag, start_metrics_server
+from src.monitoring.profiling import admin_routes, install_signal_handler
+from src.processing.enrichment import enrich_record
+from src.processing.schema_validation import PREDICTION_REQUEST_VALIDATOR
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -14,67 +23,148 @@ logger = logging.getLogger(__name__)
 AZURE_BLOB_CONNECTION_STRING = os.getenv("AZURE_BLOB_CONNECTION_STRING")
 EVENT_HUB_CONNECTION_STRING = os.getenv("EVENT_HUB_CONNECTION_STRING")
 EVENT_HUB_NAME = os.getenv("EVENT_HUB_NAME")
-BLOB_SERVICE_CLIENT = BlobServiceClient.from_connection_string(AZURE_BLOB_CONNECTION_STRING)
+BLOB_SERVICE_CLIENT = None  # Created on first use by get_blob_service_client(); assign a client to inject one
 MODEL_BLOB_NAME = "fraud_detection_model.pkl"  # Name of the saved model in Blob Storage
+SERVICE_NAME = "predict"  # Service label used in the exported metrics
+
+def get_blob_service_client():
+    """Return the blob service client, creating it from the connection string on first use."""
+    global BLOB_SERVICE_CLIENT
+    if BLOB_SERVICE_CLIENT is None:
+        from azure.storage.blob import BlobServiceClient
+        BLOB_SERVICE_CLIENT = BlobServiceClient.from_connection_string(AZURE_BLOB_CONNECTION_STRING)
+    return BLOB_SERVICE_CLIENT
+
+# Poison events go to the dead-letter sink so the partition checkpoint advances past them; an event
+# that cannot be dead-lettered either holds the checkpoint, so it is replayed rather than lost
+DEAD_LETTERS = DeadLetterQueue(SERVICE_NAME)
+RETRIES = RetryQueue(DEAD_LETTERS)
+CHECKPOINTS = CheckpointTracker(SERVICE_NAME)
 
 def load_model():
     """Load the trained model from Azure Blob Storage."""
     try:
-        blob_client = BLOB_SERVICE_CLIENT.get_blob_client(container="fraud-events", blob=MODEL_BLOB_NAME)
+        blob_client = get_blob_service_client().get_blob_client(container="fraud-events", blob=MODEL_BLOB_NAME)
         with open(MODEL_BLOB_NAME, "wb") as model_file:
             model_file.write(blob_client.download_blob().readall())
+        import joblib
         model = joblib.load(MODEL_BLOB_NAME)
         logger.info("Model loaded successfully.")
-        return model
+        # Drift is measured against the training baseline stored next to the model
+        set_drift_baseline(read_baseline_blob(get_blob_service_client(), "fraud-events", MODEL_BLOB_NAME))
+        # Score the candidates in SHADOW_MODELS in the shadow of this model
+        set_shadow_candidates(load_candidates(blob_service_client=get_blob_service_client()))
+        # Score through the rule-then-forest cascade when CASCADE_ENABLED=1
+        return wrap_model(model, SERVICE_NAME)
     except Exception as e:
         logger.error(f"Failed to load model: {str(e)}")
         return None
 
+# The model is loaded on the first event and reused; until a load succeeds, each event retries it.
+# Assign a model to inject one.
+model = None
+model_lock = threading.Lock()
+
+def get_model():
+    """Return the scoring model, loading it on first use; None if it could not be loaded."""
+    global model
+    if model is None:
+        with model_lock:
+            if model is None:
+                model = load_model()
+    return model
+
 def predict_event(model, event_data):
     """Make a prediction based on incoming event data."""
     try:
-        # Convert event data to DataFrame
-        df = pd.DataFrame([event_data])  # Convert single event data to DataFrame
-        prediction = model.predict(df)
+        # Convert event data, with any merchant/user/FX reference attributes, to a DataFrame
+        record = enrich_record(event_data)
+        df = pd.DataFrame([record])  # Convert single event data to DataFrame
+        # Events also carry metadata such as transaction_id; score_frame keeps the model's own columns
+        started = time.perf_counter()
+        prediction, scores = score_frame(model, df)
+        # Candidates reuse the decoded and enriched frame, transaction_id included for the shadow log
+        observe_shadow(SERVICE_NAME, df, prediction, scores, time.perf_counter() - started, model.classes_)
+        observe_drift(SERVICE_NAME, [record], scores, prediction)
         logger.info(f"Prediction for transaction {event_data['transaction_id']}: {'Fraud' if prediction[0] else 'Not Fraud'}")
         return prediction[0]
     except Exception as e:
         logger.error(f"Error during prediction: {str(e)}")
         return None
 
+def score_event(event_data):
+    """Score an event with the model, loading it if needed; raises if either fails, so the event can be retried."""
+    scoring_model = get_model()
+    if scoring_model is None:
+        raise RuntimeError("Model is not loaded.")
+    if predict_event(scoring_model, event_data) is None:
+        raise RuntimeError("Prediction failed.")
+    return True
+
 def on_event(partition_context, event):
     """Event handler for processing incoming events."""
+    timer = METRICS.start_event(SERVICE_NAME)
+    record_eventhub_lag(SERVICE_NAME, partition_context, event)
+    entry = CHECKPOINTS.track(partition_context, event)
+
+    def resolve_later(handled):
+        # Called by the retry thread once a retried operation or dead-letter write has an outcome
+        CHECKPOINTS.resolve(partition_context, entry, handled)
+
+    handled = False  # True once the event is scored or dead-lettered; None while a retry is pending
     try:
         # Deserialize the event data
-        event_data = json.loads(event.body_as_str())
+        with timer.stage("decode"):
+            event_data = json.loads(event.body_as_str())
         logger.info(f"Received event: {event_data}")
 
-        # Load the model
-        model = load_model()
-        if model is not None:
+        # Dead-letter malformed events instead of failing inside the model; the checkpoint still advances
+        with timer.stage("validate"):
+            errors = PREDICTION_REQUEST_VALIDATOR.validate_record(event_data)
+        if errors:
+            METRICS.inc("fraud_errors_total", service=SERVICE_NAME, stage="validate")
+            handled = RETRIES.dead_letter("validate", ", ".join(errors), partition_context, event, resolve_later)
+        else:
+            # Load the model
+            with timer.stage("model_load"):
+                get_model()
             # Predict if the event is fraudulent
-            predict_event(model, event_data)
-        
-        # Checkpoint after processing the event
-        partition_context.update_checkpoint(event)
+            with timer.stage("model"):
+                try:
+                    handled = score_event(event_data)
+                except Exception as e:
+                    # A model store outage or a failed prediction is transient: the event is retried in the
+                    # background, and dead-lettered only once its retries are exhausted
+                    METRICS.inc("fraud_errors_total", service=SERVICE_NAME, stage="process")
+                    logger.warning(f"Scoring failed ({str(e)}); retrying in the background.")
+                    handled = None
+                    RETRIES.submit(lambda: score_event(event_data), partition_context, event, reason="process",
+                                   on_done=resolve_later)
     except json.JSONDecodeError as e:
-        logger.error(f"Error decoding JSON: {e}")
+        METRICS.inc("fraud_errors_total", service=SERVICE_NAME, stage="decode")
+        handled = RETRIES.dead_letter("decode", e, partition_context, event, resolve_later)
     except Exception as e:
-        logger.error(f"Error processing event: {e}")
+        METRICS.inc("fraud_errors_total", service=SERVICE_NAME, stage="process")
+        handled = RETRIES.dead_letter("process", e, partition_context, event, resolve_later)
+
+    # Checkpoint past the event only if it was scored or dead-lettered, unless its retry is still pending
+    if handled is not None:
+        with timer.stage("checkpoint"):
+            CHECKPOINTS.resolve(partition_context, entry, handled)
 
 def main():
     """Main function to start the Event Hub consumer for predictions."""
     # Create a consumer client for Event Hubs
-    client = EventHubConsumerClient.from_connection_string(
-        conn_str=EVENT_HUB_CONNECTION_STRING,
-        consumer_group="$Default",
-        eventhub_name=EVENT_HUB_NAME
-    )
+    client = create_consumer_client(EVENT_HUB_CONNECTION_STRING, EVENT_HUB_NAME)
+
+    # Expose metrics and the admin profiling trigger on a sidecar port, since the consumer has no web server
+    start_metrics_server(METRICS_PORT, post_routes=admin_routes(SERVICE_NAME))
+    install_signal_handler(SERVICE_NAME)
 
     try:
         # Start receiving events
         with client:
-            client.receive(on_event=on_event, starting_position="@latest")
+            client.receive(on_event=on_event, starting_position="@latest", track_last_enqueued_event_properties=True)
             logger.info("Listening for events...")
             # Keep the script running
             while True:
@@ -84,6 +174,8 @@ def main():
     except Exception as e:
         logger.error(f"Unexpected error: {e}")
     finally:
+        # Resolve the pending retries first, so their checkpoints can still be written
+        RETRIES.close()
         client.close()
         logger.info("Event Hub consumer client closed.")
 
@@ -0,0 +1,361 @@
+import os
+import glob
+import json
+import time
+import atexit
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from src.modeling.cascade import score_rows, wrap_model
+from src.modeling.compact_model import positive_index
+from src.monitoring.metrics import METRICS
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Shadow scoring configuration; candidates are scored next to the live model only when SHADOW_MODELS is set
+SHADOW_MODELS = [m.strip() for m in os.getenv("SHADOW_MODELS", "").split(",") if m.strip()]  # Local files or blob names
+SHADOW_WORKERS = int(os.getenv("SHADOW_WORKERS", "1"))  # Threads scoring the candidates off the request path
+SHADOW_MAX_PENDING = int(os.getenv("SHADOW_MAX_PENDING", "256"))  # Batches waiting for a worker before new ones are dropped
+SHADOW_LOG_DIR = os.getenv("SHADOW_LOG_DIR", "shadow_logs")
+SHADOW_FLUSH_ROWS = int(os.getenv("SHADOW_FLUSH_ROWS", "10000"))  # Rows buffered before a log segment is written
+SHADOW_FLUSH_SECONDS = float(os.getenv("SHADOW_FLUSH_SECONDS", "60"))
+SHADOW_REPORT_PATH = os.getenv("SHADOW_REPORT_PATH", "shadow_report.json")
+SHADOW_CANDIDATE_DIR = os.getenv("SHADOW_CANDIDATE_DIR", "shadow_candidates")  # Where blob candidates are downloaded
+
+# Azure Blob Storage configuration, used for candidates that are not local files
+AZURE_BLOB_CONNECTION_STRING = os.getenv("AZURE_BLOB_CONNECTION_STRING")
+BLOB_CONTAINER_NAME = "fraud-events"
+
+LIVE_MODEL_NAME = "live"  # Name of the serving model in the log; candidates are named after their file
+
+def model_name(source):
+    """Name a candidate after its file or blob, e.g. models/fraud_v2.pkl -> fraud_v2."""
+    return os.path.splitext(os.path.basename(source))[0]
+
+def candidate_path(source, candidate_dir=SHADOW_CANDIDATE_DIR):
+    """Local path of a downloaded blob candidate, keeping its blob path under candidate_dir.
+
+    Candidates never land in the working directory, where one named like the live model would replace it.
+    """
+    root = os.path.abspath(candidate_dir)
+    path = os.path.abspath(os.path.join(root, *source.split("/")))
+    if not path.startswith(root + os.sep):
+        raise ValueError(f"Blob name {source} points outside {candidate_dir}.")
+    return path
+
+def load_candidates(sources=None, blob_service_client=None, container=BLOB_CONTAINER_NAME,
+                    candidate_dir=SHADOW_CANDIDATE_DIR):
+    """Load candidate models from local files or blobs and return [(name, model)]; failed loads are skipped."""
+    sources = SHADOW_MODELS if sources is None else sources
+    candidates = []
+    for source in sources:
+        try:
+            import joblib
+            path = source
+            if not os.path.isfile(source):
+                if blob_service_client is None:
+                    from azure.storage.blob import BlobServiceClient
+                    blob_service_client = BlobServiceClient.from_connection_string(AZURE_BLOB_CONNECTION_STRING)
+                path = candidate_path(source, candidate_dir)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                blob_client = blob_service_client.get_blob_client(container=container, blob=source)
+                with open(path, "wb") as model_file:
+                    model_file.write(blob_client.download_blob().readall())
+            name = model_name(source)
+            if name == LIVE_MODEL_NAME or name in dict(candidates):
+                name = f"{name}_{len(candidates)}"
+            # Candidates are scored the way the live model is, behind the cascade when it is enabled
+            candidates.append((name, wrap_model(joblib.load(path))))
+            logger.info(f"Shadow candidate {name} loaded from {source}.")
+        except Exception as e:
+            logger.error(f"Failed to load shadow candidate {source}: {str(e)}")
+    return candidates
+
+def score_candidate(model, frame):
+    """Score a shared feature frame with a candidate and return (fraud label mask, fraud scores).
+
+    The frame is the one the live model scored; a model trained on fewer columns gets only its own.
+    """
+    features = getattr(model, "feature_names_in_", None)
+    if features is not None:
+        frame = frame[list(features)]
+    labels, scores = score_rows(model, frame)
+    return fraud_mask(labels, model.classes_), scores
+
+def fraud_mask(labels, classes):
+    """Boolean mask of the labels equal to the fraud class of a model with the given classes_."""
+    classes = np.asarray(classes)
+    return np.asarray(labels) == classes[positive_index(classes)]
+
+class ShadowLog:
+    """Buffers scored batches in columns and writes them as compressed .npz segments.
+
+    Each segment holds, for the rows of its batches: transaction_id, and a (rows x models) int8
+    label matrix and float32 score matrix, column 0 being the live model. Per batch it holds the
+    batch size and a (batches x models) float32 matrix of scoring latency in milliseconds.
+    """
+
+    def __init__(self, models, log_dir=SHADOW_LOG_DIR, prefix="shadow", flush_rows=SHADOW_FLUSH_ROWS,
+                 flush_seconds=SHADOW_FLUSH_SECONDS):
+        self.models = list(models)
+        self.log_dir = log_dir
+        self.prefix = prefix
+        self.flush_rows = max(1, int(flush_rows))
+        self.flush_seconds = flush_seconds
+        self.paths = []
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._ids, self._labels, self._scores, self._latency, self._sizes = [], [], [], [], []
+        self.rows = 0
+        self._started = time.monotonic()
+
+    def append(self, ids, labels, scores, latency_ms):
+        """Add one scored batch; writes a segment when flush_rows rows or flush_seconds are reached."""
+        with self._lock:
+            self._ids.append(ids)
+            self._labels.append(labels)
+            self._scores.append(scores)
+            self._latency.append(latency_ms)
+            self._sizes.append(len(ids))
+            self.rows += len(ids)
+            if self.rows >= self.flush_rows or time.monotonic() - self._started >= self.flush_seconds:
+                self._write()
+
+    def flush(self):
+        """Write the buffered batches as a segment, if there are any."""
+        with self._lock:
+            self._write()
+
+    def _write(self):
+        if not self._sizes:
+            return
+        path = os.path.join(self.log_dir, f"{self.prefix}-{os.getpid()}-{len(self.paths):05d}.npz")
+        try:
+            os.makedirs(self.log_dir, exist_ok=True)
+            np.savez_compressed(
+                path,
+                models=np.array(self.models, dtype=str),
+                transaction_id=np.concatenate(self._ids),
+                labels=np.concatenate(self._labels),
+                scores=np.concatenate(self._scores),
+                latency_ms=np.array(self._latency, dtype=np.float32),
+                batch_size=np.array(self._sizes, dtype=np.int32),
+            )
+            self.paths.append(path)
+        except Exception as e:
+            logger.error(f"Failed to write shadow log segment {path}: {str(e)}")
+        self._reset()
+
+class ShadowScorer:
+    """Scores the batches the live model scored with candidate models on a worker pool.
+
+    submit() only queues a copy of the batch, with the live labels, classes, scores and latency, so
+    the candidates never add to the caller's latency or see later changes to its frame. When max_pending batches are already waiting, new batches
+    are dropped and counted rather than queued without bound.
+    """
+
+    def __init__(self, candidates, service="api", log_dir=SHADOW_LOG_DIR, workers=SHADOW_WORKERS,
+                 max_pending=SHADOW_MAX_PENDING, registry=METRICS, **log_options):
+        self.candidates = list(candidates)
+        self.service = service
+        self.registry = registry
+        self.max_pending = max(1, int(max_pending))
+        self.log = ShadowLog([LIVE_MODEL_NAME] + [name for name, _ in self.candidates], log_dir,
+                             prefix=service, **log_options)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix="shadow")
+
+    def submit(self, frame, labels, scores, latency_seconds, classes):
+        """Queue a scored batch for the candidates, with the live model's classes_; returns False if it was dropped."""
+        with self._lock:
+            if self._closed or self._pending >= self.max_pending:
+                self.registry.inc("fraud_shadow_dropped_total", len(frame), service=self.service)
+                return False
+            self._pending += 1
+        # The caller keeps using its frame and arrays after this returns, so the worker gets its own copies
+        self._pool.submit(self._score, frame.copy(), np.array(labels), np.array(scores), latency_seconds, classes)
+        return True
+
+    def _score(self, frame, live_labels, live_scores, live_latency, live_classes):
+        try:
+            n_rows, n_models = len(frame), len(self.candidates) + 1
+            labels = np.full((n_rows, n_models), -1, dtype=np.int8)
+            scores = np.full((n_rows, n_models), np.nan, dtype=np.float32)
+            latency_ms = np.full(n_models, np.nan, dtype=np.float32)
+            live_fraud = fraud_mask(live_labels, live_classes)
+            labels[:, 0], scores[:, 0], latency_ms[0] = live_fraud, live_scores, live_latency * 1000
+            self.registry.observe("fraud_shadow_latency_seconds", live_latency, service=self.service, model=LIVE_MODEL_NAME)
+            for column, (name, model) in enumerate(self.candidates, start=1):
+                started = time.perf_counter()
+                try:
+                    fraud, candidate_scores = score_candidate(model, frame)
+                except Exception as e:
+                    # A broken candidate is logged with label -1 and must not stop the others
+                    self.registry.inc("fraud_shadow_errors_total", service=self.service, model=name)
+                    logger.error(f"Shadow candidate {name} failed: {str(e)}")
+                    continue
+                elapsed = time.perf_counter() - started
+                labels[:, column], scores[:, column], latency_ms[column] = fraud, candidate_scores, elapsed * 1000
+                self.registry.observe("fraud_shadow_latency_seconds", elapsed, service=self.service, model=name)
+                self.registry.inc("fraud_shadow_rows_total", n_rows, service=self.service, model=name)
+                self.registry.inc("fraud_shadow_disagreements_total", int(np.count_nonzero(fraud != live_fraud)),
+                                  service=self.service, model=name)
+            ids = (frame["transaction_id"].astype(str).to_numpy(dtype=str) if "transaction_id" in frame.columns
+                   else np.full(n_rows, "", dtype=str))
+            self.log.append(ids, labels, scores, latency_ms)
+        except Exception as e:
+            logger.error(f"Shadow scoring failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def close(self):
+        """Wait for the queued batches to be scored and write the buffered rows."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._pool.shutdown(wait=True)
+        self.log.flush()
+
+def read_shadow_log(paths):
+    """Concatenate log segments into one dict of columns; segments with another set of models are skipped."""
+    columns = None
+    for path in paths:
+        try:
+            with np.load(path, allow_pickle=False) as segment:
+                segment = {name: segment[name] for name in segment.files}
+        except Exception as e:
+            logger.error(f"Failed to read shadow log segment {path}: {str(e)}")
+            continue
+        if columns is None:
+            columns = {name: [values] for name, values in segment.items() if name != "models"}
+            columns["models"] = segment["models"]
+        elif list(segment["models"]) != list(columns["models"]):
+            logger.warning(f"Skipping {path}: it was written for models {list(segment['models'])}.")
+        else:
+            for name, values in columns.items():
+                if name != "models":
+                    values.append(segment[name])
+    if columns is None:
+        return None
+    return {name: values if name == "models" else np.concatenate(values) for name, values in columns.items()}
+
+def shadow_report(columns):
+    """Compare each candidate with the live model: agreement, flag rates, score differences and latency."""
+    models = [str(name) for name in columns["models"]]
+    labels, scores = columns["labels"], columns["scores"]
+    batch_rows = np.maximum(columns["batch_size"], 1)[:, None]
+
+    def latency(column):
+        per_batch = columns["latency_ms"][:, column]
+        per_row = per_batch / batch_rows[:, 0]
+        valid = ~np.isnan(per_batch)
+        if not valid.any():
+            return None
+        return {
+            "batch_p50": float(np.percentile(per_batch[valid], 50)),
+            "batch_p99": float(np.percentile(per_batch[valid], 99)),
+            "per_row_mean": float(per_row[valid].mean()),
+        }
+
+    live = labels[:, 0] == 1
+    report = {
+        "rows": int(len(labels)),
+        "batches": int(len(columns["batch_size"])),
+        LIVE_MODEL_NAME: {"flagged_rate": float(live.mean()) if len(live) else None, "latency_ms": latency(0)},
+        "candidates": {},
+    }
+    for column, name in enumerate(models[1:], start=1):
+        scored = labels[:, column] >= 0
+        candidate = labels[scored, column] == 1
+        reference = live[scored]
+        n_scored = int(scored.sum())
+        compared = scored & ~np.isnan(scores[:, column]) & ~np.isnan(scores[:, 0])
+        report["candidates"][name] = {
+            "rows": n_scored,
+            "errors": int(len(labels) - n_scored),
+            "agreement": float(np.mean(candidate == reference)) if n_scored else None,
+            "flagged_rate": float(candidate.mean()) if n_scored else None,
+            # Alerts the candidate would add, and live alerts it would drop
+            "new_flags": int(np.count_nonzero(candidate & ~reference)),
+            "dropped_flags": int(np.count_nonzero(~candidate & reference)),
+            # Only rows both models scored with every tree; cascade-decided rows have NaN scores
+            "score_rows": int(compared.sum()),
+            "score_mean_abs_diff": float(np.mean(np.abs(scores[compared, column] - scores[compared, 0]))) if compared.any() else None,
+            "latency_ms": latency(column),
+        }
+    return report
+
+# Per-process scorer, created on first use so its threads start in the worker, not the gunicorn master
+candidates = []
+scorer = None
+scorer_pid = None
+scorer_lock = threading.Lock()
+
+def set_shadow_candidates(new_candidates):
+    """Shadow the live model with newly loaded candidates; an empty list turns shadow scoring off."""
+    global candidates, scorer, scorer_pid
+    with scorer_lock:
+        old = scorer if scorer_pid == os.getpid() else None
+        candidates = list(new_candidates or [])
+        scorer, scorer_pid = None, None
+    if old is not None:
+        old.close()
+
+def get_shadow_scorer(service):
+    """Return this process's ShadowScorer, or None when there are no candidates."""
+    global scorer, scorer_pid
+    if scorer_pid != os.getpid():
+        with scorer_lock:
+            if scorer_pid != os.getpid():
+                scorer = ShadowScorer(candidates, service) if candidates else None
+                scorer_pid = os.getpid()
+    return scorer
+
+@atexit.register
+def close_shadow_scorer():
+    """Write the rows this process still buffers when it exits."""
+    if scorer is not None and scorer_pid == os.getpid():
+        scorer.close()
+
+def observe_shadow(service, frame, labels, scores, latency_seconds, classes):
+    """Hand a batch the live model, with the given classes_, scored in latency_seconds to the candidates, if any."""
+    shadow_scorer = get_shadow_scorer(service)
+    if shadow_scorer is None:
+        return
+    try:
+        shadow_scorer.submit(frame, labels, scores, latency_seconds, classes)
+    except Exception as e:
+        logger.error(f"Failed to queue batch for shadow scoring: {str(e)}")
+
+def main():
+    """Main function to compare the candidates with the live model over the shadow log segments."""
+    paths = sorted(glob.glob(os.path.join(SHADOW_LOG_DIR, "*.npz")))
+    columns = read_shadow_log(paths)
+    if columns is None:
+        logger.error(f"No shadow log segments found in {SHADOW_LOG_DIR}.")
+        return
+    report = shadow_report(columns)
+    report["segments"] = len(paths)
+    logger.info(f"{report['rows']} rows in {report['batches']} batches from {len(paths)} segments.")
+    for name, entry in report["candidates"].items():
+        if entry["agreement"] is not None:
+            logger.info(f"{name:<24} agreement {entry['agreement']:.4f}  +{entry['new_flags']}/-{entry['dropped_flags']} flags  "
+                        f"{entry['errors']} errors")
+    try:
+        with open(SHADOW_REPORT_PATH, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+        logger.info(f"Shadow report written to {SHADOW_REPORT_PATH}.")
+    except Exception as e:
+        logger.error(f"Failed to write shadow report: {str(e)}")
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,8 @@
 import os
 import logging
 import pandas as pd
-from azure.storage.blob import BlobServiceClient
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report, accuracy_score
-import joblib
+from src.monitoring.drift import DRIFT_CATEGORICAL_COLUMNS, baseline_path, build_baseline, save_baseline
+from src.processing.label_join import load_training_data
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -13,13 +10,21 @@ logger = logging.getLogger(__name__)
 
 # Azure Blob Storage configuration
 AZURE_BLOB_CONNECTION_STRING = os.getenv("AZURE_BLOB_CONNECTION_STRING")
-BLOB_SERVICE_CLIENT = BlobServiceClient.from_connection_string(AZURE_BLOB_CONNECTION_STRING)
+BLOB_SERVICE_CLIENT = None  # Created on first use by get_blob_service_client(); assign a client to inject one
 CONTAINER_NAME = "fraud-events"  # The container where transformed data files are stored
 
+def get_blob_service_client():
+    """Return the blob service client, creating it from the connection string on first use."""
+    global BLOB_SERVICE_CLIENT
+    if BLOB_SERVICE_CLIENT is None:
+        from azure.storage.blob import BlobServiceClient
+        BLOB_SERVICE_CLIENT = BlobServiceClient.from_connection_string(AZURE_BLOB_CONNECTION_STRING)
+    return BLOB_SERVICE_CLIENT
+
 def load_transformed_data(file_path):
     """Load transformed data from Azure Blob Storage."""
     try:
-        blob_client = BLOB_SERVICE_CLIENT.get_blob_client(container=CONTAINER_NAME, blob=file_path)
+        blob_client = get_blob_service_client().get_blob_client(container=CONTAINER_NAME, blob=file_path)
         downloaded_blob = blob_client.download_blob().readall()
         data = pd.read_csv(downloaded_blob)
         logger.info(f"Transformed data loaded successfully from {file_path}.")
@@ -30,6 +35,10 @@ def load_transformed_data(file_path):
 
 def train_model(data):
     """Train the fraud detection model."""
+    # scikit-learn is imported on first use so importing this module stays cheap
+    from sklearn.model_selection import train_test_split
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import classification_report, accuracy_score
     try:
         # Separate features and target variable
         X = data.drop(columns=['is_fraud'])  # Features
@@ -60,10 +69,11 @@ def save_model(model, model_name="fraud_detection_model.pkl"):
     """Save the trained model to Azure Blob Storage."""
     try:
         # Save the model using joblib
+        import joblib
         joblib.dump(model, model_name)
         
         # Upload the model to Azure Blob Storage
-        blob_client = BLOB_SERVICE_CLIENT.get_blob_client(container=CONTAINER_NAME, blob=model_name)
+        blob_client = get_blob_service_client().get_blob_client(container=CONTAINER_NAME, blob=model_name)
         
         with open(model_name, "rb") as file:
             blob_client.upload_blob(file, overwrite=True)
@@ -72,21 +82,68 @@ def save_model(model, model_name="fraud_detection_model.pkl"):
     except Exception as e:
         logger.error(f"Failed to save model: {str(e)}")
 
+def holdout_path(model_path):
+    """Return where the holdout ids of a model file are stored: next to it, with a _holdout.csv suffix."""
+    return f"{os.path.splitext(model_path)[0]}_holdout.csv"
+
+def save_holdout_ids(ids, model_name="fraud_detection_model.pkl"):
+    """Save the transaction ids train_model held out, so later stages evaluate on exactly those rows."""
+    from sklearn.model_selection import train_test_split
+    try:
+        # Same split as train_model; the label store keeps growing, so the split cannot be redone later
+        _, holdout_ids = train_test_split(ids, test_size=0.2, random_state=42)
+        path = holdout_path(model_name)
+        pd.DataFrame({"transaction_id": holdout_ids}).to_csv(path, index=False)
+        logger.info(f"{len(holdout_ids)} holdout ids saved to {path}.")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to save holdout ids: {str(e)}")
+        return False
+
+def save_drift_baseline(model, data, model_name="fraud_detection_model.pkl"):
+    """Save the holdout's feature, category and fraud-score distributions next to the model, for drift monitoring.
+
+    data is the labeled frame the model's features were taken from, so the categorical columns the
+    model is not fit on (merchant_id, currency) are described too.
+    """
+    from sklearn.model_selection import train_test_split
+    try:
+        # Same split as train_model, so the baseline describes rows the model did not see in training
+        _, holdout = train_test_split(data, test_size=0.2, random_state=42)
+        features = list(getattr(model, "feature_names_in_", holdout.columns.drop('is_fraud', errors='ignore')))
+        categorical = [column for column in DRIFT_CATEGORICAL_COLUMNS if column in holdout.columns and column not in features]
+        probabilities = model.predict_proba(holdout[features])
+        positive = list(model.classes_).index(1) if 1 in model.classes_ else probabilities.shape[1] - 1
+        labels = model.classes_[probabilities.argmax(axis=1)]
+        baseline = build_baseline(holdout[features + categorical], probabilities[:, positive], labels)
+
+        baseline_name = baseline_path(model_name)
+        save_baseline(baseline, baseline_name)
+        blob_client = get_blob_service_client().get_blob_client(container=CONTAINER_NAME, blob=baseline_name)
+        with open(baseline_name, "rb") as file:
+            blob_client.upload_blob(file, overwrite=True)
+        logger.info(f"Drift baseline saved successfully to {baseline_name}.")
+    except Exception as e:
+        logger.error(f"Failed to save drift baseline: {str(e)}")
+
 def main():
     """Main function to execute the model training process."""
-    # Specify the transformed data file to process
-    transformed_data_file = "data/transformed/transaction_event_1.csv"  # Adjust based on your file names
-
-    # Load transformed data
-    data = load_transformed_data(transformed_data_file)
+    # Load the transformed transactions that have received their fraud labels (see label_join)
+    data = load_training_data()
     
     if data is not None:
-        # Train the model
-        model = train_model(data)
+        # The transaction id identifies a row; it is not a feature
+        ids = data.pop('transaction_id')
+        
+        # Train the model on the numeric columns; string columns such as merchant_id and currency are
+        # not encoded, but the drift baseline still describes them
+        model = train_model(data.select_dtypes(include="number"))
         
         if model is not None:
-            # Save the trained model
+            # Save the trained model, the ids it was evaluated on and the training baseline its drift is measured against
             save_model(model)
+            save_holdout_ids(ids)
+            save_drift_baseline(model, data)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,497 @@
+import os
+import json
+import glob
+import bisect
+import zlib
+import socket
+import hashlib
+import logging
+import threading
+import time
+import numpy as np
+import pandas as pd
+from src.monitoring.metrics import METRICS
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Drift monitoring configuration
+DRIFT_BINS = int(os.getenv("DRIFT_BINS", "20"))  # Baseline quantile bins per numeric feature
+DRIFT_CATEGORICAL_COLUMNS = [c for c in os.getenv("DRIFT_CATEGORICAL_COLUMNS", "merchant_id,currency").split(",") if c]
+DRIFT_TOP_CATEGORIES = int(os.getenv("DRIFT_TOP_CATEGORIES", "20"))  # Baseline categories tracked by name; the rest are "other"
+DRIFT_CMS_WIDTH = int(os.getenv("DRIFT_CMS_WIDTH", "2048"))
+DRIFT_CMS_DEPTH = int(os.getenv("DRIFT_CMS_DEPTH", "4"))
+DRIFT_PSI_ALERT = float(os.getenv("DRIFT_PSI_ALERT", "0.2"))  # PSI above this is reported as drift
+DRIFT_REFRESH_SECONDS = float(os.getenv("DRIFT_REFRESH_SECONDS", "10"))  # How often the drift gauges are recomputed
+DRIFT_STATE_DIR = os.getenv("DRIFT_STATE_DIR")  # Workers write their sketches here for merging; off when unset
+DRIFT_SNAPSHOT_SECONDS = float(os.getenv("DRIFT_SNAPSHOT_SECONDS", "60"))
+DRIFT_BASELINE_PATH = os.getenv("DRIFT_BASELINE_PATH", "fraud_detection_model_baseline.json")
+DRIFT_REPORT_PATH = os.getenv("DRIFT_REPORT_PATH", "drift_report.json")
+
+SCORE_NAME = "fraud_score"  # Name of the fraud-score distribution in reports and metrics
+PSI_EPSILON = 1e-4  # Share given to empty bins so PSI stays finite
+
+class QuantileSketch:
+    """Fixed-size histogram over bin edges taken from the training quantiles.
+
+    Bin i holds values in (edges[i - 1], edges[i]], with open-ended first and last bins, so memory
+    does not grow with traffic. Sketches with the same edges merge by adding counts, and their
+    PSI and KS against the baseline come straight from the bin shares.
+    """
+
+    def __init__(self, edges):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self._edge_list = self.edges.tolist()
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        self.missing = 0
+        self.min = np.inf
+        self.max = -np.inf
+
+    @classmethod
+    def from_values(cls, values, n_bins=DRIFT_BINS):
+        """Build a sketch whose edges are the n_bins quantiles of the values, and add the values."""
+        values = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=np.float64)
+        present = values[~np.isnan(values)]
+        edges = np.unique(np.quantile(present, np.linspace(0, 1, n_bins + 1)[1:-1])) if present.size else []
+        sketch = cls(edges)
+        sketch.update(values)
+        return sketch
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+    def update(self, values):
+        """Add a batch of values; NaN and non-numeric values are counted as missing."""
+        values = np.asarray(values)
+        if values.dtype.kind not in "fiub":
+            values = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy()
+        values = values.astype(np.float64, copy=False)
+        present = values[~np.isnan(values)]
+        self.missing += int(values.size - present.size)
+        if present.size == 1:
+            self.counts[np.searchsorted(self.edges, present[0], side="left")] += 1
+        elif present.size:
+            self.counts += np.bincount(np.searchsorted(self.edges, present, side="left"), minlength=len(self.counts))
+        if present.size:
+            self.min = min(self.min, float(present.min()))
+            self.max = max(self.max, float(present.max()))
+
+    def add(self, value):
+        """Add one value without numpy overhead; NaN counts as missing."""
+        if value != value:
+            self.missing += 1
+            return
+        self.counts[bisect.bisect_left(self._edge_list, value)] += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """Add the counts of a sketch with the same edges."""
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Cannot merge sketches with different edges.")
+        self.counts += other.counts
+        self.missing += other.missing
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def shares(self):
+        """Return the share of present values in each bin."""
+        total = self.counts.sum()
+        return self.counts / total if total else np.zeros(len(self.counts))
+
+    def quantile(self, q):
+        """Return the q-quantile, interpolated within its bin; NaN if the sketch is empty."""
+        total = self.counts.sum()
+        if not total:
+            return float("nan")
+        cumulative = np.cumsum(self.counts)
+        index = int(np.searchsorted(cumulative, q * total, side="left"))
+        lower = self.edges[index - 1] if index > 0 else self.min
+        upper = self.edges[index] if index < len(self.edges) else self.max
+        lower, upper = max(lower, self.min), min(upper, self.max)
+        before = cumulative[index - 1] if index > 0 else 0
+        fraction = (q * total - before) / self.counts[index] if self.counts[index] else 0.0
+        return float(lower + (upper - lower) * min(max(fraction, 0.0), 1.0))
+
+    def to_dict(self):
+        return {"edges": self.edges.tolist(), "counts": self.counts.tolist(), "missing": self.missing,
+                "min": self.min if np.isfinite(self.min) else None, "max": self.max if np.isfinite(self.max) else None}
+
+    @classmethod
+    def from_dict(cls, state):
+        sketch = cls(state["edges"])
+        sketch.counts = np.asarray(state["counts"], dtype=np.int64)
+        sketch.missing = state["missing"]
+        sketch.min = state["min"] if state["min"] is not None else np.inf
+        sketch.max = state["max"] if state["max"] is not None else -np.inf
+        return sketch
+
+class CountMinSketch:
+    """Count-min sketch of categorical values: depth rows of width counters, estimates never undercount.
+
+    Values are hashed once with CRC-32, which is stable across processes, and spread over the rows
+    with seeded multiply-add hashing, so sketches with the same width, depth and seed merge by
+    adding tables.
+    """
+
+    def __init__(self, width=DRIFT_CMS_WIDTH, depth=DRIFT_CMS_DEPTH, seed=0):
+        self.width = width
+        self.depth = depth
+        self.seed = seed
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.total = 0
+        rng = np.random.default_rng(seed)
+        self._multipliers = rng.integers(1, 2 ** 63, size=depth, dtype=np.uint64) | np.uint64(1)
+        self._increments = rng.integers(0, 2 ** 63, size=depth, dtype=np.uint64)
+        self._row_hashes = list(zip(self._multipliers.tolist(), self._increments.tolist()))
+
+    def _columns(self, values):
+        """Return the counter column of each value in each row, shape (depth, len(values))."""
+        hashes = np.fromiter((zlib.crc32(str(value).encode("utf-8")) for value in values), dtype=np.uint64,
+                             count=len(values))
+        return ((self._multipliers[:, None] * hashes[None, :] + self._increments[:, None]) >> np.uint64(33)) \
+            % np.uint64(self.width)
+
+    def update(self, values):
+        """Count a batch of values."""
+        if not len(values):
+            return
+        columns = self._columns(values).astype(np.int64)
+        if len(values) < self.width // 8:
+            # Small batches, such as single requests, skip allocating a full-width count vector per row
+            np.add.at(self.table, (np.repeat(np.arange(self.depth), len(values)), columns.ravel()), 1)
+        else:
+            for row in range(self.depth):
+                self.table[row] += np.bincount(columns[row], minlength=self.width)
+        self.total += len(values)
+
+    def add(self, value):
+        """Count one value without numpy overhead; same counters as update()."""
+        digest = zlib.crc32(str(value).encode("utf-8"))
+        for row, (multiplier, increment) in enumerate(self._row_hashes):
+            self.table[row, (((multiplier * digest + increment) & 0xFFFFFFFFFFFFFFFF) >> 33) % self.width] += 1
+        self.total += 1
+
+    def estimate(self, values):
+        """Return the estimated count of each value."""
+        columns = self._columns(values).astype(np.int64)
+        return self.table[np.arange(self.depth)[:, None], columns].min(axis=0)
+
+    def merge(self, other):
+        """Add the counts of a sketch with the same width, depth and seed."""
+        if (self.width, self.depth, self.seed) != (other.width, other.depth, other.seed):
+            raise ValueError("Cannot merge count-min sketches with different shapes or seeds.")
+        self.table += other.table
+        self.total += other.total
+
+    def to_dict(self):
+        return {"width": self.width, "depth": self.depth, "seed": self.seed, "total": self.total,
+                "table": self.table.tolist()}
+
+    @classmethod
+    def from_dict(cls, state):
+        sketch = cls(state["width"], state["depth"], state["seed"])
+        sketch.table = np.asarray(state["table"], dtype=np.int64)
+        sketch.total = state["total"]
+        return sketch
+
+def _number(value):
+    """Return a record value as a float, or NaN if it is missing or not numeric."""
+    return float(value) if isinstance(value, (int, float)) else np.nan
+
+def psi(expected, actual):
+    """Population stability index between two share vectors over the same bins."""
+    expected = np.clip(np.asarray(expected, dtype=np.float64), PSI_EPSILON, None)
+    actual = np.clip(np.asarray(actual, dtype=np.float64), PSI_EPSILON, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+def ks_statistic(expected, actual):
+    """Kolmogorov-Smirnov distance between two share vectors, evaluated at the bin edges."""
+    return float(np.max(np.abs(np.cumsum(expected) - np.cumsum(actual)))) if len(expected) else 0.0
+
+def build_baseline(X, scores=None, labels=None, n_bins=DRIFT_BINS, categorical_columns=None,
+                   top_categories=DRIFT_TOP_CATEGORIES):
+    """Build the drift baseline of a training holdout: feature and score sketches, category shares, fraud rate."""
+    categorical_columns = DRIFT_CATEGORICAL_COLUMNS if categorical_columns is None else categorical_columns
+    baseline = {"rows": int(len(X)), "features": {}, "categorical": {}, "scores": None, "fraud_rate": None}
+    for column in X.columns:
+        if column in categorical_columns:
+            shares = X[column].astype(str).value_counts(normalize=True)
+            baseline["categorical"][column] = {"shares": shares.head(top_categories).to_dict()}
+        elif pd.api.types.is_numeric_dtype(X[column]):
+            baseline["features"][column] = QuantileSketch.from_values(X[column], n_bins).to_dict()
+    if scores is not None:
+        baseline["scores"] = QuantileSketch.from_values(scores, n_bins).to_dict()
+    if labels is not None:
+        baseline["fraud_rate"] = float(np.mean(np.asarray(labels) == 1)) if len(labels) else 0.0
+    baseline["baseline_id"] = hashlib.md5(json.dumps(baseline, sort_keys=True).encode("utf-8")).hexdigest()
+    return baseline
+
+def baseline_path(model_path):
+    """Return where the baseline of a model file is stored: next to it, with a _baseline.json suffix."""
+    return f"{os.path.splitext(model_path)[0]}_baseline.json"
+
+def save_baseline(baseline, path):
+    """Write a baseline to a JSON file."""
+    with open(path, "w") as baseline_file:
+        json.dump(baseline, baseline_file)
+
+def load_baseline(path):
+    """Read a baseline JSON file; returns None if there is none."""
+    try:
+        with open(path) as baseline_file:
+            return json.load(baseline_file)
+    except FileNotFoundError:
+        logger.info(f"No drift baseline at {path}; drift monitoring is off.")
+    except Exception as e:
+        logger.error(f"Failed to load drift baseline from {path}: {str(e)}")
+    return None
+
+def read_baseline_blob(blob_service_client, container, model_blob_name):
+    """Download the baseline stored next to a model blob; returns None if there is none."""
+    try:
+        blob_client = blob_service_client.get_blob_client(container=container, blob=baseline_path(model_blob_name))
+        return json.loads(blob_client.download_blob().readall())
+    except Exception as e:
+        logger.info(f"No drift baseline for {model_blob_name}; drift monitoring is off ({str(e)}).")
+        return None
+
+class DriftMonitor:
+    """Online sketches of the scored inputs and fraud scores, compared with the training baseline.
+
+    Numeric features and the fraud score go into QuantileSketches on the baseline's edges,
+    categorical columns into a CountMinSketch, and rows and flagged rows are counted. Memory is
+    fixed by the baseline, and monitors over the same baseline merge, e.g. across gunicorn workers.
+    """
+
+    def __init__(self, baseline):
+        self.baseline = baseline
+        self.features = {name: QuantileSketch(state["edges"]) for name, state in baseline["features"].items()}
+        self._feature_names = list(self.features)
+        self.categorical = {name: CountMinSketch() for name in baseline["categorical"]}
+        self.scores = QuantileSketch(baseline["scores"]["edges"]) if baseline.get("scores") else None
+        self.rows = 0
+        self.flagged = 0
+        self._lock = threading.Lock()
+
+    def update(self, rows, scores=None, labels=None):
+        """Add a scored batch: its features as a DataFrame or a list of dicts, fraud scores and predicted labels.
+
+        NaN scores, for rows a cascade decided before the last tree, are left out of the score sketch.
+        """
+        if not isinstance(rows, pd.DataFrame) and len(rows) == 1:
+            self._add(rows[0], scores, labels)
+            return
+        if isinstance(rows, pd.DataFrame):
+            values = np.column_stack([rows[name].to_numpy() if name in rows.columns else np.full(len(rows), np.nan)
+                                      for name in self._feature_names]) if self._feature_names else None
+            categories = {name: rows[name].to_numpy() for name in self.categorical if name in rows.columns}
+        else:
+            # Plain dicts from single-request paths avoid the per-column overhead of a DataFrame
+            values = np.array([[_number(row.get(name)) for name in self._feature_names] for row in rows],
+                              dtype=np.float64).reshape(len(rows), len(self._feature_names))
+            categories = {name: [row[name] for row in rows if row.get(name) is not None] for name in self.categorical}
+        with self._lock:
+            for i, sketch in enumerate(self.features.values()):
+                sketch.update(values[:, i])
+            for name, values in categories.items():
+                self.categorical[name].update(values)
+            if scores is not None and self.scores is not None:
+                scores = np.asarray(scores, dtype=np.float64)
+                self.scores.update(scores[~np.isnan(scores)])
+            self.rows += len(rows)
+            if labels is not None:
+                self.flagged += int(np.sum(np.asarray(labels) == 1))
+
+    def _add(self, row, scores=None, labels=None):
+        """Add one scored row given as a dict."""
+        with self._lock:
+            for name, sketch in self.features.items():
+                sketch.add(_number(row.get(name)))
+            for name, sketch in self.categorical.items():
+                if row.get(name) is not None:
+                    sketch.add(row[name])
+            if scores is not None and self.scores is not None and scores[0] == scores[0]:
+                self.scores.add(float(scores[0]))
+            self.rows += 1
+            if labels is not None and labels[0] == 1:
+                self.flagged += 1
+
+    def merge(self, other):
+        """Add another monitor's sketches over the same baseline into this one."""
+        if other.baseline.get("baseline_id") != self.baseline.get("baseline_id"):
+            raise ValueError("Cannot merge drift monitors with different baselines.")
+        with self._lock:
+            for name, sketch in self.features.items():
+                sketch.merge(other.features[name])
+            for name, sketch in self.categorical.items():
+                sketch.merge(other.categorical[name])
+            if self.scores is not None:
+                self.scores.merge(other.scores)
+            self.rows += other.rows
+            self.flagged += other.flagged
+
+    def report(self, psi_alert=DRIFT_PSI_ALERT):
+        """Return PSI/KS per feature and for the fraud score, category PSI and the flagged rate vs the baseline."""
+        with self._lock:
+            report = {"rows": self.rows, "features": {}, "categorical": {}, "drifted": [],
+                      "fraud_rate": self.flagged / self.rows if self.rows else None,
+                      "baseline_fraud_rate": self.baseline.get("fraud_rate")}
+            sketches = dict(self.features)
+            if self.scores is not None:
+                sketches[SCORE_NAME] = self.scores
+            for name, sketch in sketches.items():
+                expected = QuantileSketch.from_dict(self.baseline["scores"] if name == SCORE_NAME
+                                                    else self.baseline["features"][name])
+                seen = sketch.total + sketch.missing
+                report["features"][name] = {
+                    "psi": psi(expected.shares(), sketch.shares()) if sketch.total else None,
+                    "ks": ks_statistic(expected.shares(), sketch.shares()) if sketch.total else None,
+                    "median": sketch.quantile(0.5) if sketch.total else None,
+                    "baseline_median": expected.quantile(0.5),
+                    "missing_rate": sketch.missing / seen if seen else None,
+                }
+            for name, sketch in self.categorical.items():
+                baseline_shares = self.baseline["categorical"][name]["shares"]
+                expected = np.array(list(baseline_shares.values()) + [max(0.0, 1.0 - sum(baseline_shares.values()))])
+                if sketch.total:
+                    counts = np.minimum(sketch.estimate(list(baseline_shares)), sketch.total)
+                    actual = np.append(counts, max(0, sketch.total - counts.sum())) / sketch.total
+                    report["categorical"][name] = {"psi": psi(expected, actual),
+                                                   "other_share": float(actual[-1]), "baseline_other_share": float(expected[-1])}
+                else:
+                    report["categorical"][name] = {"psi": None}
+        for section in ("features", "categorical"):
+            for name, entry in report[section].items():
+                if entry["psi"] is not None and entry["psi"] > psi_alert:
+                    report["drifted"].append(name)
+        return report
+
+    def to_dict(self):
+        """Return the sketches as a JSON-serialisable snapshot."""
+        with self._lock:
+            return {"baseline_id": self.baseline.get("baseline_id"), "rows": self.rows, "flagged": self.flagged,
+                    "features": {name: sketch.to_dict() for name, sketch in self.features.items()},
+                    "categorical": {name: sketch.to_dict() for name, sketch in self.categorical.items()},
+                    "scores": self.scores.to_dict() if self.scores is not None else None}
+
+    @classmethod
+    def from_dict(cls, baseline, state):
+        """Rebuild a monitor from a snapshot taken over the given baseline."""
+        if state.get("baseline_id") != baseline.get("baseline_id"):
+            raise ValueError("Snapshot was taken over a different baseline.")
+        monitor = cls(baseline)
+        monitor.rows, monitor.flagged = state["rows"], state["flagged"]
+        monitor.features = {name: QuantileSketch.from_dict(s) for name, s in state["features"].items()}
+        monitor.categorical = {name: CountMinSketch.from_dict(s) for name, s in state["categorical"].items()}
+        monitor.scores = QuantileSketch.from_dict(state["scores"]) if state.get("scores") else None
+        return monitor
+
+def export_report(report, service, registry=METRICS):
+    """Set the drift gauges of a report."""
+    for section in ("features", "categorical"):
+        for name, entry in report[section].items():
+            if entry["psi"] is not None:
+                registry.set_gauge("fraud_drift_psi", round(entry["psi"], 6), service=service, feature=name)
+            if entry.get("ks") is not None:
+                registry.set_gauge("fraud_drift_ks", round(entry["ks"], 6), service=service, feature=name)
+    registry.set_gauge("fraud_drift_rows", report["rows"], service=service)
+    if report["fraud_rate"] is not None:
+        registry.set_gauge("fraud_flagged_rate", round(report["fraud_rate"], 6), service=service)
+
+def write_snapshot(monitor, service, state_dir=DRIFT_STATE_DIR):
+    """Write the monitor's sketches to state_dir/<service>-<host>-<pid>.json for merging."""
+    path = os.path.join(state_dir, f"{service}-{socket.gethostname()}-{os.getpid()}.json")
+    try:
+        os.makedirs(state_dir, exist_ok=True)
+        with open(f"{path}.tmp", "w") as state_file:
+            json.dump(monitor.to_dict(), state_file)
+        os.replace(f"{path}.tmp", path)
+        return path
+    except Exception as e:
+        logger.error(f"Failed to write drift snapshot to {path}: {str(e)}")
+        return None
+
+def merge_snapshots(baseline, paths):
+    """Merge the snapshots taken over the baseline into one monitor; others are skipped."""
+    merged = DriftMonitor(baseline)
+    for path in paths:
+        try:
+            with open(path) as state_file:
+                merged.merge(DriftMonitor.from_dict(baseline, json.load(state_file)))
+        except Exception as e:
+            logger.warning(f"Skipping drift snapshot {path}: {str(e)}")
+    return merged
+
+# Baseline of the loaded model, and the per-process monitor over it, created on first use in each worker
+baseline = None
+monitor = None
+monitor_pid = None
+monitor_lock = threading.Lock()
+last_refresh = 0.0
+last_snapshot = 0.0
+
+def set_drift_baseline(new_baseline):
+    """Use the baseline of a newly loaded model; the sketches restart from empty. None turns monitoring off."""
+    global baseline, monitor, monitor_pid
+    with monitor_lock:
+        baseline = new_baseline
+        monitor, monitor_pid = None, None
+
+def get_drift_monitor():
+    """Return this process's DriftMonitor, or None when the model has no baseline."""
+    global monitor, monitor_pid
+    if monitor_pid != os.getpid():
+        with monitor_lock:
+            if monitor_pid != os.getpid():
+                monitor = DriftMonitor(baseline) if baseline is not None else None
+                monitor_pid = os.getpid()
+    return monitor
+
+def observe_drift(service, frame, scores=None, labels=None):
+    """Add a scored batch to the drift sketches, refreshing the gauges and the snapshot when they are due."""
+    global last_refresh, last_snapshot
+    drift_monitor = get_drift_monitor()
+    if drift_monitor is None:
+        return
+    try:
+        drift_monitor.update(frame, scores, labels)
+        now = time.monotonic()
+        if now - last_refresh >= DRIFT_REFRESH_SECONDS:
+            last_refresh = now
+            export_report(drift_monitor.report(), service)
+        if DRIFT_STATE_DIR and now - last_snapshot >= DRIFT_SNAPSHOT_SECONDS:
+            last_snapshot = now
+            write_snapshot(drift_monitor, service)
+    except Exception as e:
+        logger.error(f"Failed to update drift sketches: {str(e)}")
+
+def main():
+    """Main function to merge the workers' drift snapshots and report drift against the training baseline."""
+    current = load_baseline(DRIFT_BASELINE_PATH)
+    if current is None:
+        return
+    if not DRIFT_STATE_DIR:
+        logger.error("DRIFT_STATE_DIR is not set; there are no snapshots to merge.")
+        return
+    paths = sorted(glob.glob(os.path.join(DRIFT_STATE_DIR, "*.json")))
+    report = merge_snapshots(current, paths).report()
+    report["snapshots"] = len(paths)
+    logger.info(f"Merged {len(paths)} snapshots covering {report['rows']} rows; drifted: {report['drifted'] or 'none'}.")
+    for section in ("features", "categorical"):
+        for name, entry in report[section].items():
+            if entry["psi"] is not None:
+                logger.info(f"{name:<24} PSI {entry['psi']:.4f}" + (f"  KS {entry['ks']:.4f}" if entry.get("ks") is not None else ""))
+    try:
+        with open(DRIFT_REPORT_PATH, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+        logger.info(f"Drift report written to {DRIFT_REPORT_PATH}.")
+    except Exception as e:
+        logger.error(f"Failed to write drift report: {str(e)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Metrics configuration
+METRICS_SAMPLE_RATE = float(os.getenv("METRICS_SAMPLE_RATE", "0.1"))  # Fraction of events whose stages are timed
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))  # Sidecar port for the Event Hub consumers
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Quantiles exported for every latency histogram
+EXPORTED_QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+METRIC_HELP = {
+    "fraud_stage_latency_seconds": ("summary", "Latency of each processing stage (sampled events only)."),
+    "fraud_events_total": ("counter", "Events or requests received."),
+    "fraud_errors_total": ("counter", "Events or requests that failed."),
+    "fraud_checkpoints_total": ("counter", "Event Hub checkpoints written."),
+    "fraud_eventhub_lag_events": ("gauge", "Events enqueued in the partition but not yet processed."),
+    "fraud_batch_size": ("histogram", "Rows scored per coalesced model call."),
+    "fraud_batch_queue_delay_seconds": ("summary", "Time a request waited in the batching queue before scoring."),
+    "fraud_dead_letters_total": ("counter", "Events sent to the dead-letter sink, by reason."),
+    "fraud_retries_total": ("counter", "Background retries of failed event operations."),
+    "fraud_partition_stalled": ("gauge", "1 while a partition's checkpoint is held by an event the dead-letter sink rejected."),
+    "fraud_cascade_rows_total": ("counter", "Rows scored by the cascade, by the stage that resolved them."),
+    "fraud_cascade_trees_total": ("counter", "Trees evaluated by the cascade's forest stage."),
+    "fraud_drift_psi": ("gauge", "Population stability index of a feature or the fraud score against the training baseline."),
+    "fraud_drift_ks": ("gauge", "Kolmogorov-Smirnov distance of a feature or the fraud score from the training baseline."),
+    "fraud_drift_rows": ("gauge", "Scored rows in this process's drift sketches."),
+    "fraud_flagged_rate": ("gauge", "Share of scored rows labeled fraud."),
+    "fraud_shadow_rows_total": ("counter", "Rows scored by a shadow candidate model."),
+    "fraud_shadow_disagreements_total": ("counter", "Rows a shadow candidate labeled differently from the live model."),
+    "fraud_shadow_errors_total": ("counter", "Batches a shadow candidate failed to score."),
+    "fraud_shadow_dropped_total": ("counter", "Rows not shadow-scored because the candidates' queue was full."),
+    "fraud_shadow_latency_seconds": ("summary", "Time the live model and each shadow candidate took to score a batch."),
+}
+
+class LatencyHistogram:
+    """Log-linear latency histogram with ~1.5% relative precision, in the style of HdrHistogram.
+
+    Values are recorded in whole microseconds. Values below 2**sub_bucket_bits get their own
+    bucket; above that each power of two is split into 2**(sub_bucket_bits - 1) linear buckets,
+    so recording is a couple of integer operations and memory stays fixed.
+    """
+
+    def __init__(self, sub_bucket_bits=7, max_value_us=3600 * 1000000):
+        self._sub_bucket_count = 1 << sub_bucket_bits
+        self._half_count = self._sub_bucket_count >> 1
+        self._sub_bucket_bits = sub_bucket_bits
+        self._max_value_us = max_value_us
+        self._counts = [0] * (self._index_for(max_value_us) + 1)
+        self._lock = threading.Lock()
+        self.total_count = 0
+        self.total_sum_us = 0
+
+    def _index_for(self, value_us):
+        """Return the bucket index for a value in microseconds."""
+        if value_us < self._sub_bucket_count:
+            return value_us
+        shift = value_us.bit_length() - self._sub_bucket_bits
+        return self._sub_bucket_count + (shift - 1) * self._half_count + ((value_us >> shift) - self._half_count)
+
+    def _value_for(self, index):
+        """Return a representative (midpoint) value in microseconds for a bucket index."""
+        if index < self._sub_bucket_count:
+            return index
+        shift = (index - self._sub_bucket_count) // self._half_count + 1
+        sub_bucket = (index - self._sub_bucket_count) % self._half_count + self._half_count
+        return (sub_bucket << shift) + ((1 << shift) >> 1)
+
+    def record(self, seconds):
+        """Record a duration given in seconds."""
+        value_us = min(max(int(seconds * 1000000), 0), self._max_value_us)
+        index = self._index_for(value_us)
+        with self._lock:
+            self._counts[index] += 1
+            self.total_count += 1
+            self.total_sum_us += value_us
+
+    def merge(self, other):
+        """Add the counts of another histogram with the same layout into this one."""
+        with self._lock:
+            for index, count in enumerate(other._counts):
+                if count:
+                    self._counts[index] += count
+            self.total_count += other.total_count
+            self.total_sum_us += other.total_sum_us
+
+    def quantile(self, q):
+        """Return the q-quantile in seconds, or 0.0 if nothing was recorded."""
+        with self._lock:
+            if self.total_count == 0:
+                return 0.0
+            target = max(1, int(q * self.total_count + 0.5))
+            seen = 0
+            for index, count in enumerate(self._counts):
+                seen += count
+                if seen >= target:
+                    return self._value_for(index) / 1000000.0
+        return self._max_value_us / 1000000.0
+
+class BucketHistogram:
+    """Classic Prometheus histogram with fixed upper bounds, for small value ranges such as batch sizes."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._lock = threading.Lock()
+        self.total_count = 0
+        self.total_sum = 0
+
+    def record(self, value):
+        """Record one value."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self.total_count += 1
+            self.total_sum += value
+
+    def cumulative_counts(self):
+        """Return (upper_bound, cumulative_count) pairs, ending with +Inf."""
+        with self._lock:
+            counts = list(self._counts)
+        pairs = []
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            running += count
+            pairs.append((bound, running))
+        return pairs
+
+class _StageTimer:
+    """Context manager recording the duration of one stage into the registry."""
+
+    __slots__ = ("_registry", "_labels", "_start")
+
+    def __init__(self, registry, labels):
+        self._registry = registry
+        self._labels = labels
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._registry.observe("fraud_stage_latency_seconds", time.perf_counter() - self._start, **self._labels)
+        return False
+
+class _NullStageTimer:
+    """No-op stage timer used for events that are not sampled."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_STAGE_TIMER = _NullStageTimer()
+
+class EventTimer:
+    """Times the stages of one sampled event."""
+
+    __slots__ = ("_registry", "service")
+
+    def __init__(self, registry, service):
+        self._registry = registry
+        self.service = service
+
+    def stage(self, name):
+        """Return a context manager timing the named stage."""
+        return _StageTimer(self._registry, {"service": self.service, "stage": name})
+
+class NullEventTimer:
+    """Stage timer for events skipped by sampling; every stage is a no-op."""
+
+    __slots__ = ("service",)
+
+    def __init__(self, service):
+        self.service = service
+
+    def stage(self, name):
+        """Return a no-op context manager."""
+        return _NULL_STAGE_TIMER
+
+class MetricsRegistry:
+    """Process-wide counters, gauges and latency histograms, rendered in the Prometheus text format."""
+
+    def __init__(self, sample_rate=METRICS_SAMPLE_RATE):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._bucket_histograms = {}
+        self._calls = 0
+        self.set_sample_rate(sample_rate)
+
+    def set_sample_rate(self, sample_rate):
+        """Time one in every round(1 / sample_rate) events; 0 disables stage timing."""
+        self.sample_rate = sample_rate
+        self._sample_every = max(1, int(round(1.0 / sample_rate))) if sample_rate > 0 else 0
+
+    def should_sample(self):
+        """Return True if the current event should have its stages timed."""
+        if self._sample_every == 0:
+            return False
+        # An unlocked counter is fine here: a lost increment only shifts which event is sampled
+        self._calls += 1
+        return self._calls % self._sample_every == 0
+
+    def start_event(self, service):
+        """Count an incoming event and return a timer for its stages."""
+        self.inc("fraud_events_total", service=service)
+        if self.should_sample():
+            return EventTimer(self, service)
+        return NullEventTimer(service)
+
+    def inc(self, name, value=1, **labels):
+        """Increment a counter."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        """Set a gauge to the given value."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name, seconds, **labels):
+        """Record a duration into the histogram for the given name and labels."""
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, LatencyHistogram())
+        histogram.record(seconds)
+
+    def observe_value(self, name, value, buckets, **labels):
+        """Record a value into a fixed-bucket histogram for the given name and labels."""
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._bucket_histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._bucket_histograms.setdefault(key, BucketHistogram(buckets))
+        histogram.record(value)
+
+    def counter_value(self, name, **labels):
+        """Return the current value of a counter."""
+        return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def gauge_value(self, name, **labels):
+        """Return the current value of a gauge, or None if it was never set."""
+        return self._gauges.get((name, tuple(sorted(labels.items()))))
+
+    def histogram(self, name, **labels):
+        """Return the histogram for the given name and labels, or None."""
+        key = (name, tuple(sorted(labels.items())))
+        return self._histograms.get(key) or self._bucket_histograms.get(key)
+
+    def reset(self):
+        """Drop all recorded metrics."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+            self._bucket_histograms.clear()
+
+    def render_prometheus(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = dict(self._histograms)
+            bucket_histograms = dict(self._bucket_histograms)
+
+        lines = []
+        described = set()
+        for key, value in sorted(counters.items()) + sorted(gauges.items()):
+            name, labels = key
+            _describe(lines, described, name)
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for key, histogram in sorted(histograms.items()):
+            name, labels = key
+            _describe(lines, described, name)
+            for q in EXPORTED_QUANTILES:
+                lines.append(f"{name}{_format_labels(labels + (('quantile', str(q)),))} {histogram.quantile(q):.6f}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram.total_sum_us / 1000000.0:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.total_count}")
+        for key, histogram in sorted(bucket_histograms.items()):
+            name, labels = key
+            _describe(lines, described, name)
+            for bound, count in histogram.cumulative_counts():
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram.total_sum}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.total_count}")
+        return "\n".join(lines) + "\n"
+
+def _describe(lines, described, name):
+    """Emit the HELP and TYPE lines for a metric once."""
+    if name in described:
+        return
+    metric_type, help_text = METRIC_HELP.get(name, ("untyped", name))
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {metric_type}")
+    described.add(name)
+
+def _format_labels(labels):
+    """Format a label tuple as a Prometheus label set."""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label_value(value)}"' for key, value in labels) + "}"
+
+def _escape_label_value(value):
+    """Escape a label value as the Prometheus text format requires: backslash, double quote and newline."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+# Shared registry used by the API and the consumers
+METRICS = MetricsRegistry()
+
+def record_eventhub_lag(service, partition_context, event):
+    """Update the per-partition lag gauge from the last enqueued event properties.
+
+    Requires the consumer to call receive() with track_last_enqueued_event_properties=True.
+    """
+    try:
+        properties = partition_context.last_enqueued_event_properties
+        if properties and properties.get("sequence_number") is not None and event is not None:
+            lag = properties["sequence_number"] - event.sequence_number
+            METRICS.set_gauge("fraud_eventhub_lag_events", lag, service=service, partition=partition_context.partition_id)
+    except Exception as e:
+        logger.debug(f"Could not read partition lag: {e}")
+
+def record_checkpoint(service, partition_context):
+    """Count a checkpoint written for the partition."""
+    METRICS.inc("fraud_checkpoints_total", service=service, partition=partition_context.partition_id)
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Serves the registry on /metrics, plus optional POST routes such as admin hooks."""
+
+    registry = METRICS
+    post_routes = {}
+
+    def do_GET(self):
+        if urlsplit(self.path).path != "/metrics":
+            self.send_error(404)
+            return
+        self._respond(200, self.registry.render_prometheus(), PROMETHEUS_CONTENT_TYPE)
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        route = self.post_routes.get(url.path)
+        if route is None:
+            self.send_error(404)
+            return
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        status, payload = route(query, self.headers)
+        self._respond(status, json.dumps(payload), "application/json")
+
+    def _respond(self, status, text, content_type):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Keep scrapes out of the service log."""
+        return
+
+def start_metrics_server(port=METRICS_PORT, host="0.0.0.0", registry=METRICS, post_routes=None):
+    """Serve /metrics on a background thread for processes without a web server.
+
+    post_routes maps a path to a function(query, headers) returning (status_code, response_dict).
+    """
+    handler = type("MetricsRequestHandler", (_MetricsRequestHandler,), {
+        "registry": registry,
+        "post_routes": dict(post_routes or {}),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    logger.info(f"Metrics available on http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,255 @@
+import os
+import gc
+import sys
+import hmac
+import json
+import time
+import signal
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Profiling configuration
+PROFILE_OUTPUT_DIR = os.getenv("PROFILE_OUTPUT_DIR", "profiles")
+PROFILE_DEFAULT_SECONDS = float(os.getenv("PROFILE_DEFAULT_SECONDS", "30"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "300"))
+PROFILE_INTERVAL_SECONDS = float(os.getenv("PROFILE_INTERVAL_SECONDS", "0.005"))  # 200 stack samples per second
+PROFILE_SIGNAL = os.getenv("PROFILE_SIGNAL", "SIGUSR2")
+PROFILING_ADMIN_TOKEN = os.getenv("PROFILING_ADMIN_TOKEN")  # HTTP trigger is disabled unless this is set
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+PROFILER_THREAD_NAMES = ("sampling-profiler", "profile-session")
+TRACEMALLOC_FRAMES = 10
+TOP_ALLOCATIONS = 25
+TOP_DATAFRAMES = 20
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler that periodically captures the stacks of all other threads.
+
+    Nothing is installed in the profiled code: a background thread reads sys._current_frames()
+    while the profile runs, so an idle process pays nothing.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start sampling on a background thread."""
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and wait for the sampler thread to exit."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        thread_names = {}
+        while not self._stop.wait(self.interval):
+            if len(thread_names) != threading.active_count():
+                thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                thread_name = thread_names.get(thread_id, str(thread_id))
+                if thread_name in PROFILER_THREAD_NAMES:
+                    continue
+                self.stacks[_collapse_stack(thread_name, frame)] += 1
+            self.samples += 1
+
+    def write_collapsed(self, output_file_path):
+        """Write stacks in the collapsed format read by flamegraph.pl, speedscope and inferno."""
+        with open(output_file_path, "w") as output_file:
+            for stack, count in self.stacks.most_common():
+                output_file.write(f"{stack} {count}\n")
+
+def _collapse_stack(thread_name, frame):
+    """Render a frame and its callers as a root-first, semicolon separated stack."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    names.append(f"thread:{thread_name}")
+    return ";".join(reversed(names))
+
+def top_allocations(snapshot, limit=TOP_ALLOCATIONS):
+    """Return the largest allocation sites of a tracemalloc snapshot."""
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    allocations = []
+    for stat in snapshot.statistics("lineno")[:limit]:
+        frame = stat.traceback[0]
+        allocations.append({
+            "file": frame.filename,
+            "line": frame.lineno,
+            "size_bytes": stat.size,
+            "count": stat.count,
+        })
+    return allocations
+
+def dataframe_memory_report(limit=TOP_DATAFRAMES):
+    """Return the memory usage of the pandas DataFrames currently alive in the process.
+
+    Frames are found through the garbage collector, so request handlers need no bookkeeping.
+    """
+    if "pandas" not in sys.modules:
+        return {"count": 0, "total_bytes": 0, "frames": []}
+    import pandas as pd
+
+    frames = []
+    for obj in gc.get_objects():
+        if isinstance(obj, pd.DataFrame):
+            try:
+                size = int(obj.memory_usage(index=True, deep=True).sum())
+            except Exception:
+                continue
+            frames.append({
+                "id": hex(id(obj)),
+                "shape": list(obj.shape),
+                "columns": [str(column) for column in obj.columns[:20]],
+                "memory_bytes": size,
+            })
+    frames.sort(key=lambda frame: frame["memory_bytes"], reverse=True)
+    return {
+        "count": len(frames),
+        "total_bytes": sum(frame["memory_bytes"] for frame in frames),
+        "frames": frames[:limit],
+    }
+
+class ProfileSession:
+    """One profiling run: stack sampling and tracemalloc for a fixed duration, then a dump to disk."""
+
+    _lock = threading.Lock()
+    _active = None
+
+    def __init__(self, service, seconds, output_dir=PROFILE_OUTPUT_DIR, interval=PROFILE_INTERVAL_SECONDS):
+        self.service = service
+        self.seconds = seconds
+        self.output_dir = output_dir
+        self.profiler = SamplingProfiler(interval=interval)
+        stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+        self.output_prefix = os.path.join(output_dir, f"{service}_{os.getpid()}_{stamp}")
+        self._started_tracemalloc = False
+
+    @classmethod
+    def is_running(cls):
+        """Return True while a profile is being captured in this process."""
+        return cls._active is not None
+
+    def start(self):
+        """Start the profile in the background; returns False if another profile is running."""
+        with ProfileSession._lock:
+            if ProfileSession._active is not None:
+                return False
+            ProfileSession._active = self
+        threading.Thread(target=self._run, name="profile-session", daemon=True).start()
+        return True
+
+    def _run(self):
+        try:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+                self._started_tracemalloc = True
+            logger.info(f"Profiling {self.service} (pid {os.getpid()}) for {self.seconds:.0f}s...")
+            started = time.perf_counter()
+            self.profiler.start()
+            time.sleep(self.seconds)
+            self.profiler.stop()
+            elapsed = time.perf_counter() - started
+            self.write(elapsed, tracemalloc.take_snapshot())
+        except Exception as e:
+            logger.error(f"Profiling failed: {str(e)}")
+        finally:
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+            with ProfileSession._lock:
+                ProfileSession._active = None
+
+    def write(self, elapsed, snapshot):
+        """Write the collapsed stacks and a JSON memory report next to each other."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.profiler.write_collapsed(f"{self.output_prefix}.folded")
+        traced_current, traced_peak = tracemalloc.get_traced_memory()
+        report = {
+            "service": self.service,
+            "pid": os.getpid(),
+            "duration_s": elapsed,
+            "stack_samples": self.profiler.samples,
+            "sample_interval_s": self.profiler.interval,
+            "tracemalloc": {
+                "current_bytes": traced_current,
+                "peak_bytes": traced_peak,
+                "top_allocations": top_allocations(snapshot),
+            },
+            "dataframes": dataframe_memory_report(),
+        }
+        with open(f"{self.output_prefix}.memory.json", "w") as json_file:
+            json.dump(report, json_file, indent=4)
+        logger.info(f"Profile written to {self.output_prefix}.folded and {self.output_prefix}.memory.json")
+
+def start_profile(service, seconds=PROFILE_DEFAULT_SECONDS, output_dir=PROFILE_OUTPUT_DIR):
+    """Start a profile of the current process; returns the session, or None if one is already running."""
+    seconds = min(max(float(seconds), 0.1), PROFILE_MAX_SECONDS)
+    session = ProfileSession(service, seconds, output_dir=output_dir)
+    if not session.start():
+        logger.warning("A profile is already running; ignoring request.")
+        return None
+    return session
+
+def install_signal_handler(service, signal_name=PROFILE_SIGNAL, seconds=PROFILE_DEFAULT_SECONDS):
+    """Start a profile when the process receives the given signal (e.g. `kill -USR2 <pid>`)."""
+    signum = getattr(signal, signal_name, None)
+    if signum is None:
+        logger.warning(f"Signal {signal_name} is not available on this platform; profiling signal not installed.")
+        return False
+    requested = threading.Event()
+
+    def watch():
+        while True:
+            requested.wait()
+            requested.clear()
+            start_profile(service, seconds)
+
+    # The handler only sets the event: it can interrupt the main thread while it holds ProfileSession's
+    # lock (or the lock thread creation takes), so the profile is started on this watcher thread instead
+    threading.Thread(target=watch, name="profile-signal", daemon=True).start()
+    signal.signal(signum, lambda received_signum, frame: requested.set())
+    logger.info(f"Send {signal_name} to pid {os.getpid()} to profile {service} for {seconds:.0f}s.")
+    return True
+
+def is_authorized(token, admin_token=None):
+    """Check an admin token in constant time; always False when no admin token is configured."""
+    admin_token = admin_token if admin_token is not None else PROFILING_ADMIN_TOKEN
+    if not admin_token or not token:
+        return False
+    return hmac.compare_digest(str(token), admin_token)
+
+def handle_profile_request(service, token, seconds=None):
+    """Handle an HTTP profiling trigger and return (status_code, response_dict)."""
+    if not is_authorized(token):
+        return 403, {"error": "Forbidden."}
+    try:
+        seconds = float(seconds) if seconds is not None else PROFILE_DEFAULT_SECONDS
+    except ValueError:
+        return 400, {"error": "seconds must be a number."}
+    session = start_profile(service, seconds)
+    if session is None:
+        return 409, {"error": "A profile is already running."}
+    return 202, {"pid": os.getpid(), "seconds": session.seconds, "output_prefix": session.output_prefix}
+
+def admin_routes(service):
+    """POST routes exposing the profiling trigger on the metrics sidecar server."""
+    def profile(query, headers):
+        return handle_profile_request(service, headers.get(ADMIN_TOKEN_HEADER), query.get("seconds"))
+    return {"/admin/profile": profile}
@@ -1,8 +1,8 @@
 import os
 import pandas as pd
 import logging
-from azure.storage.blob import BlobServiceClient
-from azure.identity import DefaultAzureCredential
+from src.ingestion.blob_discovery import IncrementalBlobSource, manifest_path
+from src.processing.sql_sink import save_to_sql
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -10,13 +10,22 @@ logger = logging.getLogger(__name__)
 
 # Azure Blob Storage configuration
 AZURE_BLOB_CONNECTION_STRING = os.getenv("AZURE_BLOB_CONNECTION_STRING")
-BLOB_SERVICE_CLIENT = BlobServiceClient.from_connection_string(AZURE_BLOB_CONNECTION_STRING)
+BLOB_SERVICE_CLIENT = None  # Created on first use by get_blob_service_client(); assign a client to inject one
 CONTAINER_NAME = "fraud-events"  # The container where event data files are stored
 
+def get_blob_service_client():
+    """Return the blob service client, creating it from the connection string on first use."""
+    global BLOB_SERVICE_CLIENT
+    if BLOB_SERVICE_CLIENT is None:
+        from azure.storage.blob import BlobServiceClient
+        BLOB_SERVICE_CLIENT = BlobServiceClient.from_connection_string(AZURE_BLOB_CONNECTION_STRING)
+    return BLOB_SERVICE_CLIENT
+
 def load_data_from_blob(file_path):
     """Load data from Azure Blob Storage based on file format."""
     try:
-        blob_client = BLOB_SERVICE_CLIENT.get_blob_client(container=CONTAINER_NAME, blob=file_path)
+        blob_client = get_blob_service_client().get_blob_client(container=CONTAINER_NAME, blob=file_path)
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
         with open(file_path, "wb") as download_file:
             download_file.write(blob_client.download_blob().readall())
         
@@ -67,7 +76,7 @@ def clean_and_transform_data(df):
 def save_transformed_data(df, output_file_path):
     """Save the transformed DataFrame to Azure Blob Storage."""
     try:
-        output_blob_client = BLOB_SERVICE_CLIENT.get_blob_client(container=CONTAINER_NAME, blob=output_file_path)
+        output_blob_client = get_blob_service_client().get_blob_client(container=CONTAINER_NAME, blob=output_file_path)
         
         # Save the transformed DataFrame to CSV
         df.to_csv(output_file_path, index=False)
@@ -76,20 +85,20 @@ def save_transformed_data(df, output_file_path):
             output_blob_client.upload_blob(data, overwrite=True)
         
         logger.info(f"Transformed data saved successfully to {output_file_path}.")
+        return True
     except Exception as e:
         logger.error(f"Failed to save transformed data to {output_file_path}: {str(e)}")
+        return False
 
 def main():
     """Main function to load, transform, and save data."""
     
-    # Specify the paths to the event data files
-    event_data_files = [
-        "events/transaction_event_1.json",
-        "events/transaction_event_2.json",
-        # Add more event files as needed
-    ]
+    # Only process event blobs that are new or changed since the last run
+    source = IncrementalBlobSource(get_blob_service_client().get_container_client(CONTAINER_NAME), manifest_path("data_transformation"))
     
-    for file_path in event_data_files:
+    for blob in source.discover():
+        file_path = blob.name
+        
         # Load event data from Blob
         event_data = load_event_data(file_path)
         
@@ -97,10 +106,13 @@ def main():
             # Clean and transform event data
             transformed_data = clean_and_transform_data(event_data)
             
-            # Save transformed data back to Blob
+            # Save transformed data back to Blob, and to the ProcessedTransactions table if SQL_CONNECTION_STRING is set
             output_file_path = f"data/processed/events/transformed_{os.path.basename(file_path)}"
-            if transformed_data is not None:
-                save_transformed_data(transformed_data, output_file_path)
+            if (transformed_data is not None and save_transformed_data(transformed_data, output_file_path)
+                    and save_to_sql(transformed_data, "cleaned transactions")):
+                source.mark_processed(blob)
+    
+    source.advance_watermark()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,380 @@
+import io
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Reference data configuration; enrichment is off unless a snapshot directory or container is set
+REFERENCE_DATA_DIR = os.getenv("REFERENCE_DATA_DIR")
+REFERENCE_DATA_CONTAINER = os.getenv("REFERENCE_DATA_CONTAINER")
+REFERENCE_DATA_PREFIX = os.getenv("REFERENCE_DATA_PREFIX", "reference/")
+REFRESH_SECONDS = float(os.getenv("ENRICHMENT_REFRESH_SECONDS", "300"))
+LRU_SIZE = int(os.getenv("ENRICHMENT_LRU_SIZE", "100000"))  # Long-tail users kept outside the snapshot
+
+# Snapshot file and key column of each reference table; users.csv holds the hot users only
+REFERENCE_TABLES = {
+    "merchants": {"file": "merchants.csv", "key": "merchant_id"},
+    "users": {"file": "users.csv", "key": "user_id"},
+    "fx_rates": {"file": "fx_rates.csv", "key": "currency"},
+}
+LONG_TAIL_TABLE = "users"
+
+class ReferenceTable:
+    """A reference table held as column arrays, with its keys interned into row offsets.
+
+    String columns are stored as categorical codes. Row n is an extra default row of NaN, the one
+    missing value used by both the batch and the single-record path, so a key lookup that misses
+    (offset -1) gathers the defaults without any branching.
+    """
+
+    def __init__(self, key_column, frame, version=None):
+        frame = frame.drop_duplicates(subset=key_column, keep="last")
+        self.key_column = key_column
+        self.version = version
+        self.index = pd.Index(frame[key_column].astype(str).to_numpy())
+        self.offsets = dict(zip(self.index, range(len(self.index))))
+        self.columns = {}
+        for name in frame.columns:
+            if name == key_column:
+                continue
+            values = frame[name]
+            if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+                self.columns[name] = np.append(values.to_numpy(dtype=np.float64), np.nan)
+            else:
+                codes, categories = pd.factorize(values.astype(object), use_na_sentinel=True)
+                self.columns[name] = (np.append(codes.astype(np.int32), -1),
+                                      np.append(categories.to_numpy(dtype=object), np.nan))
+
+    def __len__(self):
+        return len(self.index)
+
+    def positions(self, keys):
+        """Return the row offset of each key, -1 for keys not in the table."""
+        return self.index.get_indexer(pd.Index(np.asarray(keys).astype(str)))
+
+    def gather(self, positions):
+        """Return {column: values} for the given row offsets; offset -1 yields the column default."""
+        return {name: _take(column, positions) for name, column in self.columns.items()}
+
+    def row(self, key):
+        """Return one key's attributes as a dict, or None if the key is not in the table."""
+        offset = self.offsets.get(str(key))
+        if offset is None:
+            return None
+        return {name: _value(column, offset) for name, column in self.columns.items()}
+
+    def defaults(self):
+        """Return the attributes given to a key that is not in the table."""
+        return dict.fromkeys(self.columns, np.nan)
+
+    def coerce(self, record):
+        """Return a long-tail JSON record's attributes typed like the table's columns."""
+        return {name: _coerce(column, record.get(name)) for name, column in self.columns.items()}
+
+def _take(column, positions):
+    """Gather a numeric column or a (codes, categories) column at the given offsets."""
+    if isinstance(column, tuple):
+        codes, categories = column
+        return categories[codes[positions]]
+    return column[positions]
+
+def _value(column, offset):
+    """Read a single value from a numeric or (codes, categories) column."""
+    if isinstance(column, tuple):
+        codes, categories = column
+        return categories[codes[offset]]
+    return float(column[offset])
+
+def _coerce(column, value):
+    """Convert a raw JSON value for a numeric or (codes, categories) column; a missing value is NaN."""
+    if isinstance(column, tuple):
+        return np.nan if value is None else value
+    return _number(value)
+
+def _number(value):
+    """Return a value as a float, or NaN if it is missing or not a number."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+class LRUCache:
+    """A thread-safe, size-bounded least-recently-used map."""
+
+    def __init__(self, max_size=LRU_SIZE):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the cached value and mark it recently used."""
+        with self._lock:
+            if key not in self._items:
+                return default
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        """Cache a value, evicting the least recently used entry when full."""
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        """Drop every cached entry."""
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+class LocalSnapshotSource:
+    """Reads reference snapshots and per-key long-tail records from a local directory."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def version(self, file_name):
+        """Return a version marker for a snapshot (size and mtime), or None if it does not exist."""
+        try:
+            stat = os.stat(os.path.join(self.directory, file_name))
+        except FileNotFoundError:
+            return None
+        return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+    def read(self, file_name):
+        """Return the bytes of a snapshot or record, or None if it does not exist."""
+        try:
+            with open(os.path.join(self.directory, file_name), "rb") as snapshot_file:
+                return snapshot_file.read()
+        except FileNotFoundError:
+            return None
+
+class BlobSnapshotSource:
+    """Reads reference snapshots and per-key long-tail records from a blob container prefix."""
+
+    def __init__(self, container_client, prefix=REFERENCE_DATA_PREFIX):
+        self.container_client = container_client
+        self.prefix = prefix
+
+    def version(self, file_name):
+        """Return the blob's ETag, or None if it does not exist."""
+        blob_client = self.container_client.get_blob_client(self.prefix + file_name)
+        if not blob_client.exists():
+            return None
+        return blob_client.get_blob_properties().etag
+
+    def read(self, file_name):
+        """Return the blob's bytes, or None if it does not exist."""
+        blob_client = self.container_client.get_blob_client(self.prefix + file_name)
+        if not blob_client.exists():
+            return None
+        return blob_client.download_blob().readall()
+
+class EnrichmentCache:
+    """Joins merchant, user and FX attributes onto transactions from in-memory reference tables.
+
+    Snapshots are reloaded in the background when their version changes and swapped in whole, so
+    lookups never wait on I/O. Users missing from the hot snapshot get default attributes until a
+    background thread has read users/<user_id>.json into a bounded LRU (misses included).
+    """
+
+    def __init__(self, source, tables=REFERENCE_TABLES, refresh_seconds=REFRESH_SECONDS, lru_size=LRU_SIZE):
+        self.source = source
+        self.specs = tables
+        self.refresh_seconds = refresh_seconds
+        self.tables = {}
+        self.long_tail = LRUCache(lru_size)
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._loader = None
+        self._collisions = set()
+        self.refresh()
+
+    def refresh(self):
+        """Reload the snapshots whose version changed; returns the names of the reloaded tables."""
+        reloaded = []
+        for name, spec in self.specs.items():
+            try:
+                version = self.source.version(spec["file"])
+                current = self.tables.get(name)
+                if version is None or (current is not None and current.version == version):
+                    continue
+                frame = pd.read_csv(io.BytesIO(self.source.read(spec["file"])))
+                self.tables[name] = ReferenceTable(spec["key"], frame, version)
+                if name == LONG_TAIL_TABLE:
+                    # Long-tail entries may be stale or now part of the hot snapshot
+                    self.long_tail.clear()
+                reloaded.append(name)
+                logger.info(f"Loaded {len(self.tables[name])} rows of reference table {name}.")
+            except Exception as e:
+                logger.error(f"Failed to refresh reference table {name}; keeping the previous copy: {str(e)}")
+        return reloaded
+
+    def start(self):
+        """Start refreshing the snapshots and reading long-tail users in background threads."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="enrichment-refresh", daemon=True)
+            self._thread.start()
+            self._loader = threading.Thread(target=self._run_long_tail, name="enrichment-long-tail", daemon=True)
+            self._loader.start()
+        return self
+
+    def stop(self):
+        """Stop the background refresh and long-tail reads."""
+        self._stop.set()
+        self._wake.set()
+        for thread in (self._thread, self._loader):
+            if thread is not None:
+                thread.join()
+        self._thread = self._loader = None
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_seconds):
+            self.refresh()
+
+    def _run_long_tail(self):
+        while not self._stop.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            self.load_long_tail()
+
+    def load_long_tail(self):
+        """Read the queued long-tail users into the LRU; returns the number of users read."""
+        with self._pending_lock:
+            keys, self._pending = self._pending, set()
+        for key in keys:
+            row = None
+            try:
+                data = self.source.read(f"{LONG_TAIL_TABLE}/{key}.json")
+                if data is not None:
+                    row = json.loads(data)
+                    row.pop(self.specs[LONG_TAIL_TABLE]["key"], None)
+            except Exception as e:
+                logger.error(f"Failed to read long-tail record {key}: {str(e)}")
+            self.long_tail.put(key, row)
+        return len(keys)
+
+    def enrich(self, frame):
+        """Return a copy of a transactions DataFrame with the reference attributes added as columns."""
+        enriched = {}
+        for name, spec in self.specs.items():
+            table = self.tables.get(name)
+            if table is None or spec["key"] not in frame.columns:
+                continue
+            keys = frame[spec["key"]]
+            positions = table.positions(keys)
+            columns = table.gather(positions)
+            if name == LONG_TAIL_TABLE and (positions < 0).any():
+                self._fill_long_tail(table, keys.to_numpy(), positions, columns)
+            if name == "fx_rates":
+                if "amount" in frame.columns:
+                    amount = pd.to_numeric(frame["amount"], errors="coerce").to_numpy(dtype=np.float64)
+                    enriched["amount_usd"] = amount * columns["rate_to_usd"]
+            else:
+                enriched.update(columns)
+        return frame.assign(**self._without_collisions(enriched, frame.columns))
+
+    def enrich_record(self, record):
+        """Return a copy of one transaction dict with the reference attributes added."""
+        enriched = {}
+        for name, spec in self.specs.items():
+            table = self.tables.get(name)
+            if table is None or spec["key"] not in record:
+                continue
+            key = record[spec["key"]]
+            row = table.row(key)
+            if row is None and name == LONG_TAIL_TABLE:
+                row = self._long_tail_row(key)
+                row = table.coerce(row) if row is not None else None
+            row = row or table.defaults()
+            if name == "fx_rates":
+                if "amount" in record:
+                    enriched["amount_usd"] = _number(record["amount"]) * row["rate_to_usd"]
+            else:
+                enriched.update(row)
+        return {**record, **self._without_collisions(enriched, record)}
+
+    def _without_collisions(self, attributes, fields):
+        """Drop reference attributes named like a transaction field, which keeps its own value; warns once per name."""
+        collisions = [name for name in attributes if name in fields]
+        for name in collisions:
+            del attributes[name]
+            if name not in self._collisions:
+                self._collisions.add(name)
+                logger.warning(f"Reference attribute {name} has the name of a transaction field; keeping the transaction's value.")
+        return attributes
+
+    def _long_tail_row(self, key):
+        """Return a long-tail user's attributes from the LRU; a miss is queued for the loader and gets None."""
+        key = str(key)
+        cached = self.long_tail.get(key, default=False)
+        if cached is not False:
+            return cached
+        # Never read on the lookup path; the pending set is bounded like the LRU it fills
+        with self._pending_lock:
+            if len(self._pending) < self.long_tail.max_size:
+                self._pending.add(key)
+        self._wake.set()
+        return None
+
+    def _fill_long_tail(self, table, keys, positions, columns):
+        """Fill the gathered columns for keys missing from the hot snapshot, looking up each distinct key once."""
+        rows = {}
+        for i in np.flatnonzero(positions < 0):
+            key = str(keys[i])
+            if key not in rows:
+                row = self._long_tail_row(key)
+                rows[key] = table.coerce(row) if row is not None else None
+            if rows[key] is None:
+                continue
+            for name, values in columns.items():
+                values[i] = rows[key][name]
+
+def create_source():
+    """Build the snapshot source from the environment, or return None if enrichment is not configured."""
+    if REFERENCE_DATA_DIR:
+        return LocalSnapshotSource(REFERENCE_DATA_DIR)
+    if REFERENCE_DATA_CONTAINER:
+        from azure.storage.blob import BlobServiceClient
+        client = BlobServiceClient.from_connection_string(os.getenv("AZURE_BLOB_CONNECTION_STRING"))
+        return BlobSnapshotSource(client.get_container_client(REFERENCE_DATA_CONTAINER))
+    return None
+
+# Per-process cache, created on first use so its refresh thread runs in each gunicorn worker
+enricher = None
+enricher_pid = None
+enricher_lock = threading.Lock()
+
+def get_enricher():
+    """Return this process's EnrichmentCache, or None when no reference data is configured."""
+    global enricher, enricher_pid
+    if enricher_pid != os.getpid():
+        with enricher_lock:
+            if enricher_pid != os.getpid():
+                source = create_source()
+                enricher = EnrichmentCache(source).start() if source is not None else None
+                enricher_pid = os.getpid()
+    return enricher
+
+def enrich_frame(frame):
+    """Add reference attributes to a transactions DataFrame when enrichment is configured."""
+    cache = get_enricher()
+    return cache.enrich(frame) if cache is not None else frame
+
+def enrich_record(record):
+    """Add reference attributes to one transaction dict when enrichment is configured."""
+    cache = get_enricher()
+    return cache.enrich_record(record) if cache is not None else record
@@ -1,7 +1,8 @@
 import os
 import logging
 import pandas as pd
-from azure.storage.blob import BlobServiceClient
+from src.processing.enrichment import enrich_frame
+from src.ingestion.blob_discovery import IncrementalBlobSource, manifest_path
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -9,13 +10,21 @@ logger = logging.getLogger(__name__)
 
 # Azure Blob Storage configuration
 AZURE_BLOB_CONNECTION_STRING = os.getenv("AZURE_BLOB_CONNECTION_STRING")
-BLOB_SERVICE_CLIENT = BlobServiceClient.from_connection_string(AZURE_BLOB_CONNECTION_STRING)
+BLOB_SERVICE_CLIENT = None  # Created on first use by get_blob_service_client(); assign a client to inject one
 CONTAINER_NAME = "fraud-events"  # The container where event data files are stored
 
+def get_blob_service_client():
+    """Return the blob service client, creating it from the connection string on first use."""
+    global BLOB_SERVICE_CLIENT
+    if BLOB_SERVICE_CLIENT is None:
+        from azure.storage.blob import BlobServiceClient
+        BLOB_SERVICE_CLIENT = BlobServiceClient.from_connection_string(AZURE_BLOB_CONNECTION_STRING)
+    return BLOB_SERVICE_CLIENT
+
 def load_event_data(file_path):
     """Load event data from Azure Blob Storage."""
     try:
-        blob_client = BLOB_SERVICE_CLIENT.get_blob_client(container=CONTAINER_NAME, blob=file_path)
+        blob_client = get_blob_service_client().get_blob_client(container=CONTAINER_NAME, blob=file_path)
         downloaded_blob = blob_client.download_blob().readall()
         
         # Determine the format and load accordingly
@@ -47,6 +56,13 @@ def extract_features(data):
         # Create a binary feature for high transaction amount
         data['high_transaction'] = data['amount'].apply(lambda x: 1 if x > 1000 else 0)
         
+        # Add merchant/user/FX reference attributes so training sees the same columns as scoring;
+        # string attributes (e.g. merchant_category) are not encoded, so only numeric ones are kept
+        enriched = enrich_frame(data)
+        strings = [name for name in enriched.columns
+                   if name not in data.columns and not pd.api.types.is_numeric_dtype(enriched[name])]
+        data = enriched.drop(columns=strings)
+        
         logger.info("Features extracted successfully.")
         return data
     except Exception as e:
@@ -56,7 +72,7 @@ def extract_features(data):
 def save_transformed_data(data, output_file_path):
     """Save the transformed data to Azure Blob Storage."""
     try:
-        output_blob_client = BLOB_SERVICE_CLIENT.get_blob_client(container=CONTAINER_NAME, blob=output_file_path)
+        output_blob_client = get_blob_service_client().get_blob_client(container=CONTAINER_NAME, blob=output_file_path)
         
         # Save the DataFrame to CSV
         data.to_csv(output_file_path, index=False)
@@ -65,20 +81,20 @@ def save_transformed_data(data, output_file_path):
             output_blob_client.upload_blob(file, overwrite=True)
         
         logger.info(f"Transformed data saved successfully to {output_file_path}.")
+        return True
     except Exception as e:
         logger.error(f"Failed to save transformed data to {output_file_path}: {str(e)}")
+        return False
 
 def main():
     """Main function to execute the feature engineering process."""
     
-    # Specify the event data files to process
-    event_data_files = [
-        "events/transaction_event_1.json",
-        "events/transaction_event_2.csv",
-        # Add more event files as needed
-    ]
+    # Only process event blobs that are new or changed since the last run
+    source = IncrementalBlobSource(get_blob_service_client().get_container_client(CONTAINER_NAME), manifest_path("feature_engineering"))
     
-    for file_path in event_data_files:
+    for blob in source.discover():
+        file_path = blob.name
+        
         # Load event data
         event_data = load_event_data(file_path)
         
@@ -89,7 +105,10 @@ def main():
             if transformed_data is not None:
                 # Specify the output path for transformed data
                 output_file_path = f"data/transformed/{os.path.basename(file_path)}"
-                save_transformed_data(transformed_data, output_file_path)
+                if save_transformed_data(transformed_data, output_file_path):
+                    source.mark_processed(blob)
+    
+    source.advance_watermark()
 
 if __name__ == "__main__":
     main()
@@ -1,10 +1,9 @@
 import os
 import logging
 import pandas as pd
-from azure.storage.blob import BlobServiceClient
-from sklearn.ensemble import IsolationForest
 import pickle
-from azure.identity import DefaultAzureCredential
+from src.ingestion.blob_discovery import IncrementalBlobSource, manifest_path
+from src.processing.sql_sink import save_to_sql
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -12,14 +11,22 @@ logger = logging.getLogger(__name__)
 
 # Azure Blob Storage configuration
 AZURE_BLOB_CONNECTION_STRING = os.getenv("AZURE_BLOB_CONNECTION_STRING")
-BLOB_SERVICE_CLIENT = BlobServiceClient.from_connection_string(AZURE_BLOB_CONNECTION_STRING)
+BLOB_SERVICE_CLIENT = None  # Created on first use by get_blob_service_client(); assign a client to inject one
 CONTAINER_NAME = "fraud-events"  # The container where event data files are stored
 
+def get_blob_service_client():
+    """Return the blob service client, creating it from the connection string on first use."""
+    global BLOB_SERVICE_CLIENT
+    if BLOB_SERVICE_CLIENT is None:
+        from azure.storage.blob import BlobServiceClient
+        BLOB_SERVICE_CLIENT = BlobServiceClient.from_connection_string(AZURE_BLOB_CONNECTION_STRING)
+    return BLOB_SERVICE_CLIENT
+
 # Load the model from the Blob Storage
 def load_model(model_path):
     """Load the trained Isolation Forest model from Azure Blob Storage."""
     try:
-        blob_client = BLOB_SERVICE_CLIENT.get_blob_client(container=CONTAINER_NAME, blob=model_path)
+        blob_client = get_blob_service_client().get_blob_client(container=CONTAINER_NAME, blob=model_path)
         model_data = blob_client.download_blob().readall()
         
         # Load the model using pickle
@@ -46,7 +53,8 @@ def predict_fraud(model, data):
 def load_event_data(event_data_path):
     """Load event data from Azure Blob Storage."""
     try:
-        blob_client = BLOB_SERVICE_CLIENT.get_blob_client(container=CONTAINER_NAME, blob=event_data_path)
+        blob_client = get_blob_service_client().get_blob_client(container=CONTAINER_NAME, blob=event_data_path)
+        os.makedirs(os.path.dirname(event_data_path) or ".", exist_ok=True)
         with open(event_data_path, "wb") as download_file:
             download_file.write(blob_client.download_blob().readall())
 
@@ -61,19 +69,19 @@ def load_event_data(event_data_path):
 def main():
     """Main function to execute the fraud detection process."""
     
-    # Specify the model and event data file paths
+    # Specify the model path and the source of event data files
     model_path = "models/isolation_forest_model.pkl"  # Path to the saved model
-    event_data_files = [
-        "events/transaction_event_1.json",
-        "events/transaction_event_2.json",
-        # Add more event files as needed
-    ]
+    # Only JSON event blobs that are new or changed since the last run are scored
+    source = IncrementalBlobSource(get_blob_service_client().get_container_client(CONTAINER_NAME), manifest_path("fraud_detection"),
+                                   suffixes=(".json",))
     
     # Load the model
     model = load_model(model_path)
     
     if model is not None:
-        for file_path in event_data_files:
+        for blob in source.discover():
+            file_path = blob.name
+            
             # Load event data
             event_data = load_event_data(file_path)
             
@@ -88,15 +96,21 @@ def main():
                 
                 # Make predictions
                 results = predict_fraud(model, prediction_data)
+                if results is not None and 'transaction_id' in event_data.columns:
+                    # Key the results by transaction so re-runs upsert the same ProcessedTransactions rows
+                    results.insert(0, 'transaction_id', event_data['transaction_id'])
                 
-                # Save results to Blob Storage
+                # Save results to Blob Storage, and to the ProcessedTransactions table if SQL_CONNECTION_STRING is set
                 output_file_path = f"data/processed/events/fraud_detection_results_{os.path.basename(file_path)}"
-                save_results_to_blob(results, output_file_path)
+                if save_results_to_blob(results, output_file_path) and save_to_sql(results, "fraud results"):
+                    source.mark_processed(blob)
+        
+        source.advance_watermark()
 
 def save_results_to_blob(results, output_file_path):
     """Save fraud detection results to Azure Blob Storage."""
     try:
-        output_blob_client = BLOB_SERVICE_CLIENT.get_blob_client(container=CONTAINER_NAME, blob=output_file_path)
+        output_blob_client = get_blob_service_client().get_blob_client(container=CONTAINER_NAME, blob=output_file_path)
         
         # Save the DataFrame to CSV
         results.to_csv(output_file_path, index=False)
@@ -105,8 +119,10 @@ def save_results_to_blob(results, output_file_path):
             output_blob_client.upload_blob(data, overwrite=True)
         
         logger.info(f"Fraud detection results saved successfully to {output_file_path}.")
+        return True
     except Exception as e:
         logger.error(f"Failed to save results to {output_file_path}: {str(e)}")
+        return False
 
 if __name__ == "__main__":
     main()
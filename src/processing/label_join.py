@@ -0,0 +1,268 @@
+import os
+import glob
+import json
+import shutil
+import logging
+import numpy as np
+import pandas as pd
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Label join configuration
+TRANSACTIONS_GLOB = os.getenv("LABEL_JOIN_TRANSACTIONS", "data/transformed/*")  # Written as CSV by feature_engineering
+LABELS_GLOB = os.getenv("LABEL_JOIN_LABELS", "data/processed/fraud_labels/*.json")
+LABELED_DATA_DIR = os.getenv("LABELED_DATA_DIR", "data/labeled")
+NUM_PARTITIONS = int(os.getenv("LABEL_JOIN_PARTITIONS", "64"))  # Partition count of a new store
+# A partition growing past this many rows doubles the partition count, which bounds the memory of reading one
+PARTITION_ROWS = int(os.getenv("LABEL_JOIN_PARTITION_ROWS", "250000"))
+CHUNK_ROWS = int(os.getenv("LABEL_JOIN_CHUNK_ROWS", "100000"))
+STATE_FILE = "_state.json"
+LABEL_COLUMN = "is_fraud"
+KEY_COLUMN = "transaction_id"
+
+def partition_of(ids, num_partitions=NUM_PARTITIONS):
+    """Return the partition number of each transaction id.
+
+    Ids are hashed as strings so an id read as an int from JSON and as a str elsewhere land together.
+    """
+    hashes = pd.util.hash_pandas_object(pd.Series(ids).astype(str), index=False).to_numpy()
+    return (hashes % np.uint64(num_partitions)).astype(np.int64)
+
+class LabeledStore:
+    """Transactions hash-partitioned by transaction_id on local disk, with labels joined as they are read.
+
+    Transactions are appended to one CSV per partition and label batches to a per-partition label log,
+    so applying a batch costs the size of the batch, not of the partitions it touches. Reading a
+    partition joins the latest label of each id, including labels that arrived before their transaction.
+    When ingestion grows a partition past partition_rows, every partition is split in two; doubling the
+    count sends each id either to its old partition number or to that plus the old count, so a split
+    streams each partition once.
+    """
+
+    def __init__(self, root=LABELED_DATA_DIR, num_partitions=None, partition_rows=PARTITION_ROWS):
+        self.root = root
+        self.partition_rows = partition_rows
+        self.state = self._load_state()
+        # num_partitions only sizes a new store; an existing one keeps the count it has grown to
+        self.state.setdefault("num_partitions", num_partitions or NUM_PARTITIONS)
+        self.state.setdefault("rows", {})
+        self.state.setdefault("applied", {})
+        os.makedirs(os.path.join(self._directory(), "labels"), exist_ok=True)
+
+    @property
+    def num_partitions(self):
+        """The current partition count."""
+        return self.state["num_partitions"]
+
+    def _directory(self, num_partitions=None):
+        return os.path.join(self.root, f"partitions-{num_partitions or self.num_partitions:05d}")
+
+    def partition_path(self, partition, num_partitions=None):
+        """Return the file holding a partition's transactions."""
+        return os.path.join(self._directory(num_partitions), f"part-{partition:05d}.csv")
+
+    def labels_path(self, partition, num_partitions=None):
+        """Return the file holding the labels received for a partition's ids."""
+        return os.path.join(self._directory(num_partitions), "labels", f"part-{partition:05d}.csv")
+
+    def partitions(self):
+        """Return the numbers of the partitions that hold transactions."""
+        paths = glob.glob(os.path.join(self._directory(), "part-*.csv"))
+        return sorted(int(os.path.basename(path)[5:10]) for path in paths)
+
+    def is_applied(self, path):
+        """Return True if this version of an input file has already been ingested."""
+        stat = os.stat(path)
+        return self.state["applied"].get(path) == [stat.st_size, stat.st_mtime_ns]
+
+    def mark_applied(self, path):
+        """Record an ingested input file and persist the state."""
+        stat = os.stat(path)
+        self.state["applied"][path] = [stat.st_size, stat.st_mtime_ns]
+        self._save_state()
+
+    def add_transactions(self, file_path, chunk_rows=CHUNK_ROWS):
+        """Stream a transactions CSV into the partitions chunk by chunk and return the partitions appended to.
+
+        Splits the partitions afterwards until none of them holds more than partition_rows rows.
+        """
+        touched = set()
+        for chunk in pd.read_csv(file_path, chunksize=chunk_rows):
+            if LABEL_COLUMN not in chunk.columns:
+                chunk[LABEL_COLUMN] = np.nan
+            for partition, rows in chunk.groupby(partition_of(chunk[KEY_COLUMN], self.num_partitions)):
+                self._append(self.partition_path(int(partition)), rows)
+                self._count_rows(int(partition), len(rows))
+                touched.add(int(partition))
+        logger.info(f"Ingested {file_path} into {len(touched)} partitions.")
+        largest = max(self.state["rows"].values(), default=0)
+        while largest > self.partition_rows:
+            self.split(chunk_rows)
+            touched = set(self.partitions())
+            # Copies of one id always share a partition; stop once splitting no longer helps
+            largest, previous = max(self.state["rows"].values()), largest
+            if largest >= previous:
+                break
+        return touched
+
+    def apply_labels(self, labels):
+        """Append a batch of labels to the label logs of the partitions it touches; the last label for an id wins.
+
+        Returns the set of partitions that received labels.
+        """
+        labels = labels[[KEY_COLUMN, LABEL_COLUMN]].drop_duplicates(subset=KEY_COLUMN, keep="last")
+        touched = set()
+        for partition, rows in labels.groupby(partition_of(labels[KEY_COLUMN], self.num_partitions)):
+            self._append(self.labels_path(int(partition)), rows)
+            touched.add(int(partition))
+        return touched
+
+    def split(self, chunk_rows=CHUNK_ROWS):
+        """Double the partition count, streaming every partition and label log into its two halves."""
+        old_count, new_count = self.num_partitions, self.num_partitions * 2
+        new_directory = self._directory(new_count)
+        # A directory left by an interrupted split is rebuilt; the state still points at the old one
+        shutil.rmtree(new_directory, ignore_errors=True)
+        os.makedirs(os.path.join(new_directory, "labels"))
+        rows = {}
+        for partition in range(old_count):
+            for path_of in (self.partition_path, self.labels_path):
+                if not os.path.exists(path_of(partition, old_count)):
+                    continue
+                for chunk in pd.read_csv(path_of(partition, old_count), chunksize=chunk_rows):
+                    for half, part in chunk.groupby(partition_of(chunk[KEY_COLUMN], new_count)):
+                        self._append(path_of(int(half), new_count), part)
+                        if path_of == self.partition_path:
+                            rows[str(half)] = rows.get(str(half), 0) + len(part)
+        self.state["num_partitions"], self.state["rows"] = new_count, rows
+        self._save_state()
+        shutil.rmtree(self._directory(old_count))
+        logger.info(f"Split {old_count} partitions into {new_count}.")
+
+    def iter_labeled(self, columns=None, ids=None):
+        """Yield the labeled rows of each partition, one partition at a time; only rows of ids if given."""
+        partitions = self.partitions()
+        if ids is not None:
+            ids = pd.Index(pd.Series(ids).astype(str).unique())
+            wanted = set(partition_of(ids, self.num_partitions).tolist())
+            partitions = [partition for partition in partitions if partition in wanted]
+        for partition in partitions:
+            data = self._read_partition(partition, columns)
+            if ids is not None:
+                data = data[data[KEY_COLUMN].astype(str).isin(ids)]
+            data = data[data[LABEL_COLUMN].notna()]
+            if len(data):
+                data[LABEL_COLUMN] = data[LABEL_COLUMN].astype(int)
+                yield data
+
+    def _read_partition(self, partition, columns=None):
+        """Read a partition's transactions with the latest label of each id joined."""
+        usecols = None if columns is None else list(dict.fromkeys([KEY_COLUMN, *columns, LABEL_COLUMN]))
+        data = pd.read_csv(self.partition_path(partition), usecols=usecols)
+        data[LABEL_COLUMN] = data[LABEL_COLUMN].astype(float)
+        keys = data[KEY_COLUMN].astype(str)
+        if keys.duplicated().any():
+            # Ingesting the same transaction twice leaves duplicates; keep the latest copy along with
+            # the latest label any copy had
+            data[LABEL_COLUMN] = data.groupby(keys)[LABEL_COLUMN].transform("last")
+            latest = ~keys.duplicated(keep="last")
+            data, keys = data[latest], keys[latest]
+        labels_path = self.labels_path(partition)
+        if os.path.exists(labels_path):
+            labels = pd.read_csv(labels_path).drop_duplicates(subset=KEY_COLUMN, keep="last")
+            label_by_id = pd.Series(labels[LABEL_COLUMN].to_numpy(dtype=float), index=labels[KEY_COLUMN].astype(str))
+            joined = keys.map(label_by_id)
+            data[LABEL_COLUMN] = joined.where(joined.notna(), data[LABEL_COLUMN]).to_numpy()
+        return data
+
+    def _count_rows(self, partition, rows):
+        self.state["rows"][str(partition)] = self.state["rows"].get(str(partition), 0) + rows
+
+    @staticmethod
+    def _append(path, rows):
+        if os.path.exists(path):
+            # Keep the file's column order; extra columns in later inputs are dropped
+            rows = rows.reindex(columns=pd.read_csv(path, nrows=0).columns)
+            rows.to_csv(path, mode="a", header=False, index=False)
+        else:
+            rows.to_csv(path, index=False)
+
+    def _load_state(self):
+        try:
+            with open(os.path.join(self.root, STATE_FILE)) as state_file:
+                return json.load(state_file)
+        except FileNotFoundError:
+            return {}
+
+    def _save_state(self):
+        path = os.path.join(self.root, STATE_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as json_file:
+            json.dump(self.state, json_file, indent=4)
+        os.replace(tmp_path, path)
+
+def load_labels(file_path):
+    """Load a label batch: a JSON document with a 'labels' list of transaction_id / is_fraud."""
+    try:
+        with open(file_path) as labels_file:
+            labels = pd.DataFrame(json.load(labels_file)["labels"], columns=[KEY_COLUMN, LABEL_COLUMN])
+        logger.info(f"Loaded {len(labels)} labels from {file_path}.")
+        return labels
+    except Exception as e:
+        logger.error(f"Failed to load labels from {file_path}: {str(e)}")
+        return None
+
+def load_training_data(store_dir=LABELED_DATA_DIR, ids=None):
+    """Return the labeled transactions in the store (only those of ids, if given) as one DataFrame, or None.
+
+    Partitions are read one at a time and only their column arrays are kept, so besides the result at
+    most one partition is held as a DataFrame.
+    """
+    if not os.path.isdir(store_dir):
+        logger.error(f"Labeled data directory {store_dir} does not exist.")
+        return None
+    columns, rows = {}, 0
+    for frame in LabeledStore(store_dir).iter_labeled(ids=ids):
+        for name in frame.columns:
+            if name not in columns:
+                columns[name] = [np.full(rows, np.nan)] if rows else []
+        for name, chunks in columns.items():
+            chunks.append(frame[name].to_numpy() if name in frame.columns else np.full(len(frame), np.nan))
+        rows += len(frame)
+    if not rows:
+        logger.error(f"No labeled transactions in {store_dir}.")
+        return None
+    # Each column is concatenated as its chunks are released; copy=False keeps the arrays as they are
+    return pd.DataFrame({name: np.concatenate(columns.pop(name)) for name in list(columns)}, copy=False)
+
+def run_label_join(transaction_files, label_files, store_dir=LABELED_DATA_DIR, num_partitions=None,
+                   chunk_rows=CHUNK_ROWS, partition_rows=PARTITION_ROWS):
+    """Ingest new transaction files, then append new label batches; returns the partitions that got labels."""
+    store = LabeledStore(store_dir, num_partitions, partition_rows)
+    for file_path in transaction_files:
+        if not store.is_applied(file_path):
+            store.add_transactions(file_path, chunk_rows)
+            store.mark_applied(file_path)
+
+    # Labels that arrived before their transactions are joined when the partition is read
+    labeled = set()
+    for file_path in label_files:
+        if store.is_applied(file_path):
+            continue
+        labels = load_labels(file_path)
+        if labels is not None:
+            labeled |= store.apply_labels(labels)
+            store.mark_applied(file_path)
+    logger.info(f"Label join appended labels to {len(labeled)} of {store.num_partitions} partitions.")
+    return labeled
+
+def main():
+    """Main function to join late-arriving fraud labels onto the transformed transactions."""
+    transaction_files = sorted(glob.glob(TRANSACTIONS_GLOB))
+    label_files = sorted(glob.glob(LABELS_GLOB))
+    run_label_join(transaction_files, label_files)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+import math
+import logging
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from jsonschema import Draft7Validator
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Raw transaction events, as produced upstream and stored by EventHub_source
+TRANSACTION_SCHEMA = {
+    "type": "object",
+    "required": ["transaction_id", "timestamp", "amount", "currency"],
+    "properties": {
+        "transaction_id": {"type": ["integer", "string"]},
+        "timestamp": {"type": "string", "format": "date-time"},
+        "user_id": {"type": ["integer", "string"]},
+        "amount": {"type": "number", "minimum": 0, "maximum": 1000000},
+        "currency": {"type": "string", "enum": ["USD", "EUR", "GBP", "INR", "JPY", "CAD", "AUD", "CHF", "CNY", "SGD"]},
+        "merchant_id": {"type": ["integer", "string"]},
+        "is_fraud": {"type": "integer", "enum": [0, 1]},
+    },
+}
+
+# Feature rows scored by the API and the predict consumer; which features are used is up to the model
+PREDICTION_REQUEST_SCHEMA = {
+    "type": "object",
+    "required": ["amount"],
+    "properties": {
+        "transaction_id": {"type": ["integer", "string"]},
+        "amount": {"type": "number", "minimum": 0, "maximum": 1000000},
+        "transaction_hour": {"type": "integer", "minimum": 0, "maximum": 23},
+        "transaction_day": {"type": "integer", "minimum": 1, "maximum": 31},
+        "transaction_month": {"type": "integer", "minimum": 1, "maximum": 12},
+        "high_transaction": {"type": "integer", "enum": [0, 1]},
+    },
+}
+
+# Keywords the compiler understands; anything else in a property is rejected when compiling
+SUPPORTED_KEYWORDS = {"type", "minimum", "maximum", "exclusiveMinimum", "exclusiveMaximum", "enum", "format"}
+SUPPORTED_FORMATS = {"date-time"}
+
+class SchemaValidationError(ValueError):
+    """Raised for a record that does not match its schema; errors lists the failed 'field: check' pairs."""
+
+    def __init__(self, errors):
+        super().__init__(f"Invalid record: {', '.join(errors)}")
+        self.errors = errors
+
+def _is_type(value, type_name):
+    """Scalar JSON Schema type check; booleans are not numbers and 3.0 counts as an integer."""
+    if type_name == "string":
+        return isinstance(value, str)
+    if type_name == "boolean":
+        return isinstance(value, (bool, np.bool_))
+    if isinstance(value, (bool, np.bool_)) or not isinstance(value, (int, float, np.integer, np.floating)):
+        return False
+    if type_name == "integer":
+        return float(value).is_integer()
+    return math.isfinite(value)
+
+def _is_absent(value):
+    """Return True for a missing value: None or NaN."""
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+class _FieldRule:
+    """The compiled checks for one property, applied either to a scalar or to a whole column."""
+
+    def __init__(self, name, spec, required):
+        unsupported = set(spec) - SUPPORTED_KEYWORDS
+        if unsupported:
+            raise ValueError(f"Property '{name}' uses unsupported keywords: {', '.join(sorted(unsupported))}.")
+        if spec.get("format", "date-time") not in SUPPORTED_FORMATS:
+            raise ValueError(f"Property '{name}' uses unsupported format '{spec['format']}'.")
+        types = spec.get("type", [])
+        self.name = name
+        self.required = required
+        self.types = tuple([types] if isinstance(types, str) else types)
+        self.minimum = spec.get("minimum")
+        self.maximum = spec.get("maximum")
+        self.exclusive_minimum = spec.get("exclusiveMinimum")
+        self.exclusive_maximum = spec.get("exclusiveMaximum")
+        self.enum = spec.get("enum")
+        self.format = spec.get("format")
+        self.numeric = any(t in ("number", "integer") for t in self.types) or not self.types
+
+    def check_value(self, value):
+        """Return the names of the checks a single value fails."""
+        if _is_absent(value):
+            return ["required"] if self.required else []
+        if self.types and not any(_is_type(value, t) for t in self.types):
+            return ["type"]
+        failed = []
+        if isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, (bool, np.bool_)):
+            if self.minimum is not None and value < self.minimum:
+                failed.append("minimum")
+            if self.maximum is not None and value > self.maximum:
+                failed.append("maximum")
+            if self.exclusive_minimum is not None and value <= self.exclusive_minimum:
+                failed.append("exclusiveMinimum")
+            if self.exclusive_maximum is not None and value >= self.exclusive_maximum:
+                failed.append("exclusiveMaximum")
+        if self.enum is not None and value not in self.enum:
+            failed.append("enum")
+        if self.format == "date-time" and isinstance(value, str):
+            try:
+                datetime.fromisoformat(value)
+            except ValueError:
+                failed.append("format")
+        return failed
+
+    def check_column(self, column, n_rows):
+        """Return {check: boolean mask of failing rows} for a whole column, or all-absent if it is None."""
+        if column is None:
+            absent = np.ones(n_rows, dtype=bool)
+            return {"required": absent} if self.required else {}
+        absent = column.isna().to_numpy()
+        masks = {}
+        if self.required:
+            masks["required"] = absent
+        type_ok = self._type_mask(column, absent)
+        if self.types:
+            masks["type"] = ~absent & ~type_ok
+        checked = ~absent & type_ok
+
+        if self.numeric and any(limit is not None for limit in (self.minimum, self.maximum, self.exclusive_minimum,
+                                                                  self.exclusive_maximum)):
+            values = pd.to_numeric(column.where(checked), errors="coerce").to_numpy(dtype=float)
+            with np.errstate(invalid="ignore"):
+                for check, limit, fails in [
+                    ("minimum", self.minimum, np.less), ("maximum", self.maximum, np.greater),
+                    ("exclusiveMinimum", self.exclusive_minimum, np.less_equal),
+                    ("exclusiveMaximum", self.exclusive_maximum, np.greater_equal),
+                ]:
+                    if limit is not None:
+                        masks[check] = checked & fails(values, limit)
+        if self.enum is not None:
+            masks["enum"] = checked & ~column.isin(self.enum).to_numpy()
+        if self.format == "date-time":
+            parsed = pd.to_datetime(column.where(checked), errors="coerce", format="ISO8601", utc=True)
+            masks["format"] = checked & parsed.isna().to_numpy()
+        return masks
+
+    def _type_mask(self, column, absent):
+        """Vectorized type check, decided from the inferred dtype and falling back per element for mixed columns."""
+        if not self.types:
+            return np.ones(len(column), dtype=bool)
+        inferred = pd.api.types.infer_dtype(column, skipna=True)
+        if inferred == "empty":
+            return np.ones(len(column), dtype=bool)
+        if inferred == "string":
+            return np.full(len(column), "string" in self.types)
+        if inferred == "boolean":
+            return np.full(len(column), "boolean" in self.types)
+        if inferred == "integer":
+            return np.full(len(column), "integer" in self.types or "number" in self.types)
+        if inferred in ("floating", "mixed-integer-float", "decimal"):
+            values = pd.to_numeric(column, errors="coerce").to_numpy(dtype=float)
+            finite = np.isfinite(values) | absent
+            if "number" in self.types:
+                return finite
+            if "integer" in self.types:
+                with np.errstate(invalid="ignore"):
+                    return finite & ((np.mod(values, 1) == 0) | absent)
+            return np.zeros(len(column), dtype=bool)
+        check = np.frompyfunc(lambda value: _is_absent(value) or any(_is_type(value, t) for t in self.types), 1, 1)
+        return check(column.to_numpy(dtype=object)).astype(bool)
+
+class ValidationResult:
+    """Per-row outcome of a batch validation: a boolean error mask per 'field: check' and the valid rows."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        self.valid = ~errors.to_numpy().any(axis=1) if errors.shape[1] else np.ones(len(errors), dtype=bool)
+
+    @property
+    def invalid_count(self):
+        """Number of rows failing at least one check."""
+        return int((~self.valid).sum())
+
+    def row_errors(self, row):
+        """Return the 'field: check' names failed by the row at the given position."""
+        return [name for name, failed in zip(self.errors.columns, self.errors.iloc[row].to_numpy()) if failed]
+
+class SchemaValidator:
+    """A JSON Schema for flat records compiled once into vectorized column checks.
+
+    The schema is checked against the JSON Schema meta-schema, then each property's type, range,
+    enum and format keywords become numpy/pandas operations over the column, so a batch costs a
+    few array passes per field instead of one jsonschema.validate call per record. Nulls count as
+    missing. Single records go through the same rules as plain Python checks.
+    """
+
+    def __init__(self, schema):
+        Draft7Validator.check_schema(schema)
+        required = set(schema.get("required", []))
+        properties = schema.get("properties", {})
+        self.schema = schema
+        self.rules = [_FieldRule(name, spec, name in required) for name, spec in properties.items()]
+        self.rules += [_FieldRule(name, {}, True) for name in sorted(required - set(properties))]
+        self.allow_additional = schema.get("additionalProperties", True) is not False
+
+    def validate_record(self, record):
+        """Return the list of 'field: check' errors for one record; empty if it is valid."""
+        if not isinstance(record, dict):
+            return ["$: type"]
+        errors = [f"{rule.name}: {check}" for rule in self.rules for check in rule.check_value(record.get(rule.name))]
+        if not self.allow_additional:
+            known = {rule.name for rule in self.rules}
+            errors += [f"{name}: additionalProperties" for name in record if name not in known]
+        return errors
+
+    def check_record(self, record):
+        """Raise SchemaValidationError if the record is invalid."""
+        errors = self.validate_record(record)
+        if errors:
+            raise SchemaValidationError(errors)
+        return record
+
+    def validate_batch(self, data):
+        """Validate a DataFrame or a list of record dicts column-wise and return a ValidationResult."""
+        frame = data if isinstance(data, pd.DataFrame) else pd.DataFrame.from_records(data)
+        masks = {}
+        for rule in self.rules:
+            column = frame[rule.name] if rule.name in frame.columns else None
+            for check, mask in rule.check_column(column, len(frame)).items():
+                masks[f"{rule.name}: {check}"] = mask
+        if not self.allow_additional:
+            known = {rule.name for rule in self.rules}
+            for name in frame.columns:
+                if name not in known:
+                    masks[f"{name}: additionalProperties"] = frame[name].notna().to_numpy()
+        return ValidationResult(pd.DataFrame(masks, index=frame.index, columns=list(masks)))
+
+# Compiled once at import and shared by the services
+TRANSACTION_VALIDATOR = SchemaValidator(TRANSACTION_SCHEMA)
+PREDICTION_REQUEST_VALIDATOR = SchemaValidator(PREDICTION_REQUEST_SCHEMA)
@@ -0,0 +1,311 @@
+import os
+import time
+import queue
+import logging
+import threading
+from contextlib import closing, contextmanager
+import numpy as np
+import pandas as pd
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# SQL sink configuration; an ODBC connection string for Azure SQL, or sqlite:///<path> for the local stand-in.
+# Results are written to blob storage only when it is unset.
+SQL_CONNECTION_STRING = os.getenv("SQL_CONNECTION_STRING")
+SQL_TABLE = os.getenv("SQL_TABLE", "ProcessedTransactions")  # The table of the ProcessedTransactionData dataset
+SQL_BATCH_ROWS = int(os.getenv("SQL_BATCH_ROWS", "1000"))  # Rows upserted per statement (SQLite) or staged per MERGE
+SQL_POOL_SIZE = int(os.getenv("SQL_POOL_SIZE", "4"))  # Open connections per process, at most
+SQL_POOL_TIMEOUT_SECONDS = float(os.getenv("SQL_POOL_TIMEOUT_SECONDS", "30"))  # Wait for a free connection before failing
+SQLITE_PREFIX = "sqlite:///"
+
+# Columns of the ProcessedTransactions table and their kind; the upsert key is transaction_id.
+# Frames may carry any subset of them: an upsert only sets the columns it was given.
+KEY_COLUMN = "transaction_id"
+TABLE_COLUMNS = {
+    "transaction_id": "key",
+    "timestamp": "timestamp",
+    "transaction_date": "timestamp",
+    "user_id": "text",
+    "merchant_id": "text",
+    "amount": "float",
+    "currency": "text",
+    "is_fraud": "int",
+    "fraud_prediction": "int",
+    "fraud_score": "float",
+    "updated_at": "timestamp",
+}
+
+def _as_text(series):
+    """Return the values as strings, keeping missing values; ids that picked up a float dtype stay "12", not "12.0"."""
+    if pd.api.types.is_float_dtype(series) and (series.dropna() % 1 == 0).all():
+        series = series.astype("Int64")
+    return series.astype(str).astype(object).where(series.notna(), None)
+
+class ConnectionPool:
+    """Bounded pool of database connections, opened on first use and reused across batches.
+
+    At most size connections exist; a caller waits up to timeout seconds for one to be returned.
+    A connection whose transaction failed is rolled back before reuse, or dropped if that fails.
+    """
+
+    def __init__(self, connect, size=SQL_POOL_SIZE, timeout=SQL_POOL_TIMEOUT_SECONDS):
+        self._connect = connect
+        self.size = max(1, int(size))
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self.opened = 0
+
+    @contextmanager
+    def connection(self):
+        """Lend a connection for one unit of work; commits are up to the caller."""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No database connection became free within {self.timeout}s.")
+        conn = None
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+                self.opened += 1
+            yield conn
+        except Exception:
+            if conn is not None:
+                try:
+                    conn.rollback()
+                except Exception:
+                    self._discard(conn)
+                    conn = None
+            raise
+        finally:
+            if conn is not None:
+                self._idle.put(conn)
+            self._slots.release()
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """Close the idle connections."""
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+class SqliteDialect:
+    """Local stand-in for Azure SQL: multi-row INSERT ... ON CONFLICT DO UPDATE upserts in SQLite."""
+
+    TYPES = {"key": "TEXT NOT NULL PRIMARY KEY", "text": "TEXT", "float": "REAL", "int": "INTEGER", "timestamp": "TEXT"}
+
+    def __init__(self, path):
+        self.path = path
+
+    def initialize(self):
+        """Switch the database to WAL once, before any pooled connection exists."""
+        # WAL lets readers continue while a batch is written; the mode is kept in the database file
+        import sqlite3
+        try:
+            with closing(sqlite3.connect(self.path, timeout=SQL_POOL_TIMEOUT_SECONDS)) as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+        except Exception as e:
+            logger.warning(f"Could not switch {self.path} to WAL: {str(e)}")
+
+    def connect(self):
+        import sqlite3
+        conn = sqlite3.connect(self.path, timeout=SQL_POOL_TIMEOUT_SECONDS, check_same_thread=False)
+        # Writers on other pooled connections wait for the lock instead of failing with "database is locked"
+        conn.execute(f"PRAGMA busy_timeout = {int(SQL_POOL_TIMEOUT_SECONDS * 1000)}")
+        self.max_variables = conn.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER) if hasattr(conn, "getlimit") else 999
+        return conn
+
+    def quote(self, name):
+        return f'"{name}"'
+
+    def create_table_sql(self, table, columns):
+        definitions = ", ".join(f"{self.quote(name)} {self.TYPES[kind]}" for name, kind in columns.items())
+        return f"CREATE TABLE IF NOT EXISTS {self.quote(table)} ({definitions})"
+
+    def upsert_sql(self, table, columns, n_rows):
+        """INSERT of n_rows rows that updates the given columns of rows whose key already exists."""
+        names = ", ".join(self.quote(name) for name in columns)
+        row = "(" + ", ".join("?" * len(columns)) + ")"
+        updates = ", ".join(f"{self.quote(name)} = excluded.{self.quote(name)}" for name in columns if name != KEY_COLUMN)
+        return (f"INSERT INTO {self.quote(table)} ({names}) VALUES {', '.join([row] * n_rows)} "
+                f"ON CONFLICT({self.quote(KEY_COLUMN)}) DO UPDATE SET {updates}")
+
+    def upsert(self, conn, table, columns, rows):
+        """Upsert rows with as few multi-row statements as the bound-variable limit allows."""
+        per_statement = max(1, getattr(self, "max_variables", 999) // len(columns))
+        cursor = conn.cursor()
+        for start in range(0, len(rows), per_statement):
+            chunk = rows[start:start + per_statement]
+            cursor.execute(self.upsert_sql(table, columns, len(chunk)), [value for row in chunk for value in row])
+
+    def timestamp(self, series):
+        # ISO-8601 text, which SQLite's date functions read; numpy formats it far faster than strftime
+        text = np.datetime_as_string(series.dt.tz_localize(None).to_numpy(dtype="datetime64[us]"), unit="us")
+        return pd.Series(np.where(series.isna().to_numpy(), None, text), index=series.index, dtype=object)
+
+class AzureSqlDialect:
+    """Azure SQL through pyodbc: rows are bulk-bound into a temp table with fast_executemany, then MERGEd."""
+
+    TYPES = {"key": "NVARCHAR(64) NOT NULL PRIMARY KEY", "text": "NVARCHAR(256)", "float": "FLOAT", "int": "INT",
+             "timestamp": "DATETIME2"}
+    STAGING_TABLE = "#ProcessedTransactionsStaging"
+
+    def __init__(self, connection_string):
+        self.connection_string = connection_string
+
+    def initialize(self):
+        """Nothing to set up per database."""
+
+    def connect(self):
+        import pyodbc
+        return pyodbc.connect(self.connection_string, autocommit=False)
+
+    def quote(self, name):
+        return f"[{name}]"
+
+    def create_table_sql(self, table, columns):
+        definitions = ", ".join(f"{self.quote(name)} {self.TYPES[kind]}" for name, kind in columns.items())
+        return f"IF OBJECT_ID(N'{table}', N'U') IS NULL CREATE TABLE {self.quote(table)} ({definitions})"
+
+    def upsert_sql(self, table, columns, n_rows=None):
+        """MERGE of the staging table into the table, keyed on transaction_id."""
+        names = ", ".join(self.quote(name) for name in columns)
+        values = ", ".join(f"s.{self.quote(name)}" for name in columns)
+        updates = ", ".join(f"t.{self.quote(name)} = s.{self.quote(name)}" for name in columns if name != KEY_COLUMN)
+        return (f"MERGE {self.quote(table)} WITH (HOLDLOCK) AS t USING {self.STAGING_TABLE} AS s "
+                f"ON t.{self.quote(KEY_COLUMN)} = s.{self.quote(KEY_COLUMN)} "
+                f"WHEN MATCHED THEN UPDATE SET {updates} "
+                f"WHEN NOT MATCHED THEN INSERT ({names}) VALUES ({values});")
+
+    def upsert(self, conn, table, columns, rows):
+        """Stage the rows with one array-bound insert and MERGE them into the table with one statement."""
+        names = ", ".join(self.quote(name) for name in columns)
+        cursor = conn.cursor()
+        cursor.execute(f"DROP TABLE IF EXISTS {self.STAGING_TABLE}")
+        cursor.execute(f"SELECT TOP 0 {names} INTO {self.STAGING_TABLE} FROM {self.quote(table)}")
+        cursor.fast_executemany = True
+        cursor.executemany(f"INSERT INTO {self.STAGING_TABLE} ({names}) VALUES ({', '.join('?' * len(columns))})", rows)
+        cursor.execute(self.upsert_sql(table, columns))
+        cursor.execute(f"DROP TABLE {self.STAGING_TABLE}")
+
+    def timestamp(self, series):
+        return series.dt.tz_localize(None) if series.dt.tz is not None else series
+
+def create_dialect(connection_string):
+    """Return the SQLite stand-in for sqlite:///<path> connection strings, otherwise Azure SQL."""
+    if connection_string.startswith(SQLITE_PREFIX):
+        return SqliteDialect(connection_string[len(SQLITE_PREFIX):] or ":memory:")
+    return AzureSqlDialect(connection_string)
+
+class SqlSink:
+    """Writes scored results and cleaned transactions to the ProcessedTransactions table in batches.
+
+    Each batch of batch_rows rows is upserted on transaction_id in its own transaction, so writing
+    the same rows again (a retried blob, a re-run job) updates them instead of duplicating them.
+    """
+
+    def __init__(self, connection_string, table=SQL_TABLE, columns=None, batch_rows=SQL_BATCH_ROWS,
+                 pool_size=SQL_POOL_SIZE):
+        self.dialect = create_dialect(connection_string)
+        self.table = table
+        self.columns = dict(TABLE_COLUMNS if columns is None else columns)
+        self.batch_rows = max(1, int(batch_rows))
+        self.dialect.initialize()
+        self.pool = ConnectionPool(self.dialect.connect, pool_size)
+        self._table_ready = False
+        self._table_lock = threading.Lock()
+
+    def ensure_table(self):
+        """Create the table if it does not exist; concurrent writers wait for the first to do it."""
+        if self._table_ready:
+            return
+        with self._table_lock:
+            if self._table_ready:
+                return
+            with self.pool.connection() as conn:
+                conn.cursor().execute(self.dialect.create_table_sql(self.table, self.columns))
+                conn.commit()
+            self._table_ready = True
+
+    def prepare(self, frame):
+        """Return (columns, rows as tuples) for the frame's table columns, with one row per transaction_id.
+
+        Missing values become NULL, timestamps are converted for the database, and the last row of a
+        repeated transaction_id wins, as it would have had the rows been written one at a time.
+        """
+        if KEY_COLUMN not in frame.columns:
+            raise ValueError(f"Rows must have a {KEY_COLUMN} column to be upserted.")
+        frame = frame.assign(updated_at=pd.Timestamp.now(tz="UTC"))
+        columns = [name for name in self.columns if name in frame.columns]
+        frame = frame[columns]
+        missing_key = frame[KEY_COLUMN].isna()
+        if missing_key.any():
+            logger.warning(f"Skipping {int(missing_key.sum())} rows without a {KEY_COLUMN}.")
+            frame = frame[~missing_key]
+        frame = frame.drop_duplicates(KEY_COLUMN, keep="last")
+
+        values = {}
+        for name in columns:
+            kind, series = self.columns[name], frame[name]
+            if kind in ("key", "text"):
+                series = _as_text(series)
+            elif kind == "timestamp":
+                series = self.dialect.timestamp(pd.to_datetime(series, errors="coerce", utc=True, format="ISO8601"))
+            elif kind == "float":
+                series = pd.to_numeric(series, errors="coerce").astype("float64")
+            elif kind == "int":
+                series = pd.to_numeric(series, errors="coerce").round().astype("Int64")
+            # Object arrays of plain Python values and None, which every DB-API driver binds
+            array = np.array(series.astype(object), dtype=object)
+            array[series.isna().to_numpy()] = None
+            values[name] = array
+        return columns, list(zip(*(values[name] for name in columns)))
+
+    def write(self, frame):
+        """Upsert the frame's rows in batches of batch_rows and return the number of rows written."""
+        self.ensure_table()
+        columns, rows = self.prepare(frame)
+        for start in range(0, len(rows), self.batch_rows):
+            with self.pool.connection() as conn:
+                self.dialect.upsert(conn, self.table, columns, rows[start:start + self.batch_rows])
+                conn.commit()
+        return len(rows)
+
+    def close(self):
+        """Close the pooled connections."""
+        self.pool.close()
+
+SQL_SINK = None  # Created on first use by get_sql_sink(); assign a sink to inject one
+sql_sink_lock = threading.Lock()
+
+def get_sql_sink():
+    """Return the ProcessedTransactions sink, creating it on first use; None when SQL_CONNECTION_STRING is unset."""
+    global SQL_SINK
+    if SQL_SINK is None and SQL_CONNECTION_STRING:
+        with sql_sink_lock:
+            if SQL_SINK is None:
+                SQL_SINK = SqlSink(SQL_CONNECTION_STRING)
+    return SQL_SINK
+
+def save_to_sql(frame, description="rows"):
+    """Upsert a DataFrame into the ProcessedTransactions table; True if written or no database is configured."""
+    sink = get_sql_sink()
+    if sink is None:
+        return True
+    try:
+        started = time.perf_counter()
+        written = sink.write(frame)
+        logger.info(f"Upserted {written} {description} into {sink.table} in {time.perf_counter() - started:.2f}s.")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to write {description} to {sink.table}: {str(e)}")
+        return False
@@ -0,0 +1,64 @@
+import io
+import logging
+import pandas as pd
+from benchmarks.harness import summarize, time_function
+from benchmarks.synthetic_data import TRANSACTION_COLUMNS, generate_transactions, write_transactions
+from src.ingestion.local_storage import LocalBlobServiceClient
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def test_generate_transactions_schema_and_seed():
+    """Test that the synthetic generator matches the raw schema and is reproducible."""
+    data = generate_transactions(5000, seed=7)
+
+    assert list(data.columns) == TRANSACTION_COLUMNS, "Synthetic data does not match the raw transaction schema."
+    assert data['transaction_id'].is_unique, "Transaction ids are not unique."
+    assert data['timestamp'].is_monotonic_increasing, "Transactions are not in arrival order."
+    assert (data['amount'] > 0).all(), "Amounts must be positive."
+    pd.testing.assert_frame_equal(data, generate_transactions(5000, seed=7))
+
+    logging.info("Synthetic data generator tests passed successfully.")
+
+def test_generate_transactions_fraud_rate_and_skew():
+    """Test the fraud rate and the skew of users and amounts."""
+    data = generate_transactions(50000, seed=1, fraud_rate=0.01)
+
+    assert 0.005 < data['is_fraud'].mean() < 0.015, "Fraud rate is far from the requested rate."
+    assert data.groupby('is_fraud')['amount'].median().loc[1] > data.groupby('is_fraud')['amount'].median().loc[0], \
+        "Fraudulent transactions should skew towards larger amounts."
+    top_user_share = data['user_id'].value_counts(normalize=True).iloc[0]
+    assert top_user_share > 1.0 / data['user_id'].nunique() * 10, "User activity is not skewed."
+
+def test_local_blob_storage_round_trip(tmp_path):
+    """Test that synthetic files written to local storage read back through the blob client API."""
+    storage = LocalBlobServiceClient(str(tmp_path))
+    data = generate_transactions(100)
+    write_transactions(data, str(tmp_path / "fraud-events" / "events" / "sample.csv"))
+
+    blob_client = storage.get_blob_client(container="fraud-events", blob="events/sample.csv")
+    downloaded = pd.read_csv(io.BytesIO(blob_client.download_blob().readall()))
+    assert len(downloaded) == 100, "Round trip through local storage lost rows."
+
+    names = [blob.name for blob in storage.get_container_client("fraud-events").list_blobs(name_starts_with="events/")]
+    assert names == ["events/sample.csv"], "Listing local blobs by prefix failed."
+
+def test_time_function_and_summarize():
+    """Test the timing helpers used by the benchmark suite."""
+    calls = []
+    timings = time_function(lambda value: calls.append(value), repeats=3, warmup=1, setup=lambda: len(calls))
+
+    assert len(timings) == 3, "Warmup runs should not be recorded."
+    assert calls == [0, 1, 2, 3], "Setup should run before every call."
+    summary = summarize(timings, items_per_run=10)
+    assert summary['runs'] == 3 and summary['items_per_run'] == 10
+    assert summary['min_s'] <= summary['median_s'] <= summary['p99_s']
+
+def main():
+    """Main function to execute the benchmark suite tests."""
+    test_generate_transactions_schema_and_seed()
+    test_generate_transactions_fraud_rate_and_skew()
+    test_time_function_and_summarize()
+
+if __name__ == "__main__":
+    main()
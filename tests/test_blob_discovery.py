@@ -0,0 +1,83 @@
+import logging
+from datetime import datetime, timezone
+from src.ingestion.blob_discovery import IncrementalBlobSource, partition_path, partition_prefixes, partition_time
+from src.ingestion.local_storage import LocalBlobServiceClient
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+NOW = datetime(2024, 5, 1, 13, 30, tzinfo=timezone.utc)
+
+class CountingContainer:
+    """Wraps a container client and records the prefixes that were listed."""
+
+    def __init__(self, container):
+        self.container = container
+        self.listed = []
+
+    def list_blobs(self, name_starts_with=None):
+        self.listed.append(name_starts_with)
+        return self.container.list_blobs(name_starts_with=name_starts_with)
+
+def create_source(tmp_path):
+    """Create an incremental source over a local container with one legacy and two partitioned blobs."""
+    storage = LocalBlobServiceClient(str(tmp_path / "blobs"))
+    for name in ["events/transaction_event_1.json", "events/2024/05/01/12/t1.json", "events/2024/05/01/13/t2.json"]:
+        storage.get_blob_client(container="fraud-events", blob=name).upload_blob(b"[]")
+    container = CountingContainer(storage.get_container_client("fraud-events"))
+    return storage, container, str(tmp_path / "manifest.json")
+
+def process_all(source, now, fail=()):
+    """Mark every discovered blob as processed except the ones listed in fail."""
+    names = []
+    for blob in source.discover(now=now):
+        names.append(blob.name)
+        if blob.name not in fail:
+            source.mark_processed(blob)
+    source.advance_watermark()
+    return names
+
+def test_partition_helpers():
+    """Test that partition names round-trip and prefixes cover the window hour by hour."""
+    assert partition_path(NOW) == "events/2024/05/01/13/", "Partition path is incorrect."
+    assert partition_time("events/2024/05/01/13/t2.json") == NOW.replace(minute=0), "Partition time is incorrect."
+    assert partition_time("events/transaction_event_1.json") is None, "Legacy blobs should have no partition."
+    prefixes = partition_prefixes(datetime(2024, 5, 1, 11, 45, tzinfo=timezone.utc), NOW)
+    assert prefixes == ["events/2024/05/01/11/", "events/2024/05/01/12/", "events/2024/05/01/13/"]
+
+def test_only_new_or_changed_blobs_are_returned(tmp_path):
+    """Test that a second run sees nothing and a rewritten or new blob is picked up."""
+    storage, container, manifest = create_source(tmp_path)
+    first = process_all(IncrementalBlobSource(container, manifest), NOW)
+    assert len(first) == 3, "The first run should discover every blob."
+    assert process_all(IncrementalBlobSource(container, manifest), NOW) == [], "Unchanged blobs were rediscovered."
+
+    storage.get_blob_client(container="fraud-events", blob="events/2024/05/01/13/t2.json").upload_blob(b"[{}]", overwrite=True)
+    storage.get_blob_client(container="fraud-events", blob="events/2024/05/01/13/t3.json").upload_blob(b"[]")
+    later = process_all(IncrementalBlobSource(container, manifest), NOW)
+    assert later == ["events/2024/05/01/13/t2.json", "events/2024/05/01/13/t3.json"], "Changed or new blobs were missed."
+
+def test_listing_is_limited_to_recent_partitions(tmp_path):
+    """Test that after the first full listing only partitions near the watermark are listed."""
+    _, container, manifest = create_source(tmp_path)
+    process_all(IncrementalBlobSource(container, manifest, late_arrival_hours=1), NOW)
+    assert container.listed == ["events/"], "The first run should list the whole prefix once."
+
+    container.listed.clear()
+    process_all(IncrementalBlobSource(container, manifest, late_arrival_hours=1), NOW.replace(hour=14))
+    assert container.listed == ["events/2024/05/01/12/", "events/2024/05/01/13/", "events/2024/05/01/14/"]
+
+def test_failed_blobs_hold_back_the_watermark(tmp_path):
+    """Test that a blob that failed to process is retried even after the window has moved on."""
+    _, container, manifest = create_source(tmp_path)
+    process_all(IncrementalBlobSource(container, manifest, late_arrival_hours=0), NOW, fail={"events/2024/05/01/12/t1.json"})
+    retried = process_all(IncrementalBlobSource(container, manifest, late_arrival_hours=0), NOW.replace(hour=18))
+    assert retried == ["events/2024/05/01/12/t1.json"], "The failed blob was not retried."
+    assert process_all(IncrementalBlobSource(container, manifest, late_arrival_hours=0), NOW.replace(hour=18)) == []
+
+def main():
+    """Main function to execute the blob discovery tests that need no temporary directory."""
+    test_partition_helpers()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import json
+import logging
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from src.deployment import api_integration
+from src.deployment.batching import score_frame
+from src.modeling import cascade as cascade_module
+from src.modeling.cascade import AmountRule, CascadeModel, STAGE_EARLY_EXIT, STAGE_FULL, STAGE_RULE, calibrate_rule, create_rule, evaluate_cascade
+from src.modeling.shadow import shadow_report
+from src.monitoring.drift import DriftMonitor, build_baseline
+from src.monitoring.metrics import MetricsRegistry
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def create_sample_data(rows=4000, seed=0):
+    """Feature rows shaped like the training data, with fraud mostly on large amounts."""
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({
+        "amount": rng.exponential(300, rows).round(2),
+        "transaction_hour": rng.integers(0, 24, rows),
+    })
+    data["is_fraud"] = (((data["amount"] > 900) & (rng.random(rows) < 0.8)) | (rng.random(rows) < 0.01)).astype(int)
+    return data
+
+def train_forest(data, n_estimators=30):
+    """Train a small forest like train_model.train_model."""
+    return RandomForestClassifier(n_estimators=n_estimators, random_state=42).fit(data.drop(columns=['is_fraud']),
+                                                                                  data['is_fraud'])
+
+def test_early_exit_keeps_forest_labels():
+    """Test that stopping once the vote is decided gives exactly the forest's labels with fewer trees."""
+    data = create_sample_data()
+    forest = train_forest(data.head(3000))
+    holdout = data.tail(1000).drop(columns=['is_fraud'])
+    cascade = CascadeModel(forest, rule=AmountRule(max_amount=-1), tree_chunk=5, registry=None)
+
+    fraud, scores, stages, evaluated = cascade.score(holdout)
+    assert np.array_equal(cascade.predict(holdout), forest.predict(holdout))
+    assert (stages == STAGE_EARLY_EXIT).mean() > 0.5, "Most rows should stop before the last tree."
+    assert evaluated.mean() < forest.n_estimators
+    labels = forest.classes_[np.argmax(cascade.predict_proba(holdout), axis=1)]
+    assert np.array_equal(labels, forest.predict(holdout)), "Partial scores must agree with the labels."
+
+def test_early_exit_keeps_forest_labels_with_missing_features():
+    """Test that rows with missing features exit early with the labels the forest gives them."""
+    data = create_sample_data()
+    data.loc[np.random.default_rng(3).random(len(data)) < 0.3, "amount"] = np.nan
+    forest = train_forest(data.head(3000))
+    holdout = data.tail(1000).drop(columns=['is_fraud'])
+    cascade = CascadeModel(forest, tree_chunk=5, registry=None)
+
+    _, _, stages, _ = cascade.score(holdout)
+    assert (stages == STAGE_EARLY_EXIT).any()
+    assert np.array_equal(cascade.predict(holdout), forest.predict(holdout))
+
+def test_rule_uses_the_calibrated_cut_off(tmp_path, monkeypatch):
+    """Test that serving takes the clear amount from the cascade report and leaves the rule off without one."""
+    monkeypatch.setattr(cascade_module, "CASCADE_CLEAR_AMOUNT", None)
+    rows = pd.DataFrame({"amount": [10.0, 5000.0]})
+    assert create_rule(str(tmp_path / "missing.json")).max_amount is None
+    assert not create_rule(str(tmp_path / "missing.json")).clear(rows).any(), "An uncalibrated rule must clear nothing."
+
+    report_path = tmp_path / "cascade_report.json"
+    report_path.write_text(json.dumps({"clear_amount": 250.0, "max_merchant_risk": None}))
+    assert list(create_rule(str(report_path)).clear(rows)) == [True, False]
+    monkeypatch.setattr(cascade_module, "CASCADE_CLEAR_AMOUNT", "5")
+    assert create_rule(str(report_path)).max_amount == 5.0
+
+def test_rule_clears_small_amounts():
+    """Test that rows under the cut-off skip the forest and that the merchant check needs a known merchant."""
+    data = create_sample_data()
+    forest = train_forest(data.head(3000))
+    rows = pd.DataFrame({"amount": [10.0, 5000.0, 20.0], "transaction_hour": [3, 3, 3],
+                         "merchant_risk_score": [0.1, 0.1, np.nan]})
+    registry = MetricsRegistry()
+    cascade = CascadeModel(forest, rule=AmountRule(max_amount=1000), service="test", registry=registry)
+
+    fraud, scores, stages, _ = cascade.score(rows)
+    assert list(stages[[0, 2]]) == [STAGE_RULE, STAGE_RULE] and stages[1] != STAGE_RULE
+    assert scores[0] == 0.0 and not fraud[0]
+    assert registry.counter_value("fraud_cascade_rows_total", service="test", stage="rule") == 2
+
+    strict = AmountRule(max_amount=1000, max_merchant_risk=0.5)
+    assert list(strict.clear(rows)) == [True, False, False], "Unknown merchants are ambiguous."
+    assert not strict.clear(rows.drop(columns=["merchant_risk_score"])).any()
+
+def test_calibrated_rule_bounds_recall_loss():
+    """Test that the calibrated cut-off clears at most the allowed share of the forest's alerts."""
+    data = create_sample_data(rows=6000)
+    forest = train_forest(data.head(4000))
+    holdout = data.tail(2000)
+    features = holdout.drop(columns=['is_fraud'])
+    rule = calibrate_rule(forest, features, max_recall_loss=0.02)
+
+    flagged = forest.predict(features) == 1
+    assert (flagged & rule.clear(features)).sum() <= int(0.02 * flagged.sum())
+    report = evaluate_cascade(forest, CascadeModel(forest, rule=rule, registry=None), features, holdout['is_fraud'])
+    assert abs(sum(report["stage_hit_rates"].values()) - 1.0) < 1e-9
+    assert report["stage_hit_rates"]["rule"] > 0
+    assert report["cascade"]["recall"] >= report["model"]["recall"] - 0.02
+
+def test_cascade_decided_rows_stay_out_of_score_distributions():
+    """Test that rule-cleared and early-exit rows have no score for the drift sketch and shadow comparison."""
+    data = create_sample_data()
+    forest = train_forest(data.head(3000))
+    holdout = data.tail(1000).drop(columns=['is_fraud'])
+    cascade = CascadeModel(forest, rule=AmountRule(max_amount=200), tree_chunk=5, registry=None)
+
+    _, _, stages, _ = cascade.score(holdout)
+    labels, scores = score_frame(cascade, holdout)
+    full = stages == STAGE_FULL
+    assert (stages == STAGE_RULE).any() and np.array_equal(labels, cascade.predict(holdout))
+    assert np.isnan(scores[~full]).all() and np.allclose(scores[full], forest.predict_proba(holdout)[full, 1])
+
+    monitor = DriftMonitor(build_baseline(holdout, forest.predict_proba(holdout)[:, 1]))
+    monitor.update(holdout, scores, labels)
+    assert monitor.scores.total == full.sum() and monitor.scores.missing == 0
+    assert monitor.flagged == int((labels == 1).sum()) and monitor.rows == len(holdout)
+
+    both = np.column_stack([labels, labels]).astype(np.int8)
+    columns = {"models": np.array(["live", "same"]), "labels": both,
+               "scores": np.column_stack([scores, scores]).astype(np.float32),
+               "latency_ms": np.array([[1.0, 1.0]], dtype=np.float32), "batch_size": np.array([len(holdout)], dtype=np.int32)}
+    entry = shadow_report(columns)["candidates"]["same"]
+    assert entry["score_rows"] == full.sum() and entry["score_mean_abs_diff"] == 0.0 and entry["agreement"] == 1.0
+
+def test_api_scores_through_cascade(monkeypatch):
+    """Test that /predict works with a cascade model, with and without batching."""
+    data = create_sample_data()
+    cascade = CascadeModel(train_forest(data), registry=None)
+    monkeypatch.setattr(api_integration, "model", cascade)
+    client = api_integration.app.test_client()
+
+    for batching in (False, True):
+        monkeypatch.setattr(api_integration, "BATCHING_ENABLED", batching)
+        response = client.post('/predict', json={'amount': 12.5, 'transaction_hour': 4})
+        assert response.status_code == 200 and response.get_json()["is_fraud"] == 0
+        response = client.post('/predict', json={'amount': 4000.0, 'transaction_hour': 4})
+        assert response.status_code == 200 and response.get_json()["is_fraud"] in (0, 1)
+
+def main():
+    """Main function to execute the cascade tests."""
+    test_early_exit_keeps_forest_labels()
+    test_early_exit_keeps_forest_labels_with_missing_features()
+    test_rule_clears_small_amounts()
+    test_calibrated_rule_bounds_recall_loss()
+    test_cascade_decided_rows_stay_out_of_score_distributions()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import json
+import logging
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from src.modeling.compact_model import CompactForest, compact_forest, float32_floor, load_holdout, save_compact_model
+from src.modeling.train_model import save_holdout_ids
+from src.processing.label_join import load_training_data, run_label_join
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def create_sample_data(rows=4000, seed=0):
+    """Feature rows shaped like the training data, with fraud mostly on large amounts."""
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({
+        "amount": rng.exponential(300, rows).round(2),
+        "transaction_hour": rng.integers(0, 24, rows),
+        "transaction_day": rng.integers(1, 32, rows),
+        "transaction_month": rng.integers(1, 13, rows),
+    })
+    data["high_transaction"] = (data["amount"] > 1000).astype(int)
+    data["is_fraud"] = (((data["amount"] > 900) & (rng.random(rows) < 0.8)) | (rng.random(rows) < 0.01)).astype(int)
+    return data
+
+def train_forest(data, n_estimators=20):
+    """Train a small unlimited-depth forest like train_model.train_model."""
+    return RandomForestClassifier(n_estimators=n_estimators, random_state=42).fit(data.drop(columns=['is_fraud']),
+                                                                                  data['is_fraud'])
+
+def test_full_compact_forest_matches_sklearn():
+    """Test that flattening every tree at full depth with float32 thresholds keeps the predictions."""
+    data = create_sample_data()
+    forest = train_forest(data.head(3000))
+    holdout = data.tail(1000).drop(columns=['is_fraud'])
+    compact = CompactForest(forest)
+
+    assert compact.threshold.dtype == np.float32
+    assert np.allclose(compact.predict_proba(holdout), forest.predict_proba(holdout), atol=1e-6)
+    assert np.array_equal(compact.predict(holdout[holdout.columns[::-1]]), forest.predict(holdout)), \
+        "Columns should be matched by name."
+
+def test_compact_forest_routes_missing_values_like_sklearn():
+    """Test that rows with missing features take the side each split learned for them at fit time."""
+    data = create_sample_data()
+    rng = np.random.default_rng(2)
+    data.loc[rng.random(len(data)) < 0.3, "amount"] = np.nan
+    forest = train_forest(data.head(3000))
+    holdout = data.tail(1000).drop(columns=['is_fraud'])
+    compact = CompactForest(forest)
+
+    assert compact.missing_left.any(), "Some splits should send missing amounts left."
+    assert np.allclose(compact.predict_proba(holdout), forest.predict_proba(holdout), atol=1e-6)
+    assert np.array_equal(compact.predict(holdout), forest.predict(holdout))
+
+def test_float32_thresholds_keep_splits():
+    """Test that rounding thresholds down to float32 keeps every float32 comparison."""
+    rng = np.random.default_rng(1)
+    thresholds = rng.normal(size=2000) * 1000
+    values = np.concatenate([thresholds.astype(np.float32), rng.normal(size=2000).astype(np.float32) * 1000])
+    rounded = float32_floor(thresholds)
+    for value in values[:200]:
+        assert np.array_equal(value <= thresholds, value <= rounded)
+
+def test_depth_cap_predicts_ancestor_distribution():
+    """Test that a capped tree predicts the class distribution of the node at the cap on each row's path."""
+    data = create_sample_data()
+    forest = train_forest(data.head(3000), n_estimators=1)
+    rows = data.tail(200).drop(columns=['is_fraud'])
+    capped = CompactForest(forest, max_depth=2)
+    tree = forest.estimators_[0]
+
+    assert capped.n_nodes <= 7
+    paths = tree.decision_path(rows.to_numpy(dtype=np.float32))
+    for i in range(len(rows)):
+        path = paths.indices[paths.indptr[i]:paths.indptr[i + 1]]
+        node = np.sort(path)[min(2, len(path) - 1)]
+        expected = tree.tree_.value[node, 0] / tree.tree_.value[node, 0].sum()
+        assert np.allclose(capped.predict_proba(rows.iloc[[i]])[0], expected, atol=1e-6)
+
+def test_compaction_chooses_smaller_model_within_tolerance():
+    """Test that the search reports every candidate and picks a smaller one within tolerance."""
+    data = create_sample_data(rows=6000)
+    forest = train_forest(data.head(4000))
+    holdout = data.tail(2000)
+    model, report = compact_forest(forest, holdout.drop(columns=['is_fraud']), holdout['is_fraud'],
+                                   depths=[None, 6], recall_tolerance=0.05, precision_tolerance=0.05)
+
+    names = [candidate["name"] for candidate in report["candidates"]]
+    assert names[0] == "original" and len(names) == 3
+    chosen = next(c for c in report["candidates"] if c["name"] == report["chosen"])
+    assert chosen["within_tolerance"]
+    assert chosen["size_bytes"] < report["candidates"][0]["size_bytes"]
+    original = report["candidates"][0]
+    assert chosen["recall"] >= original["recall"] - 0.05 and chosen["precision"] >= original["precision"] - 0.05
+    assert isinstance(model, CompactForest) and model.n_trees == chosen["n_trees"]
+
+def test_save_compact_model(tmp_path, monkeypatch):
+    """Test that the compact model and its report are written locally and load back."""
+    monkeypatch.delenv("AZURE_BLOB_CONNECTION_STRING", raising=False)
+    data = create_sample_data(rows=1000)
+    compact = CompactForest(train_forest(data, n_estimators=3), max_depth=4)
+    model_path, report_path = str(tmp_path / "compact.pkl"), str(tmp_path / "report.json")
+
+    assert save_compact_model(compact, {"chosen": "depth=4,trees=3"}, model_path, report_path)
+    features = data.drop(columns=['is_fraud'])
+    assert np.array_equal(joblib.load(model_path).predict(features), compact.predict(features))
+    with open(report_path) as report_file:
+        assert json.load(report_file)["chosen"] == "depth=4,trees=3"
+
+def test_holdout_is_the_one_saved_at_training(tmp_path, monkeypatch):
+    """Test that load_holdout returns the rows held out at training time, even after the store has grown."""
+    monkeypatch.chdir(tmp_path)
+    for name, ids in (("tx_1.csv", range(1, 501)), ("tx_2.csv", range(501, 1001))):
+        data = create_sample_data(rows=500).assign(transaction_id=list(ids), currency="USD")
+        data.drop(columns=["is_fraud"]).assign(is_fraud=data["is_fraud"]).to_csv(name, index=False)
+    run_label_join(["tx_1.csv"], [], num_partitions=4)
+    trained = load_training_data()
+    assert save_holdout_ids(trained.pop("transaction_id"), "model.pkl")
+
+    run_label_join(["tx_1.csv", "tx_2.csv"], [])
+    X_holdout, y_holdout = load_holdout("model.pkl")
+    saved = set(pd.read_csv("model_holdout.csv")["transaction_id"])
+    assert len(X_holdout) == len(y_holdout) == len(saved) == 100
+    assert not {"transaction_id", "currency"} & set(X_holdout.columns)
+    assert set(load_training_data(ids=sorted(saved))["transaction_id"]) == saved <= set(range(1, 501))
+
+def main():
+    """Main function to execute the compaction tests that need no temporary directory."""
+    test_full_compact_forest_matches_sklearn()
+    test_compact_forest_routes_missing_values_like_sklearn()
+    test_float32_thresholds_keep_splits()
+    test_depth_cap_predicts_ancestor_distribution()
+    test_compaction_chooses_smaller_model_within_tolerance()
+
+if __name__ == "__main__":
+    main()
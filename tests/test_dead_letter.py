@@ -0,0 +1,229 @@
+import os
+import json
+import time
+import logging
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from src.ingestion.dead_letter import CheckpointTracker, DeadLetterQueue, LocalDeadLetterSink, RetryQueue
+from src.monitoring.metrics import MetricsRegistry
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+class FakeEvent:
+    """Minimal stand-in for an azure.eventhub EventData."""
+
+    def __init__(self, body, sequence_number=1):
+        self.body = [body]
+        self.sequence_number = sequence_number
+        self.offset = str(sequence_number * 100)
+        self.enqueued_time = datetime(2024, 10, 10, 8, 30, tzinfo=timezone.utc)
+
+    def body_as_str(self, encoding="UTF-8"):
+        return b"".join(self.body).decode(encoding)
+
+class FakePartitionContext:
+    """Minimal stand-in for an azure.eventhub PartitionContext that records checkpoints."""
+
+    def __init__(self, partition_id="0"):
+        self.partition_id = partition_id
+        self.eventhub_name = "fraud-events"
+        self.last_enqueued_event_properties = None
+        self.checkpoints = []
+
+    def update_checkpoint(self, event):
+        self.checkpoints.append(event.sequence_number)
+
+class MemorySink:
+    """Collects dead-letter records in a list; with accept=False every write fails."""
+
+    def __init__(self, accept=True):
+        self.records = []
+        self.accept = accept
+
+    def write(self, record):
+        self.records.append(record)
+        return self.accept
+
+def wait_for(condition, timeout=5.0):
+    """Poll until condition() is true or the timeout expires."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+def test_local_sink_appends_records(tmp_path):
+    """Test that dead letters are appended as JSON lines with their origin and raw body."""
+    dead_letters = DeadLetterQueue("ingest", sink=LocalDeadLetterSink(str(tmp_path)))
+    assert dead_letters.send("decode", "bad json", FakePartitionContext("3"), FakeEvent(b"{not json", 7))
+    assert dead_letters.send("validate", "amount: type", FakePartitionContext("3"), FakeEvent(b"\xff\xfe", 8))
+
+    files = os.listdir(tmp_path / "ingest")
+    assert len(files) == 1 and files[0].endswith(".jsonl")
+    with open(tmp_path / "ingest" / files[0]) as dead_letter_file:
+        records = [json.loads(line) for line in dead_letter_file]
+    assert [r["sequence_number"] for r in records] == [7, 8]
+    assert records[0]["partition_id"] == "3" and records[0]["body"] == "{not json"
+    assert records[1]["body_encoding"] == "base64", "Non-UTF-8 bodies should be kept as base64."
+
+def test_retry_succeeds_after_transient_failures():
+    """Test that a failed operation is retried in the background until it succeeds."""
+    sink = MemorySink()
+    retries = RetryQueue(DeadLetterQueue("ingest", sink=sink), max_attempts=5, base_delay=0.01, max_delay=0.05)
+    outcomes = [False, False, True]
+    retries.submit(lambda: outcomes.pop(0), FakePartitionContext(), FakeEvent(b"{}"))
+    assert wait_for(lambda: not outcomes), "The operation was not retried."
+    assert wait_for(lambda: retries.pending() == 0)
+    retries.close()
+    assert sink.records == []
+
+def test_retry_exhaustion_dead_letters():
+    """Test that an operation still failing after max_attempts is dead-lettered with its reason."""
+    sink = MemorySink()
+    retries = RetryQueue(DeadLetterQueue("ingest", sink=sink), max_attempts=3, base_delay=0.01, max_delay=0.01)
+
+    def fail():
+        raise IOError("blob unavailable")
+
+    retries.submit(fail, FakePartitionContext(), FakeEvent(b"{}", 5), reason="blob_io")
+    assert wait_for(lambda: len(sink.records) == 1), "Exhausted retry was not dead-lettered."
+    retries.close()
+    assert sink.records[0]["reason"] == "blob_io" and sink.records[0]["attempts"] == 3
+    assert sink.records[0]["error"] == "blob unavailable"
+
+def test_full_queue_and_close_dead_letter_pending():
+    """Test that overflow is dead-lettered at once and close() dead-letters what is still waiting."""
+    sink = MemorySink()
+    retries = RetryQueue(DeadLetterQueue("ingest", sink=sink), max_size=1, base_delay=60, max_delay=60)
+    retries.submit(lambda: False, FakePartitionContext(), FakeEvent(b"{}", 1))
+    retries.submit(lambda: False, FakePartitionContext(), FakeEvent(b"{}", 2))
+    assert [r["reason"] for r in sink.records] == ["retry_queue_full"]
+    retries.close(timeout=5)
+    assert [r["reason"] for r in sink.records] == ["retry_queue_full", "shutdown"]
+    assert retries.pending() == 0
+
+def test_predict_checkpoints_past_poison_events(monkeypatch):
+    """Test that the predict consumer dead-letters undecodable and invalid events and still checkpoints."""
+    monkeypatch.setenv("AZURE_BLOB_CONNECTION_STRING", "UseDevelopmentStorage=true")
+    from src.modeling import predict
+
+    sink = MemorySink()
+    monkeypatch.setattr(predict, "DEAD_LETTERS", DeadLetterQueue(predict.SERVICE_NAME, sink=sink))
+    monkeypatch.setattr(predict, "RETRIES", RetryQueue(predict.DEAD_LETTERS))
+    monkeypatch.setattr(predict, "CHECKPOINTS", CheckpointTracker(predict.SERVICE_NAME))
+    partition_context = FakePartitionContext()
+    predict.on_event(partition_context, FakeEvent(b"{not json", 1))
+    predict.on_event(partition_context, FakeEvent(json.dumps({"amount": -1}).encode(), 2))
+
+    assert partition_context.checkpoints == [1, 2], "The partition did not advance past poison events."
+    assert [r["reason"] for r in sink.records] == ["decode", "validate"]
+
+def test_failed_dead_letter_stalls_the_partition_until_retried(monkeypatch):
+    """Test that an event the sink rejected holds only its partition's checkpoint, until its retried write is accepted."""
+    monkeypatch.setenv("AZURE_BLOB_CONNECTION_STRING", "UseDevelopmentStorage=true")
+    from src.modeling import predict
+
+    sink = MemorySink(accept=False)
+    registry = MetricsRegistry()
+    checkpoints = CheckpointTracker(predict.SERVICE_NAME, registry=registry)
+    dead_letters = DeadLetterQueue(predict.SERVICE_NAME, sink=sink)
+    retries = RetryQueue(dead_letters, base_delay=0.2, max_delay=0.2)
+    monkeypatch.setattr(predict, "DEAD_LETTERS", dead_letters)
+    monkeypatch.setattr(predict, "RETRIES", retries)
+    monkeypatch.setattr(predict, "CHECKPOINTS", checkpoints)
+    stalled, healthy = FakePartitionContext("0"), FakePartitionContext("1")
+    try:
+        predict.on_event(stalled, FakeEvent(b"{not json", 1))
+        sink.accept = True
+        predict.on_event(stalled, FakeEvent(b"{not json", 2))
+        predict.on_event(healthy, FakeEvent(b"{not json", 1))
+
+        assert stalled.checkpoints == [], "The checkpoint advanced past an event that was lost."
+        assert checkpoints.stalled("0") and not checkpoints.stalled("1")
+        assert registry.gauge_value("fraud_partition_stalled", service=predict.SERVICE_NAME, partition="0") == 1
+        assert healthy.checkpoints == [1]
+        # The retried dead-letter write is accepted: the partition resumes past both events
+        assert wait_for(lambda: stalled.checkpoints == [2]), "The partition did not resume."
+    finally:
+        retries.close()
+    assert not checkpoints.stalled("0")
+    assert registry.gauge_value("fraud_partition_stalled", service=predict.SERVICE_NAME, partition="0") == 0
+    assert "# TYPE fraud_partition_stalled gauge" in registry.render_prometheus()
+
+def test_predict_retries_events_while_the_model_is_unavailable(monkeypatch):
+    """Test that the predict consumer retries, rather than dead-letters, events it scores during a model outage."""
+    monkeypatch.setenv("AZURE_BLOB_CONNECTION_STRING", "UseDevelopmentStorage=true")
+    from src.modeling import predict
+
+    data = pd.DataFrame({"amount": np.linspace(1, 1000, 50), "transaction_hour": np.arange(50) % 24})
+    model = RandomForestClassifier(n_estimators=3, random_state=0).fit(data, data["amount"] > 900)
+    sink = MemorySink()
+    dead_letters = DeadLetterQueue(predict.SERVICE_NAME, sink=sink)
+    retries = RetryQueue(dead_letters, base_delay=0.05, max_delay=0.05)
+    monkeypatch.setattr(predict, "DEAD_LETTERS", dead_letters)
+    monkeypatch.setattr(predict, "RETRIES", retries)
+    monkeypatch.setattr(predict, "CHECKPOINTS", CheckpointTracker(predict.SERVICE_NAME))
+    monkeypatch.setattr(predict, "model", None)
+    outage = {"loads": 0}
+
+    def load_model():
+        # The model store is unavailable for the first three loads
+        outage["loads"] += 1
+        return model if outage["loads"] > 3 else None
+
+    monkeypatch.setattr(predict, "load_model", load_model)
+    partition_context = FakePartitionContext()
+    try:
+        predict.on_event(partition_context, FakeEvent(json.dumps({"transaction_id": "tx1", "amount": 950.0,
+                                                                   "transaction_hour": 3}).encode(), 1))
+        assert partition_context.checkpoints == [], "The checkpoint passed an event that was not scored."
+        assert wait_for(lambda: partition_context.checkpoints == [1]), "The retried event was not scored."
+    finally:
+        retries.close()
+    assert sink.records == [], "An event scored after a model outage was dead-lettered."
+
+def test_checkpoint_waits_for_pending_retry(monkeypatch):
+    """Test that EventHub_source checkpoints past a failed blob write only once its retry has stored it."""
+    from src.ingestion import EventHub_source
+
+    sink = MemorySink()
+    dead_letters = DeadLetterQueue(EventHub_source.SERVICE_NAME, sink=sink)
+    retries = RetryQueue(dead_letters, base_delay=0.2, max_delay=0.2)
+    monkeypatch.setattr(EventHub_source, "DEAD_LETTERS", dead_letters)
+    monkeypatch.setattr(EventHub_source, "RETRIES", retries)
+    monkeypatch.setattr(EventHub_source, "CHECKPOINTS", CheckpointTracker(EventHub_source.SERVICE_NAME))
+    failures = {"1"}
+
+    def save_event_to_blob(event_data, enqueued_time=None):
+        # The first write of transaction 1 fails, every other write succeeds
+        if event_data["transaction_id"] in failures:
+            failures.discard(event_data["transaction_id"])
+            return False
+        return True
+
+    monkeypatch.setattr(EventHub_source, "save_event_to_blob", save_event_to_blob)
+
+    partition_context = FakePartitionContext()
+    try:
+        for sequence_number in (1, 2, 3):
+            body = json.dumps({"transaction_id": str(sequence_number), "timestamp": "2024-10-10T08:30:00",
+                               "amount": 10.0, "currency": "USD"}).encode()
+            EventHub_source.on_event(partition_context, FakeEvent(body, sequence_number))
+        assert partition_context.checkpoints == [], "The checkpoint passed an event whose retry is pending."
+        assert wait_for(lambda: partition_context.checkpoints == [3]), "The resolved retry did not release the checkpoint."
+    finally:
+        retries.close()
+    assert sink.records == []
+
+def main():
+    """Main function to execute the dead-letter tests that need no temporary directory."""
+    test_retry_succeeds_after_transient_failures()
+    test_retry_exhaustion_dead_letters()
+    test_full_queue_and_close_dead_letter_pending()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import json
+import logging
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from src.deployment.batching import score_records
+from src.ingestion.local_storage import LocalBlobServiceClient
+from src.monitoring import drift
+from src.monitoring.drift import CountMinSketch, DriftMonitor, QuantileSketch, build_baseline, merge_snapshots
+from src.monitoring.metrics import METRICS
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def create_scored_data(rows=20000, seed=0, amount_scale=1.0, currency_weights=(0.7, 0.2, 0.1)):
+    """Scored feature rows with the categorical columns the monitor sketches."""
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({
+        "amount": (rng.lognormal(4, 1, rows) * amount_scale).round(2),
+        "transaction_hour": rng.integers(0, 24, rows),
+        "high_transaction": rng.integers(0, 2, rows),
+        "merchant_id": rng.choice([f"merchant_{i:03d}" for i in range(60)], rows),
+        "currency": rng.choice(["USD", "EUR", "GBP"], rows, p=list(currency_weights)),
+    })
+    return data, rng.beta(1, 20, rows)
+
+def test_quantile_sketch_merges_and_estimates_quantiles():
+    """Test that merged sketches equal one sketch over all values and quantiles stay within a bin."""
+    values = np.random.default_rng(1).lognormal(4, 1, 10000)
+    reference = QuantileSketch.from_values(values, n_bins=50)
+    first, second = QuantileSketch(reference.edges), QuantileSketch(reference.edges)
+    first.update(values[:6000])
+    for value in values[6000:6100]:
+        second.add(value)
+    second.update(np.append(values[6100:], np.nan))
+    first.merge(second)
+
+    assert np.array_equal(first.counts, reference.counts) and first.missing == 1
+    for q in (0.1, 0.5, 0.9):
+        assert abs(np.mean(values <= first.quantile(q)) - q) <= 0.02
+
+def test_count_min_never_undercounts():
+    """Test that single adds and batch updates hit the same counters and estimates are upper bounds."""
+    keys = np.random.default_rng(2).choice([f"merchant_{i}" for i in range(500)], 20000)
+    batch, single = CountMinSketch(width=512), CountMinSketch(width=512)
+    batch.update(keys)
+    for key in keys[:100]:
+        single.add(key)
+    single.update(keys[100:])
+
+    assert np.array_equal(batch.table, single.table)
+    true_counts = pd.Series(keys).value_counts()
+    estimates = batch.estimate(list(true_counts.index))
+    assert (estimates >= true_counts.to_numpy()).all()
+    # Count-min bounds the overcount by e * total / width with high probability
+    assert np.mean(estimates - true_counts.to_numpy()) < len(keys) / 512
+
+def test_psi_flags_shifted_features_only():
+    """Test that a shifted amount and currency mix are reported as drift and the rest are not."""
+    train, train_scores = create_scored_data()
+    baseline = build_baseline(train, train_scores, (train_scores > 0.2).astype(int))
+
+    same, same_scores = create_scored_data(5000, seed=3)
+    monitor = DriftMonitor(baseline)
+    monitor.update(same, same_scores)
+    report = monitor.report()
+    assert report["drifted"] == []
+    assert report["features"]["amount"]["psi"] < 0.05 and report["categorical"]["merchant_id"]["psi"] < 0.05
+
+    shifted, shifted_scores = create_scored_data(5000, seed=4, amount_scale=3.0, currency_weights=(0.2, 0.2, 0.6))
+    monitor = DriftMonitor(baseline)
+    monitor.update(shifted, shifted_scores)
+    report = monitor.report()
+    assert set(report["drifted"]) == {"amount", "currency"}
+    assert report["features"]["amount"]["ks"] > 0.3
+
+def test_worker_snapshots_merge(tmp_path):
+    """Test that snapshots of several workers merge into the sketches of all their rows."""
+    train, train_scores = create_scored_data()
+    baseline = build_baseline(train, train_scores)
+    data, scores = create_scored_data(3000, seed=5)
+
+    combined = DriftMonitor(baseline)
+    combined.update(data, scores)
+    paths = []
+    for worker, rows in enumerate(np.array_split(np.arange(len(data)), 3)):
+        monitor = DriftMonitor(baseline)
+        monitor.update(data.iloc[rows], scores[rows])
+        paths.append(drift.write_snapshot(monitor, f"api{worker}", str(tmp_path)))
+    other = build_baseline(train.head(100))
+    paths.append(drift.write_snapshot(DriftMonitor(other), "stale", str(tmp_path)))
+
+    merged = merge_snapshots(baseline, paths)
+    assert merged.rows == len(data), "Snapshots over another baseline should be skipped."
+    assert json.dumps(merged.report()) == json.dumps(combined.report())
+
+def test_batched_scoring_feeds_drift_gauges(monkeypatch):
+    """Test that scoring through the batcher path updates the sketches and exports the gauges."""
+    train, train_scores = create_scored_data(2000)
+    features = ["amount", "transaction_hour", "high_transaction"]
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(train[features], train_scores > 0.1)
+    monkeypatch.setattr(drift, "last_refresh", 0.0)
+    drift.set_drift_baseline(build_baseline(train, train_scores))
+    try:
+        records = train[features].head(50).to_dict(orient="records")
+        score_records(model, records, service="drift_test")
+        monitor = drift.get_drift_monitor()
+        assert monitor.rows == 50 and monitor.scores.total == 50
+        rendered = METRICS.render_prometheus()
+        assert 'fraud_drift_psi{feature="amount",service="drift_test"}' in rendered
+        assert 'fraud_drift_rows{service="drift_test"} 50' in rendered
+    finally:
+        drift.set_drift_baseline(None)
+    assert drift.get_drift_monitor() is None
+
+def test_save_drift_baseline(tmp_path, monkeypatch):
+    """Test that training writes the holdout baseline next to the model, locally and to blob storage."""
+    from src.modeling import train_model
+
+    monkeypatch.chdir(tmp_path)
+    storage = LocalBlobServiceClient(str(tmp_path / "blob"))
+    monkeypatch.setattr(train_model, "BLOB_SERVICE_CLIENT", storage)
+    data, _ = create_scored_data(1000)
+    data["is_fraud"] = (data["amount"] > 200).astype(int)
+    X = data[["amount", "transaction_hour", "high_transaction"]]
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, data["is_fraud"])
+
+    # The labeled frame carries the categorical columns the model is not fit on
+    train_model.save_drift_baseline(model, data)
+    baseline = drift.load_baseline(str(tmp_path / "fraud_detection_model_baseline.json"))
+    assert baseline["rows"] == 200 and set(baseline["features"]) == set(X.columns)
+    assert set(baseline["categorical"]) == {"merchant_id", "currency"}
+    assert set(baseline["categorical"]["currency"]["shares"]) == {"USD", "EUR", "GBP"}
+    monitor = DriftMonitor(baseline)
+    monitor.update(data.tail(100), np.full(100, 0.1), np.zeros(100))
+    assert monitor.report()["categorical"]["currency"]["psi"] < 0.2
+    assert baseline["scores"] is not None and 0 < baseline["fraud_rate"] < 1
+    blob = storage.get_blob_client(container="fraud-events", blob="fraud_detection_model_baseline.json")
+    assert json.loads(blob.download_blob().readall()) == baseline
+
+def main():
+    """Main function to execute the drift tests that need no temporary directory."""
+    test_quantile_sketch_merges_and_estimates_quantiles()
+    test_count_min_never_undercounts()
+    test_psi_flags_shifted_features_only()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import os
+import json
+import logging
+import numpy as np
+import pandas as pd
+from src.ingestion.local_storage import LocalBlobServiceClient
+from src.processing import enrichment
+from src.processing.enrichment import BlobSnapshotSource, EnrichmentCache, LocalSnapshotSource, LRUCache
+from src.processing.feature_engineering import extract_features
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def write_snapshots(directory):
+    """Write small merchant, user and FX snapshots plus one long-tail user record."""
+    os.makedirs(os.path.join(directory, "users"), exist_ok=True)
+    pd.DataFrame({"merchant_id": ["merchant_001", "merchant_002"], "merchant_category": ["grocery", "electronics"],
+                  "merchant_risk_score": [0.1, 0.7]}).to_csv(os.path.join(directory, "merchants.csv"), index=False)
+    pd.DataFrame({"user_id": [12345, 12346], "user_location": ["US", "DE"], "user_device": ["ios", "android"],
+                  "previous_transactions": [120, 3]}).to_csv(os.path.join(directory, "users.csv"), index=False)
+    pd.DataFrame({"currency": ["USD", "EUR"], "rate_to_usd": [1.0, 1.08]}).to_csv(os.path.join(directory, "fx_rates.csv"), index=False)
+    with open(os.path.join(directory, "users", "999.json"), "w") as user_file:
+        json.dump({"user_id": 999, "user_location": "FR", "user_device": "web", "previous_transactions": 1}, user_file)
+
+def create_sample_events():
+    """Events hitting the hot snapshot, the long tail and unknown keys."""
+    return pd.DataFrame({
+        "merchant_id": ["merchant_001", "merchant_002", "merchant_404"],
+        "user_id": ["12345", "999", "5"],
+        "amount": [10.0, 20.0, 30.0],
+        "currency": ["EUR", "USD", "XXX"],
+    })
+
+def test_batch_enrichment_gathers_attributes(tmp_path):
+    """Test that a batch gets hot, long-tail and default attributes in one vectorized pass."""
+    write_snapshots(str(tmp_path))
+    cache = EnrichmentCache(LocalSnapshotSource(str(tmp_path)))
+    # Long-tail misses get defaults and are read off the lookup path
+    assert pd.isna(cache.enrich(create_sample_events())["user_location"].iloc[1])
+    assert cache.load_long_tail() == 2
+    enriched = cache.enrich(create_sample_events())
+
+    assert list(enriched["merchant_category"].iloc[:2]) == ["grocery", "electronics"]
+    assert list(enriched["user_location"].iloc[:2]) == ["US", "FR"], "Long-tail user was not looked up."
+    assert enriched[["merchant_category", "user_location"]].iloc[2].isna().all(), "Unknown keys should get defaults."
+    assert np.allclose(enriched["amount_usd"].to_numpy()[:2], [10.8, 20.0]) and np.isnan(enriched["amount_usd"].iloc[2])
+    assert enriched["previous_transactions"].iloc[0] == 120
+    assert len(cache.long_tail) == 2, "Long-tail hits and misses should both be cached."
+
+def test_record_enrichment_matches_batch(tmp_path):
+    """Test that the single-record path returns the same attributes as the batch path."""
+    write_snapshots(str(tmp_path))
+    cache = EnrichmentCache(LocalSnapshotSource(str(tmp_path)))
+    events = create_sample_events()
+    batch = cache.enrich(events)
+    for row, record in enumerate(events.to_dict(orient="records")):
+        enriched = cache.enrich_record(record)
+        for column in ["merchant_category", "merchant_risk_score", "user_device", "amount_usd"]:
+            expected = batch[column].iloc[row]
+            assert enriched[column] == expected or (pd.isna(enriched[column]) and pd.isna(expected)), f"{column} differs."
+    cache.load_long_tail()
+    records = pd.DataFrame([cache.enrich_record(record) for record in events.to_dict(orient="records")])
+    pd.testing.assert_frame_equal(records, cache.enrich(events), check_like=True)
+
+def test_long_tail_values_are_typed_and_fields_are_kept(tmp_path):
+    """Test that long-tail JSON values are coerced to the snapshot's types and never overwrite a transaction field."""
+    write_snapshots(str(tmp_path))
+    with open(tmp_path / "users" / "7.json", "w") as user_file:
+        json.dump({"user_location": 44, "previous_transactions": "n/a"}, user_file)
+    cache = EnrichmentCache(LocalSnapshotSource(str(tmp_path)))
+    events = pd.DataFrame({"user_id": ["7", "999"], "amount": [5.0, 6.0], "user_device": ["kiosk", "kiosk"]})
+    cache.enrich(events)
+    cache.load_long_tail()
+
+    enriched = cache.enrich(events)
+    assert np.isnan(enriched["previous_transactions"].iloc[0]) and enriched["previous_transactions"].iloc[1] == 1
+    assert enriched["user_location"].iloc[0] == 44
+    assert list(enriched["user_device"]) == ["kiosk", "kiosk"], "A reference column overwrote a transaction field."
+    record = cache.enrich_record({"user_id": "7", "amount": 5.0, "user_device": "kiosk"})
+    assert record["user_device"] == "kiosk" and record["amount"] == 5.0 and np.isnan(record["previous_transactions"])
+
+def test_refresh_swaps_changed_snapshots(tmp_path):
+    """Test that refresh reloads only snapshots whose version changed, from blob storage."""
+    storage = LocalBlobServiceClient(str(tmp_path / "blobs"))
+    container = storage.get_container_client("fraud-events")
+    write_snapshots(str(tmp_path / "snapshots"))
+    for name in ["merchants.csv", "users.csv", "fx_rates.csv"]:
+        with open(tmp_path / "snapshots" / name, "rb") as snapshot:
+            container.get_blob_client(f"reference/{name}").upload_blob(snapshot.read())
+
+    cache = EnrichmentCache(BlobSnapshotSource(container))
+    assert cache.refresh() == [], "Unchanged snapshots were reloaded."
+    container.get_blob_client("reference/fx_rates.csv").upload_blob(b"currency,rate_to_usd\nEUR,2.0\n", overwrite=True)
+    assert cache.refresh() == ["fx_rates"]
+    assert cache.enrich_record({"currency": "EUR", "amount": 10.0})["amount_usd"] == 20.0
+
+def test_extract_features_keeps_numeric_reference_attributes(tmp_path, monkeypatch):
+    """Test that training features get the numeric reference attributes but not the unencoded strings."""
+    write_snapshots(str(tmp_path))
+    monkeypatch.setattr(enrichment, "enricher", EnrichmentCache(LocalSnapshotSource(str(tmp_path))))
+    monkeypatch.setattr(enrichment, "enricher_pid", os.getpid())
+    events = create_sample_events().assign(transaction_date=["2024-10-10 08:00"] * 3)
+    features = extract_features(events)
+
+    assert {"merchant_risk_score", "previous_transactions", "amount_usd"} <= set(features.columns)
+    assert not {"merchant_category", "user_location", "user_device"} & set(features.columns)
+    assert list(features["merchant_id"]) == list(events["merchant_id"]), "Input columns should be kept."
+
+def test_lru_cache_is_bounded():
+    """Test that the LRU evicts the least recently used entry."""
+    cache = LRUCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and len(cache) == 2
+
+def main():
+    """Main function to execute the enrichment tests that need no temporary directory."""
+    test_lru_cache_is_bounded()
+
+if __name__ == "__main__":
+    main()
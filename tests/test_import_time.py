@@ -0,0 +1,75 @@
+import os
+import sys
+import logging
+import subprocess
+from src.ingestion.local_storage import LocalBlobServiceClient
+from src.processing import data_transformation, feature_engineering, fraud_detection
+from src.modeling import train_model
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Generous per-module budget for the cumulative import time; the heavy imports it guards against cost seconds
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "3000"))
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must import without credentials and without loading Azure SDKs, scikit-learn or joblib
+LIGHT_MODULES = [
+    "src.processing.data_transformation",
+    "src.processing.feature_engineering",
+    "src.processing.fraud_detection",
+    "src.modeling.train_model",
+    "src.modeling.predict",
+    "src.modeling.compact_model",
+    "src.modeling.cascade",
+    "src.modeling.shadow",
+    "src.ingestion.datafactory_source",
+    "src.ingestion.EventHub_source",
+    "src.deployment.api_integration",
+    "src.deployment.deploy_model",
+]
+HEAVY_PACKAGES = ("azure", "sklearn", "joblib")
+
+def import_profile(module):
+    """Import a module in a fresh interpreter with -X importtime and no Azure settings.
+
+    Returns (return code, {imported module: cumulative microseconds}, stderr).
+    """
+    env = {key: value for key, value in os.environ.items() if not key.startswith("AZURE_")}
+    env["PYTHONPATH"] = REPO_ROOT
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=120)
+    imported = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            imported[name.strip()] = int(cumulative)
+    return result.returncode, imported, result.stderr
+
+def test_modules_import_without_credentials_or_heavy_dependencies():
+    """Test that each module imports with no connection strings and defers the SDKs and model libraries."""
+    for module in LIGHT_MODULES:
+        returncode, imported, stderr = import_profile(module)
+        assert returncode == 0, f"Importing {module} failed without credentials:\n{stderr[-2000:]}"
+        heavy = sorted(name for name in imported if name.split(".")[0] in HEAVY_PACKAGES)
+        assert not heavy, f"Importing {module} loaded {heavy[:5]}"
+        elapsed_ms = imported[module] / 1000
+        logging.info(f"{module} imported in {elapsed_ms:.0f} ms")
+        assert elapsed_ms < IMPORT_TIME_BUDGET_MS, f"{module} took {elapsed_ms:.0f} ms to import."
+
+def test_blob_clients_are_injectable(tmp_path, monkeypatch):
+    """Test that a client assigned to BLOB_SERVICE_CLIENT is the one each module uses."""
+    storage = LocalBlobServiceClient(str(tmp_path))
+    for module in (data_transformation, feature_engineering, fraud_detection, train_model):
+        monkeypatch.setattr(module, "BLOB_SERVICE_CLIENT", storage)
+        assert module.get_blob_service_client() is storage
+
+def main():
+    """Main function to execute the import tests that need no temporary directory."""
+    test_modules_import_without_credentials_or_heavy_dependencies()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import os
+import json
+import logging
+import numpy as np
+import pandas as pd
+from src.processing.label_join import LabeledStore, load_training_data, partition_of, run_label_join
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def write_transactions(path, ids):
+    """Write a transformed-transactions CSV without labels."""
+    pd.DataFrame({"transaction_id": ids, "amount": np.asarray(ids) * 10.0}).to_csv(path, index=False)
+    return str(path)
+
+def write_labels(path, labels):
+    """Write a label batch in the fraud_labels.json layout."""
+    path.write_text(json.dumps({"labels": [{"transaction_id": i, "is_fraud": y} for i, y in labels]}))
+    return str(path)
+
+def test_partition_of_is_stable_across_id_types():
+    """Test that int and str ids hash to the same partition."""
+    assert list(partition_of([1, 2, 3], 8)) == list(partition_of(["1", "2", "3"], 8)), "Partitioning depends on id type."
+
+def test_labels_join_onto_partitions(tmp_path):
+    """Test that a label batch fills is_fraud and only goes to the partitions holding its ids."""
+    store_dir = str(tmp_path / "labeled")
+    transactions = write_transactions(tmp_path / "tx.csv", list(range(1, 201)))
+    labels = write_labels(tmp_path / "labels_1.json", [(5, 1), (6, 0)])
+
+    labeled = run_label_join([transactions], [labels], store_dir=store_dir, num_partitions=16, chunk_rows=50)
+    assert labeled == set(partition_of([5, 6], 16)), "Labels went to partitions without their ids."
+
+    data = load_training_data(store_dir)
+    assert sorted(zip(data["transaction_id"], data["is_fraud"])) == [(5, 1), (6, 0)], "Labels were not joined."
+    assert sum(len(pd.read_csv(LabeledStore(store_dir, 16).partition_path(p))) for p in range(16)) == 200
+
+def test_rerun_is_incremental_and_latest_label_wins(tmp_path):
+    """Test that applied inputs are skipped and a corrected label overrides the earlier one."""
+    store_dir = str(tmp_path / "labeled")
+    transactions = write_transactions(tmp_path / "tx.csv", list(range(1, 51)))
+    first = write_labels(tmp_path / "labels_1.json", [(7, 0)])
+    run_label_join([transactions], [first], store_dir=store_dir, num_partitions=4)
+    assert run_label_join([transactions], [first], store_dir=store_dir, num_partitions=4) == set(), "Inputs were reapplied."
+
+    correction = write_labels(tmp_path / "labels_2.json", [(7, 1)])
+    run_label_join([transactions], [first, correction], store_dir=store_dir, num_partitions=4)
+    data = load_training_data(store_dir)
+    assert data.set_index("transaction_id")["is_fraud"].to_dict() == {7: 1}, "The corrected label was not applied."
+
+def test_labels_before_transactions_are_joined_later(tmp_path):
+    """Test that a label for a transaction not yet ingested is held and joined once it arrives."""
+    store_dir = str(tmp_path / "labeled")
+    early = write_transactions(tmp_path / "tx_1.csv", [1, 2])
+    labels = write_labels(tmp_path / "labels_1.json", [(1, 0), (99, 1)])
+    run_label_join([early], [labels], store_dir=store_dir, num_partitions=4)
+    assert 99 not in set(load_training_data(store_dir)["transaction_id"]), "A label was joined without its transaction."
+
+    late = write_transactions(tmp_path / "tx_2.csv", [99])
+    run_label_join([early, late], [labels], store_dir=store_dir, num_partitions=4)
+    data = load_training_data(store_dir)
+    assert data.set_index("transaction_id")["is_fraud"].to_dict() == {1: 0, 99: 1}, "The pending label was not joined."
+
+def test_partitions_split_as_the_store_grows(tmp_path):
+    """Test that partitions double once one outgrows partition_rows, keeping every row and label."""
+    store_dir = str(tmp_path / "labeled")
+    labels = write_labels(tmp_path / "labels_1.json", [(3, 1), (150, 0), (1000, 1)])
+    run_label_join([write_transactions(tmp_path / "tx_1.csv", list(range(1, 101)))], [labels],
+                   store_dir=store_dir, num_partitions=2, partition_rows=40)
+    store = LabeledStore(store_dir)
+    assert store.num_partitions == 4 and max(store.state["rows"].values()) <= 40
+
+    run_label_join([write_transactions(tmp_path / "tx_2.csv", list(range(101, 1001)))], [labels],
+                   store_dir=store_dir, partition_rows=40)
+    store = LabeledStore(store_dir)
+    assert max(store.state["rows"].values()) <= 40 and sum(store.state["rows"].values()) == 1000
+    assert sum(len(pd.read_csv(store.partition_path(p))) for p in store.partitions()) == 1000
+    assert load_training_data(store_dir).set_index("transaction_id")["is_fraud"].to_dict() == {3: 1, 150: 0, 1000: 1}
+
+def test_label_batches_append_and_holdout_ids_stream(tmp_path):
+    """Test that a label batch leaves the transaction files untouched and a load can be limited to some ids."""
+    store_dir = str(tmp_path / "labeled")
+    transactions = write_transactions(tmp_path / "tx.csv", list(range(1, 201)))
+    run_label_join([transactions], [], store_dir=store_dir, num_partitions=4)
+    store = LabeledStore(store_dir)
+    before = {p: os.stat(store.partition_path(p)).st_mtime_ns for p in store.partitions()}
+
+    labels = write_labels(tmp_path / "labels_1.json", [(i, i % 2) for i in range(1, 201)])
+    assert run_label_join([transactions], [labels], store_dir=store_dir) == set(range(4))
+    assert {p: os.stat(store.partition_path(p)).st_mtime_ns for p in store.partitions()} == before
+
+    data = load_training_data(store_dir, ids=["7", 8, 999])
+    assert sorted(data["transaction_id"]) == [7, 8] and data["transaction_id"].dtype == np.int64
+
+def main():
+    """Main function to execute the label join tests that need no temporary directory."""
+    test_partition_of_is_stable_across_id_types()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import json
+import logging
+import threading
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from benchmarks.replay import CountingSink, prepare_consumer, prediction_payloads, replay
+from benchmarks.synthetic_data import generate_events
+from src.ingestion.blob_discovery import partition_time
+from src.ingestion.dead_letter import CheckpointTracker, DeadLetterQueue, RetryQueue
+from src.ingestion.event_source import create_consumer_client
+from src.ingestion.local_event_hub import LocalCheckpointStore, LocalConsumerClient, LocalEventHub, get_local_event_hub
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def receive_until(client, count, starting_position="-1", timeout=5.0):
+    """Run client.receive on a thread until count events were handled, checkpointing each; returns the events."""
+    received = []
+    done = threading.Event()
+
+    def on_event(partition_context, event):
+        received.append((partition_context.partition_id, event))
+        partition_context.update_checkpoint(event)
+        if len(received) >= count:
+            done.set()
+
+    thread = threading.Thread(target=client.receive, kwargs={"on_event": on_event, "starting_position": starting_position})
+    thread.start()
+    done.wait(timeout)
+    client.close()
+    thread.join(timeout)
+    assert not thread.is_alive(), "receive() did not return after close()."
+    return received
+
+def test_partition_keys_sequence_numbers_and_offsets():
+    """Test that a partition key always maps to one partition and each partition numbers its events."""
+    hub = LocalEventHub("test-hub", partition_count=3)
+    events = [hub.send({"transaction_id": i, "user_id": str(i % 5)}, partition_key=str(i % 5)) for i in range(30)]
+
+    for key in range(5):
+        partitions = {hub_partition.partition_id for hub_partition in hub.partitions
+                      for event in hub_partition.events if event.body_as_json()["user_id"] == str(key)}
+        assert len(partitions) == 1, "Events with the same partition key were spread over partitions."
+    for hub_partition in hub.partitions:
+        assert [event.sequence_number for event in hub_partition.events] == list(range(len(hub_partition.events)))
+        offsets = [int(event.offset) for event in hub_partition.events]
+        assert offsets == sorted(offsets) and (not offsets or offsets[0] == 0)
+    assert sum(len(hub_partition.events) for hub_partition in hub.partitions) == len(events)
+
+def test_consumer_resumes_after_checkpoint():
+    """Test that a consumer reads from the start, and a new one on the same checkpoint store resumes after it."""
+    hub = LocalEventHub("test-hub", partition_count=2)
+    for i in range(10):
+        hub.send({"transaction_id": i}, partition_id=i % 2)
+    store = LocalCheckpointStore()
+
+    first = receive_until(LocalConsumerClient(hub, checkpoint_store=store), 10)
+    assert sorted(event.body_as_json()["transaction_id"] for _, event in first) == list(range(10))
+
+    for i in range(10, 14):
+        hub.send({"transaction_id": i}, partition_id=i % 2)
+    second = receive_until(LocalConsumerClient(hub, checkpoint_store=store), 4)
+    assert sorted(event.body_as_json()["transaction_id"] for _, event in second) == [10, 11, 12, 13], \
+        "The consumer did not resume after the checkpoints."
+
+def test_latest_skips_existing_events():
+    """Test that @latest only delivers events sent after receive() started."""
+    hub = get_local_event_hub("test-latest-hub", partition_count=2)
+    hub.send({"transaction_id": "old"}, partition_id=0)
+    client = create_consumer_client(None, "test-latest-hub", source="local")
+    assert client.hub is hub
+
+    sender = threading.Timer(0.2, lambda: hub.send({"transaction_id": "new"}, partition_id=1))
+    sender.start()
+    received = receive_until(client, 1, starting_position="@latest")
+    sender.join()
+    assert [event.body_as_json()["transaction_id"] for _, event in received] == ["new"]
+
+def test_replay_into_predict_consumer():
+    """Test that replayed events are scored by the predict consumer, checkpointed and reported."""
+    from src.modeling import predict
+
+    raw_events = generate_events(400, seed=3)
+    payloads = prediction_payloads(raw_events)
+    model = RandomForestClassifier(n_estimators=5, random_state=42)
+    model.fit(pd.DataFrame(payloads).drop(columns=["transaction_id"]), [event["is_fraud"] for event in raw_events])
+
+    sink = CountingSink()
+    originals = predict.model, predict.DEAD_LETTERS, predict.RETRIES, predict.CHECKPOINTS
+    predict.model = model
+    predict.DEAD_LETTERS = DeadLetterQueue(predict.SERVICE_NAME, sink=sink)
+    predict.RETRIES = RetryQueue(predict.DEAD_LETTERS)
+    predict.CHECKPOINTS = CheckpointTracker(predict.SERVICE_NAME)
+    try:
+        events = [(event["user_id"], payload) for event, payload in zip(raw_events, payloads)]
+        events.append((None, {"transaction_id": "bad", "amount": -1}))
+        result = replay(predict.on_event, events, len(events), partitions=3, drain_timeout=30)
+    finally:
+        predict.RETRIES.close()
+        predict.model, predict.DEAD_LETTERS, predict.RETRIES, predict.CHECKPOINTS = originals
+
+    assert result["events_processed"] == 401
+    assert all(lag == 0 for lag in result["lag_events"]["final"].values()), "Some events were not checkpointed."
+    assert result["latency_ms"]["p50"] <= result["latency_ms"]["p99"] <= result["latency_ms"]["max"]
+    assert sink.count == 1, "The invalid event was not dead-lettered."
+    json.dumps(result)
+
+def test_replay_into_eventhub_source_consumer(tmp_path, monkeypatch):
+    """Test that replayed events are written by the EventHub_source consumer to hourly blob partitions."""
+    from src.ingestion import EventHub_source
+
+    # prepare_consumer swaps the module's storage and queues; restore them afterwards
+    for name in ("blob_service_client", "DEAD_LETTERS", "RETRIES", "CHECKPOINTS"):
+        monkeypatch.setattr(EventHub_source, name, getattr(EventHub_source, name))
+    on_event, build_payloads, sink = prepare_consumer("eventhub_source", str(tmp_path))
+    raw_events = generate_events(200, seed=4)
+    events = [(event["user_id"], payload) for event, payload in zip(raw_events, build_payloads(raw_events))]
+    events.append((None, {"transaction_id": "bad"}))
+    try:
+        result = replay(on_event, events, len(events), partitions=2, drain_timeout=30)
+    finally:
+        EventHub_source.RETRIES.close()
+
+    assert result["events_processed"] == 201
+    assert all(lag == 0 for lag in result["lag_events"]["final"].values()), "Some events were not checkpointed."
+    assert sink.count == 1, "The invalid event was not dead-lettered."
+    blobs = list(EventHub_source.blob_service_client.get_container_client(EventHub_source.BLOB_CONTAINER_NAME).list_blobs())
+    assert len(blobs) == 200
+    assert all(partition_time(blob.name) is not None and blob.name.endswith(".json") for blob in blobs)
+
+def main():
+    """Main function to execute the local Event Hub tests."""
+    test_partition_keys_sequence_numbers_and_offsets()
+    test_consumer_resumes_after_checkpoint()
+    test_latest_skips_existing_events()
+    test_replay_into_predict_consumer()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import signal
+import threading
+import logging
+import urllib.request
+import numpy as np
+import pandas as pd
+from src.monitoring import profiling
+from src.monitoring.metrics import LatencyHistogram, MetricsRegistry, start_metrics_server
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def test_latency_histogram_quantiles():
+    """Test that histogram quantiles stay within the bucket precision of the exact values."""
+    latencies = np.random.default_rng(0).lognormal(mean=-7, sigma=1.0, size=20000)  # ~1ms median
+    histogram = LatencyHistogram()
+    for value in latencies:
+        histogram.record(value)
+
+    for q in (0.5, 0.9, 0.99):
+        exact = np.quantile(latencies, q)
+        assert abs(histogram.quantile(q) - exact) / exact < 0.03, f"Quantile {q} is outside the histogram precision."
+    assert histogram.total_count == len(latencies)
+
+def test_latency_histogram_merge():
+    """Test that merged histograms report the combined distribution."""
+    first, second = LatencyHistogram(), LatencyHistogram()
+    for _ in range(100):
+        first.record(0.001)
+        second.record(0.1)
+    first.merge(second)
+
+    assert first.total_count == 200
+    assert first.quantile(0.25) < 0.002 and first.quantile(0.75) > 0.09
+
+def test_registry_sampling_and_rendering():
+    """Test event sampling, counters and the Prometheus text output."""
+    registry = MetricsRegistry(sample_rate=0.5)
+    for _ in range(10):
+        timer = registry.start_event("api")
+        with timer.stage("model"):
+            pass
+    registry.inc("fraud_errors_total", service="api", stage="process")
+    registry.set_gauge("fraud_eventhub_lag_events", 7, service="predict", partition="0")
+
+    assert registry.counter_value("fraud_events_total", service="api") == 10
+    assert registry.histogram("fraud_stage_latency_seconds", service="api", stage="model").total_count == 5
+
+    text = registry.render_prometheus()
+    assert '# TYPE fraud_stage_latency_seconds summary' in text
+    assert 'fraud_stage_latency_seconds_count{service="api",stage="model"} 5' in text
+    assert 'fraud_eventhub_lag_events{partition="0",service="predict"} 7' in text
+
+    registry.inc("fraud_errors_total", service='a"b\\c\nd', stage="process")
+    assert 'fraud_errors_total{service="a\\"b\\\\c\\nd",stage="process"} 1' in registry.render_prometheus()
+
+def test_metrics_sidecar_server():
+    """Test that the sidecar HTTP server exposes the registry on /metrics."""
+    registry = MetricsRegistry()
+    registry.inc("fraud_checkpoints_total", service="predict", partition="1")
+    server = start_metrics_server(port=0, host="127.0.0.1", registry=registry)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+            body = response.read().decode("utf-8")
+        assert 'fraud_checkpoints_total{partition="1",service="predict"} 1' in body
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def busy_work(deadline):
+    """Burn CPU in a recognisable function until the deadline."""
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(1000))
+    return total
+
+def test_profile_session_writes_flamegraph_and_memory_report(tmp_path):
+    """Test that a profile captures stacks of other threads and reports in-flight DataFrames."""
+    in_flight = pd.DataFrame({'amount': np.arange(10000, dtype=float)})
+    session = profiling.ProfileSession("test", seconds=0.3, output_dir=str(tmp_path), interval=0.002)
+    assert session.start(), "Profile did not start."
+    assert not profiling.ProfileSession("test", seconds=0.1, output_dir=str(tmp_path)).start(), \
+        "A second concurrent profile should be rejected."
+
+    busy_work(time.perf_counter() + 0.5)
+    while profiling.ProfileSession.is_running():
+        time.sleep(0.05)
+
+    with open(f"{session.output_prefix}.folded") as folded_file:
+        stacks = folded_file.read().splitlines()
+    assert any("busy_work" in line for line in stacks), "Profile did not capture the busy thread."
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in stacks), "Output is not in collapsed stack format."
+
+    with open(f"{session.output_prefix}.memory.json") as json_file:
+        report = json.load(json_file)
+    assert report["tracemalloc"]["top_allocations"], "No tracemalloc allocations were reported."
+    assert report["dataframes"]["total_bytes"] >= in_flight.memory_usage(deep=True).sum()
+
+def test_profile_http_trigger_requires_admin_token(monkeypatch):
+    """Test that the HTTP trigger is refused without the configured admin token."""
+    monkeypatch.setattr(profiling, "PROFILING_ADMIN_TOKEN", "secret")
+
+    assert profiling.handle_profile_request("test", None)[0] == 403
+    assert profiling.handle_profile_request("test", "wrong")[0] == 403
+    assert profiling.handle_profile_request("test", "secret", seconds="abc")[0] == 400
+
+    monkeypatch.setattr(profiling, "PROFILING_ADMIN_TOKEN", None)
+    assert profiling.handle_profile_request("test", "")[0] == 403, "The trigger must be disabled without a token."
+
+def test_profile_signal_does_not_take_the_session_lock(monkeypatch):
+    """Test that the signal handler returns while the session lock is held and the profile starts afterwards."""
+    started = threading.Event()
+
+    def run(session):
+        with profiling.ProfileSession._lock:
+            profiling.ProfileSession._active = None
+        started.set()
+
+    monkeypatch.setattr(profiling.ProfileSession, "_run", run)
+    previous = signal.getsignal(signal.SIGUSR2)
+    try:
+        assert profiling.install_signal_handler("test", "SIGUSR2")
+        with profiling.ProfileSession._lock:
+            os.kill(os.getpid(), signal.SIGUSR2)
+            time.sleep(0.05)
+        assert started.wait(5), "The profile was not started after the signal."
+    finally:
+        signal.signal(signal.SIGUSR2, previous)
+
+def main():
+    """Main function to execute the monitoring tests."""
+    test_latency_histogram_quantiles()
+    test_latency_histogram_merge()
+    test_registry_sampling_and_rendering()
+    test_metrics_sidecar_server()
+
+if __name__ == "__main__":
+    main()
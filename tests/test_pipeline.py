@@ -0,0 +1,98 @@
+import sys
+import logging
+import pytest
+from scripts import run_pipeline as run_pipeline_module
+from scripts.run_pipeline import CACHED, FAILED, BLOCKED, RAN, STAGES, Stage, run_pipeline, topological_order
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def write_stage(name, output, inputs=(), deps=(), sleep=0.0, fail=False):
+    """Create a stage that copies its inputs into its output file after an optional sleep."""
+    script = (
+        f"import time, sys; time.sleep({sleep}); "
+        f"data = ''.join(open(p).read() for p in {list(inputs)!r}); "
+        f"open({output!r}, 'w').write(data + {name!r}); "
+        f"sys.exit({1 if fail else 0})"
+    )
+    return Stage(name, [sys.executable, "-c", script], deps=deps, inputs=inputs, outputs=[output])
+
+def create_sample_stages():
+    """Two independent stages feeding a third."""
+    return [
+        write_stage("left", "left.txt", inputs=["source.txt"], sleep=0.5),
+        write_stage("right", "right.txt", sleep=0.5),
+        write_stage("join", "join.txt", inputs=["left.txt", "right.txt"], deps=["left", "right"]),
+    ]
+
+def test_independent_stages_run_in_parallel(tmp_path):
+    """Test that independent stages overlap and the critical path follows the slowest chain."""
+    (tmp_path / "source.txt").write_text("a")
+    report = run_pipeline(create_sample_stages(), jobs=2, root=str(tmp_path))
+
+    assert all(result['status'] == RAN for result in report['stages'].values())
+    assert report['wall_s'] < 0.5 + 0.5 + 0.4, "Independent stages did not run in parallel."
+    assert report['critical_path'][-1] == 'join' and len(report['critical_path']) == 2
+    assert (tmp_path / "join.txt").read_text() == "aleftrightjoin"
+
+def test_unchanged_stages_are_cached(tmp_path):
+    """Test that stages are skipped when their inputs and code hash is unchanged, and rerun when an input changes."""
+    (tmp_path / "source.txt").write_text("a")
+    run_pipeline(create_sample_stages(), jobs=2, root=str(tmp_path))
+
+    report = run_pipeline(create_sample_stages(), jobs=2, root=str(tmp_path))
+    assert all(result['status'] == CACHED for result in report['stages'].values()), "Unchanged stages were rerun."
+
+    (tmp_path / "source.txt").write_text("b")
+    report = run_pipeline(create_sample_stages(), jobs=2, root=str(tmp_path))
+    statuses = {name: result['status'] for name, result in report['stages'].items()}
+    assert statuses == {'left': RAN, 'right': CACHED, 'join': RAN}
+
+def test_failed_stage_blocks_dependents(tmp_path):
+    """Test that dependents of a failed stage are not started."""
+    stages = [
+        write_stage("left", "left.txt", fail=True),
+        write_stage("right", "right.txt"),
+        write_stage("join", "join.txt", deps=["left", "right"]),
+    ]
+    report = run_pipeline(stages, jobs=2, root=str(tmp_path))
+
+    assert report['stages']['left']['status'] == FAILED
+    assert report['stages']['join']['status'] == BLOCKED
+    assert report['stages']['right']['status'] == RAN
+
+def test_topological_order_rejects_cycles():
+    """Test that dependency cycles are reported."""
+    stages = [Stage("a", ["true"], deps=["b"]), Stage("b", ["true"], deps=["a"])]
+    with pytest.raises(ValueError):
+        topological_order(stages)
+
+def test_pipeline_stages_declare_what_they_use():
+    """Test that the tests stage waits on nothing and no stage writes the files its cache key is built from."""
+    stages = {stage.name: stage for stage in STAGES}
+    assert stages['tests'].deps == []
+    assert "--inplace" not in stages['notebooks'].command
+    for stage in STAGES:
+        assert not set(stage.outputs) & set(stage.inputs), f"Stage '{stage.name}' overwrites its own inputs."
+    topological_order(STAGES)
+
+def test_skip_leaves_module_stages_unchanged(monkeypatch):
+    """Test that --skip drops dependencies from the stages of that run only."""
+    runs = []
+    monkeypatch.setattr(run_pipeline_module, "run_pipeline", lambda stages, **kwargs: runs.append(stages) or {"stages": {}})
+    monkeypatch.setattr(run_pipeline_module, "log_report", lambda report: None)
+    deps = {stage.name: list(stage.deps) for stage in STAGES}
+
+    assert run_pipeline_module.main(["--skip", "train"]) == 0
+    assert run_pipeline_module.main([]) == 0
+    assert not any("train" in stage.deps for stage in runs[0])
+    assert {stage.name: stage.deps for stage in runs[1]} == deps
+    assert {stage.name: stage.deps for stage in STAGES} == deps
+
+def main():
+    """Main function to execute the pipeline runner tests."""
+    test_topological_order_rejects_cycles()
+    test_pipeline_stages_declare_what_they_use()
+
+if __name__ == "__main__":
+    main()
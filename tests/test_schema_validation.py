@@ -0,0 +1,94 @@
+import logging
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from src.deployment import api_integration
+from src.deployment.batching import DynamicBatcher
+from src.monitoring.metrics import MetricsRegistry
+from src.processing.schema_validation import (
+    PREDICTION_REQUEST_VALIDATOR, TRANSACTION_VALIDATOR, SchemaValidationError, SchemaValidator,
+)
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def create_sample_events():
+    """Two valid raw events followed by malformed ones."""
+    valid = {"transaction_id": 1, "timestamp": "2024-10-10T08:30:00Z", "user_id": "12345", "amount": 250.0,
+             "currency": "USD", "merchant_id": "merchant_001", "is_fraud": 0}
+    return [
+        valid,
+        dict(valid, transaction_id="tx-2", amount=5000, is_fraud=1),
+        dict(valid, amount=-5.0, currency="XXX"),
+        dict(valid, amount="250", timestamp="yesterday"),
+        {"transaction_id": True},
+    ]
+
+def test_batch_matches_record_validation():
+    """Test that column-wise masks agree with the per-record checks row by row."""
+    events = create_sample_events()
+    result = TRANSACTION_VALIDATOR.validate_batch(events)
+
+    assert list(result.valid) == [True, True, False, False, False], "Per-row validity is incorrect."
+    assert result.invalid_count == 3
+    for row, event in enumerate(events):
+        assert result.row_errors(row) == TRANSACTION_VALIDATOR.validate_record(event), f"Row {row} disagrees."
+    assert result.row_errors(2) == ["amount: minimum", "currency: enum"]
+    assert result.row_errors(3) == ["timestamp: format", "amount: type"]
+    assert "timestamp: required" in result.row_errors(4) and "transaction_id: type" in result.row_errors(4)
+
+def test_batch_validation_of_dataframe_columns():
+    """Test typed DataFrame columns, missing required columns and integer checks on floats."""
+    frame = pd.DataFrame({"amount": [10.0, np.nan, 2e6], "transaction_hour": [3.0, 24.0, 2.5]})
+    result = PREDICTION_REQUEST_VALIDATOR.validate_batch(frame)
+    assert result.row_errors(0) == []
+    assert result.row_errors(1) == ["amount: required", "transaction_hour: maximum"]
+    assert result.row_errors(2) == ["amount: maximum", "transaction_hour: type"]
+
+    missing = TRANSACTION_VALIDATOR.validate_batch(frame)
+    assert not missing.valid.any(), "Rows without required fields must be invalid."
+
+def test_compiler_rejects_unsupported_keywords():
+    """Test that schemas using keywords the compiler cannot vectorize are refused."""
+    with pytest.raises(ValueError):
+        SchemaValidator({"type": "object", "properties": {"name": {"type": "string", "pattern": "^a"}}})
+    strict = SchemaValidator({"type": "object", "properties": {"a": {"type": "integer"}}, "additionalProperties": False})
+    assert strict.validate_record({"a": 1, "b": 2}) == ["b: additionalProperties"]
+    assert list(strict.validate_batch([{"a": 1}, {"a": 1, "b": 2}]).valid) == [True, False]
+
+def test_predict_rejects_invalid_transactions(monkeypatch):
+    """Test that /predict returns 400 with the failed checks, with and without batching."""
+    data = pd.DataFrame({"amount": np.random.rand(50) * 1000, "transaction_hour": np.random.randint(0, 24, size=50)})
+    model = RandomForestClassifier(n_estimators=5, random_state=42).fit(data, (data["amount"] > 900).astype(int))
+    monkeypatch.setattr(api_integration, "model", model)
+    client = api_integration.app.test_client()
+
+    for batching in (False, True):
+        monkeypatch.setattr(api_integration, "BATCHING_ENABLED", batching)
+        response = client.post('/predict', json={'amount': -1.0, 'transaction_hour': 30})
+        assert response.status_code == 400
+        assert response.get_json()["details"] == ["amount: minimum", "transaction_hour: maximum"]
+
+def test_batcher_fails_only_invalid_rows():
+    """Test that the batcher's column-wise validation fails invalid rows before they reach the model."""
+    data = pd.DataFrame({"amount": np.random.rand(50) * 1000, "transaction_hour": np.random.randint(0, 24, size=50)})
+    model = RandomForestClassifier(n_estimators=5, random_state=42).fit(data, (data["amount"] > 900).astype(int))
+    batcher = DynamicBatcher(lambda: model, max_batch_size=8, max_wait_ms=50, registry=MetricsRegistry(),
+                             validator=PREDICTION_REQUEST_VALIDATOR)
+    try:
+        good = batcher.submit({'amount': 10.0, 'transaction_hour': 1})
+        bad = batcher.submit({'amount': "ten", 'transaction_hour': 1})
+        assert good.result(timeout=5)[0] in (0, 1)
+        assert isinstance(bad.exception(timeout=5), SchemaValidationError)
+    finally:
+        batcher.close()
+
+def main():
+    """Main function to execute the schema validation tests."""
+    test_batch_matches_record_validation()
+    test_batch_validation_of_dataframe_columns()
+    test_compiler_rejects_unsupported_keywords()
+
+if __name__ == "__main__":
+    main()
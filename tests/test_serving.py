@@ -0,0 +1,140 @@
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from src.deployment import api_integration, serve
+from src.deployment.batching import DynamicBatcher
+from src.monitoring import drift
+from src.monitoring.metrics import MetricsRegistry
+from src.processing import enrichment
+from src.processing.enrichment import EnrichmentCache, LocalSnapshotSource
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def create_sample_model():
+    """Train a small model on two numeric features."""
+    data = pd.DataFrame({
+        'amount': np.random.rand(100) * 1000,
+        'transaction_hour': np.random.randint(0, 24, size=100),
+    })
+    labels = (data['amount'] > 900).astype(int)
+    return RandomForestClassifier(n_estimators=5, random_state=42).fit(data, labels)
+
+def serve_model(monkeypatch, model):
+    """Serve the given model as if it had been loaded; monkeypatch restores the module globals after the test."""
+    monkeypatch.setattr(api_integration, "model", model)
+    monkeypatch.setattr(api_integration, "model_load_attempted", True)
+
+def test_health_and_readiness(monkeypatch):
+    """Test the liveness and readiness probes with and without a loaded model."""
+    client = api_integration.app.test_client()
+    serve_model(monkeypatch, None)
+
+    assert client.get('/healthz').status_code == 200
+    assert client.get('/readyz').status_code == 503, "Worker without a model must not report ready."
+
+    serve_model(monkeypatch, create_sample_model())
+    assert client.get('/readyz').status_code == 200
+
+    response = client.post('/predict', json={'amount': 950.0, 'transaction_hour': 3})
+    assert response.status_code == 200 and response.get_json()['is_fraud'] in (0, 1)
+
+def test_reload_model_swaps_and_keeps_model_on_failure(tmp_path, monkeypatch):
+    """Test that reload_model swaps in the new model and keeps the old one if loading fails."""
+    current = create_sample_model()
+    serve_model(monkeypatch, current)
+    # A reload also replaces the drift baseline and monitor
+    for name in ("baseline", "monitor", "monitor_pid"):
+        monkeypatch.setattr(drift, name, getattr(drift, name))
+
+    monkeypatch.setattr(api_integration, "MODEL_LOCAL_PATH", str(tmp_path / "missing.pkl"))
+    assert not api_integration.reload_model()
+    assert api_integration.model is current, "A failed reload must keep serving the current model."
+
+    model_path = tmp_path / "fraud_detection_model.pkl"
+    joblib.dump(create_sample_model(), model_path)
+    monkeypatch.setattr(api_integration, "MODEL_LOCAL_PATH", str(model_path))
+    assert api_integration.reload_model()
+    assert api_integration.model is not current
+
+def test_gunicorn_options_preload_model():
+    """Test that the production server preloads the app and sizes workers from the core count."""
+    options = serve.gunicorn_options()
+
+    assert options['preload_app'] is True, "The model must be loaded in the master before fork."
+    assert options['workers'] >= 1 and options['threads'] >= 1
+    assert options['worker_class'] == ('gthread' if options['threads'] > 1 else 'sync')
+    assert callable(options['on_reload'])
+
+def test_dynamic_batcher_returns_each_caller_its_row():
+    """Test that concurrent requests are coalesced and each caller gets the prediction for its own row."""
+    model = create_sample_model()
+    registry = MetricsRegistry()
+    batcher = DynamicBatcher(lambda: model, max_batch_size=16, max_wait_ms=20, registry=registry)
+    records = [{'amount': float(amount), 'transaction_hour': 3} for amount in np.linspace(0, 1000, 64)]
+    try:
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(batcher.predict, records))
+    finally:
+        batcher.close()
+
+    expected = model.predict(pd.DataFrame(records))
+    assert [label for label, _ in results] == list(expected), "Batched predictions do not match per-row predictions."
+    sizes = registry.histogram("fraud_batch_size", service="api")
+    assert sizes.total_count < len(records), "Concurrent requests were not coalesced."
+    assert registry.histogram("fraud_batch_queue_delay_seconds", service="api").total_count == len(records)
+
+def test_dynamic_batcher_isolates_malformed_rows():
+    """Test that a row the model rejects fails only its own caller."""
+    model = create_sample_model()
+    batcher = DynamicBatcher(lambda: model, max_batch_size=8, max_wait_ms=50, registry=MetricsRegistry())
+    try:
+        good = batcher.submit({'amount': 10.0, 'transaction_hour': 1})
+        bad = batcher.submit({'amount': 10.0, 'unexpected_field': 1})
+        assert good.result(timeout=5)[0] in (0, 1)
+        assert bad.exception(timeout=5) is not None, "The malformed row should fail."
+    finally:
+        batcher.close()
+
+def test_predict_endpoint_with_batching(monkeypatch):
+    """Test that /predict returns the same response shape when batching is enabled."""
+    serve_model(monkeypatch, create_sample_model())
+    monkeypatch.setattr(api_integration, "BATCHING_ENABLED", True)
+    client = api_integration.app.test_client()
+
+    response = client.post('/predict', json={'amount': 950.0, 'transaction_hour': 3})
+    assert response.status_code == 200
+    assert set(response.get_json()) == {'transaction_id', 'is_fraud'}
+
+def test_predict_endpoint_with_reference_data(tmp_path, monkeypatch):
+    """Test that metadata and string reference attributes never reach a model trained on enriched features."""
+    pd.DataFrame({"merchant_id": ["merchant_001", "merchant_002"], "merchant_category": ["grocery", "travel"],
+                  "merchant_risk_score": [0.1, 0.9]}).to_csv(tmp_path / "merchants.csv", index=False)
+    monkeypatch.setattr(enrichment, "enricher", EnrichmentCache(LocalSnapshotSource(str(tmp_path))))
+    monkeypatch.setattr(enrichment, "enricher_pid", os.getpid())
+    data = pd.DataFrame({
+        'amount': np.random.rand(100) * 1000,
+        'transaction_hour': np.random.randint(0, 24, size=100),
+        'merchant_risk_score': np.random.rand(100),
+    })
+    model = RandomForestClassifier(n_estimators=5, random_state=42).fit(data, (data['amount'] > 900).astype(int))
+    serve_model(monkeypatch, model)
+    client = api_integration.app.test_client()
+
+    payload = {'transaction_id': 'tx-1', 'merchant_id': 'merchant_002', 'amount': 950.0, 'transaction_hour': 3}
+    for batching in (False, True):
+        monkeypatch.setattr(api_integration, "BATCHING_ENABLED", batching)
+        response = client.post('/predict', json=payload)
+        assert response.status_code == 200, response.get_json()
+        assert response.get_json()['transaction_id'] == 'tx-1'
+
+def main():
+    """Main function to execute the serving tests."""
+    test_gunicorn_options_preload_model()
+
+if __name__ == "__main__":
+    main()
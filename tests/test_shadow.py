@@ -0,0 +1,173 @@
+import time
+import logging
+import threading
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from src.deployment.batching import score_frame
+from src.ingestion.local_storage import LocalBlobServiceClient
+from src.modeling import shadow
+from src.modeling.shadow import ShadowScorer, load_candidates, read_shadow_log, shadow_report
+from src.monitoring.metrics import MetricsRegistry
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+FEATURES = ["amount", "transaction_hour", "high_transaction"]
+
+def create_training_data(rows=2000, seed=0):
+    """Feature rows with a fraud label driven by the amount."""
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({
+        "amount": rng.lognormal(4, 1, rows).round(2),
+        "transaction_hour": rng.integers(0, 24, rows),
+        "high_transaction": rng.integers(0, 2, rows),
+    })
+    return data, (data["amount"] > 150).astype(int)
+
+def train(X, y, n_estimators=5, seed=0):
+    """Fit a small forest for scoring tests."""
+    return RandomForestClassifier(n_estimators=n_estimators, random_state=seed).fit(X, y)
+
+class BlockingModel:
+    """Candidate whose predict_proba waits until released, standing in for a slow model."""
+
+    def __init__(self, model):
+        self.model = model
+        self.classes_ = model.classes_
+        self.release = threading.Event()
+
+    def predict_proba(self, frame):
+        self.release.wait(10)
+        return self.model.predict_proba(frame)
+
+def test_shadow_log_reports_agreement(tmp_path):
+    """Test that every candidate is logged per row and compared with the live model."""
+    X, y = create_training_data()
+    live = train(X, y)
+    candidates = [("same", live), ("inverted", train(X, 1 - y, seed=1)), ("broken", train(X.assign(merchant_risk_score=0.5), y))]
+    scorer = ShadowScorer(candidates, "test", str(tmp_path), flush_rows=250, registry=MetricsRegistry())
+    frame = X.head(1000).assign(transaction_id=[f"t{i}" for i in range(1000)])
+    for start in range(0, 1000, 100):
+        batch = frame.iloc[start:start + 100]
+        labels, scores = score_frame(live, batch[FEATURES])
+        assert scorer.submit(batch, labels, scores, 0.001, live.classes_)
+    scorer.close()
+
+    assert len(scorer.log.paths) == 4, "Segments should be written every 250 rows, plus the remainder on close."
+    columns = read_shadow_log(scorer.log.paths)
+    assert list(columns["transaction_id"][:3]) == ["t0", "t1", "t2"] and columns["labels"].dtype == np.int8
+    report = shadow_report(columns)
+    assert report["rows"] == 1000 and report["batches"] == 10
+    assert report["candidates"]["same"]["agreement"] == 1.0 and report["candidates"]["same"]["new_flags"] == 0
+    assert report["candidates"]["inverted"]["agreement"] < 0.1
+    # The candidate that cannot score the shared frame is logged as failed without stopping the others
+    assert report["candidates"]["broken"]["errors"] == 1000 and report["candidates"]["broken"]["agreement"] is None
+    assert report["live"]["latency_ms"]["batch_p50"] == 1.0
+
+def test_live_labels_use_the_models_fraud_class(tmp_path):
+    """Test that the live column marks fraud by the live model's classes_, and a later change to the frame is not seen."""
+    X, y = create_training_data(500)
+    live = train(X, 2 * y)
+    scorer = ShadowScorer([("same", live)], "test", str(tmp_path), registry=MetricsRegistry())
+    batch = X.head(200).assign(transaction_id=[f"t{i}" for i in range(200)])
+    labels, scores = score_frame(live, batch[FEATURES])
+    assert scorer.submit(batch, labels, scores, 0.001, live.classes_)
+    batch["transaction_id"] = "changed"
+    scorer.close()
+
+    columns = read_shadow_log(scorer.log.paths)
+    assert columns["labels"][:, 0].sum() == np.count_nonzero(labels == 2) > 0
+    assert shadow_report(columns)["candidates"]["same"]["agreement"] == 1.0
+    assert columns["transaction_id"][0] == "t0"
+
+def test_slow_candidate_stays_off_the_request_path(tmp_path):
+    """Test that submit returns while the candidate is busy, and batches beyond max_pending are dropped."""
+    X, y = create_training_data(500)
+    live = train(X, y)
+    slow = BlockingModel(live)
+    registry = MetricsRegistry()
+    scorer = ShadowScorer([("slow", slow)], "test", str(tmp_path), max_pending=2, registry=registry)
+    labels, scores = score_frame(live, X.head(10))
+
+    started = time.perf_counter()
+    accepted = [scorer.submit(X.head(10), labels, scores, 0.001, live.classes_) for _ in range(3)]
+    assert time.perf_counter() - started < 0.5
+    assert accepted == [True, True, False]
+    assert registry.counter_value("fraud_shadow_dropped_total", service="test") == 10
+    slow.release.set()
+    scorer.close()
+    assert registry.counter_value("fraud_shadow_rows_total", service="test", model="slow") == 20
+
+def test_load_candidates_from_files_and_blobs(tmp_path, monkeypatch):
+    """Test that candidates load from local paths or blob names and get distinct names."""
+    monkeypatch.chdir(tmp_path)
+    X, y = create_training_data(500)
+    joblib.dump(train(X, y), tmp_path / "fraud_v2.pkl")
+    storage = LocalBlobServiceClient(str(tmp_path / "blob"))
+    with open(tmp_path / "fraud_v2.pkl", "rb") as model_file:
+        storage.get_blob_client(container="fraud-events", blob="candidates/fraud_v2.pkl").upload_blob(model_file.read())
+
+    candidates = load_candidates([str(tmp_path / "fraud_v2.pkl"), "candidates/fraud_v2.pkl", "missing.pkl"], storage)
+    assert [name for name, _ in candidates] == ["fraud_v2", "fraud_v2_1"]
+    assert all(hasattr(model, "predict_proba") for _, model in candidates)
+    assert (tmp_path / "shadow_candidates" / "candidates" / "fraud_v2.pkl").is_file()
+
+def test_blob_candidate_does_not_replace_the_live_model(tmp_path, monkeypatch):
+    """Test that a candidate blob named like the live model is downloaded outside the working directory."""
+    monkeypatch.chdir(tmp_path)
+    X, y = create_training_data(500)
+    (tmp_path / "fraud_detection_model.pkl").write_bytes(b"live model")
+    storage = LocalBlobServiceClient(str(tmp_path / "blob"))
+    joblib.dump(train(X, y), tmp_path / "candidate.pkl")
+    storage.get_blob_client(container="fraud-events", blob="candidates/fraud_detection_model.pkl").upload_blob(
+        (tmp_path / "candidate.pkl").read_bytes())
+
+    candidates = load_candidates(["candidates/fraud_detection_model.pkl", "../fraud_detection_model.pkl"], storage,
+                                 candidate_dir=str(tmp_path / "downloads"))
+    assert [name for name, _ in candidates] == ["fraud_detection_model"]
+    assert (tmp_path / "fraud_detection_model.pkl").read_bytes() == b"live model"
+    assert (tmp_path / "downloads" / "candidates" / "fraud_detection_model.pkl").is_file()
+
+def test_predict_consumer_shadows_candidates(tmp_path, monkeypatch):
+    """Test that the predict consumer hands its decoded frame to the candidates and the log keeps transaction ids."""
+    from src.modeling import predict
+
+    monkeypatch.chdir(tmp_path)
+    X, y = create_training_data(500)
+    live = train(X, y)
+    shadow.set_shadow_candidates([("candidate", train(X, y, n_estimators=3, seed=2))])
+    try:
+        for i, row in enumerate(X.head(20).to_dict(orient="records")):
+            predict.predict_event(live, {"transaction_id": f"tx{i}", **row})
+        scorer = shadow.get_shadow_scorer(predict.SERVICE_NAME)
+    finally:
+        shadow.set_shadow_candidates([])
+    assert shadow.get_shadow_scorer(predict.SERVICE_NAME) is None
+
+    columns = read_shadow_log(scorer.log.paths)
+    assert sorted(columns["transaction_id"]) == sorted(f"tx{i}" for i in range(20))
+    assert list(columns["models"]) == ["live", "candidate"] and (columns["labels"] >= 0).all()
+
+def test_shadow_report_counts_flag_changes():
+    """Test that the report separates alerts a candidate adds from live alerts it drops."""
+    columns = {
+        "models": np.array(["live", "candidate"]),
+        "transaction_id": np.array(["a", "b", "c", "d"]),
+        "labels": np.array([[1, 1], [1, 0], [0, 1], [0, 0]], dtype=np.int8),
+        "scores": np.array([[0.9, 0.8], [0.7, 0.4], [0.2, 0.6], [0.1, 0.1]], dtype=np.float32),
+        "latency_ms": np.array([[2.0, 4.0]], dtype=np.float32),
+        "batch_size": np.array([4], dtype=np.int32),
+    }
+    entry = shadow_report(columns)["candidates"]["candidate"]
+    assert entry["agreement"] == 0.5 and entry["new_flags"] == 1 and entry["dropped_flags"] == 1
+    assert entry["flagged_rate"] == 0.5 and abs(entry["score_mean_abs_diff"] - 0.2) < 1e-6
+    assert entry["latency_ms"]["per_row_mean"] == 1.0
+
+def main():
+    """Main function to execute the shadow scoring tests that need no temporary directory."""
+    test_shadow_report_counts_flag_changes()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import sqlite3
+import logging
+import threading
+import pandas as pd
+import pytest
+from src.processing import sql_sink
+from src.processing.sql_sink import AzureSqlDialect, ConnectionPool, SqlSink
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def read_table(path, table="ProcessedTransactions"):
+    """Read the sink's table back as a DataFrame indexed by transaction_id."""
+    with sqlite3.connect(path) as conn:
+        return pd.read_sql_query(f'SELECT * FROM "{table}"', conn).set_index("transaction_id").sort_index()
+
+def create_transactions(rows=50):
+    """Cleaned transactions in the raw event schema."""
+    return pd.DataFrame({
+        "transaction_id": range(1, rows + 1),
+        "timestamp": pd.date_range("2024-10-10 08:00", periods=rows, freq="min"),
+        "user_id": [str(12345 + i % 7) for i in range(rows)],
+        "amount": [100.0 + i for i in range(rows)],
+        "currency": ["USD"] * rows,
+        "merchant_id": [f"merchant_{i % 5:03d}" for i in range(rows)],
+        "is_fraud": [i % 10 == 0 for i in range(rows)],
+    })
+
+def test_upserts_are_idempotent_and_only_set_given_columns(tmp_path):
+    """Test that re-writing rows updates them in place and fraud results keep the cleaned columns."""
+    path = str(tmp_path / "sink.db")
+    sink = SqlSink(f"sqlite:///{path}", batch_rows=7)
+    transactions = create_transactions()
+    assert sink.write(transactions) == 50
+    assert sink.write(transactions) == 50
+    results = pd.DataFrame({"transaction_id": [1, 2, 99], "fraud_prediction": [1, 0, 1], "fraud_score": [0.9, 0.1, None]})
+    sink.write(results)
+    sink.close()
+
+    table = read_table(path)
+    assert len(table) == 51, "Re-written rows must not be duplicated."
+    assert table.loc["1", "amount"] == 100.0 and table.loc["1", "fraud_prediction"] == 1
+    assert pd.isna(table.loc["3", "fraud_prediction"]) and pd.isna(table.loc["99", "amount"])
+    assert table.loc["10", "timestamp"] == "2024-10-10T08:09:00.000000" and table.loc["11", "is_fraud"] == 1
+
+def test_repeated_ids_in_a_batch_keep_the_last_row(tmp_path):
+    """Test that duplicate transaction_ids in one frame, and rows without one, are handled before writing."""
+    path = str(tmp_path / "sink.db")
+    sink = SqlSink(f"sqlite:///{path}")
+    frame = pd.DataFrame({"transaction_id": [1, 2, 1, None], "amount": [1.0, 2.0, 3.0, 4.0]})
+    assert sink.write(frame) == 2
+    sink.close()
+    table = read_table(path)
+    assert list(table.index) == ["1", "2"] and table.loc["1", "amount"] == 3.0
+
+def test_concurrent_writers_share_a_bounded_pool(tmp_path):
+    """Test that concurrent writes never open more connections than the pool size and all rows land."""
+    path = str(tmp_path / "sink.db")
+    sink = SqlSink(f"sqlite:///{path}", batch_rows=10, pool_size=2)
+    transactions = create_transactions(400)
+    errors = []
+
+    def write(frame):
+        try:
+            sink.write(frame)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(transactions.iloc[start:start + 50],))
+               for start in range(0, 400, 50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    sink.close()
+    assert not errors, f"Writers failed: {errors}"
+    assert sink.pool.opened <= 2
+    assert len(read_table(path)) == 400
+
+def test_pool_times_out_and_recovers_failed_connections():
+    """Test that an exhausted pool raises after its timeout and a failed unit of work is rolled back."""
+    pool = ConnectionPool(lambda: sqlite3.connect(":memory:", check_same_thread=False), size=1, timeout=0.05)
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.commit()
+        with pytest.raises(TimeoutError):
+            with pool.connection():
+                pass
+    with pytest.raises(sqlite3.OperationalError):
+        with pool.connection() as conn:
+            conn.execute("INSERT INTO t VALUES (1)")
+            conn.execute("INSERT INTO missing VALUES (1)")
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0, "The failed insert was not rolled back."
+    assert pool.opened == 1
+    pool.close()
+
+def test_azure_sql_merge_statement():
+    """Test that Azure SQL rows are merged on transaction_id and only the given columns are updated."""
+    statement = AzureSqlDialect("Driver={ODBC Driver 18 for SQL Server};").upsert_sql(
+        "ProcessedTransactions", ["transaction_id", "fraud_prediction", "updated_at"])
+    assert statement.startswith("MERGE [ProcessedTransactions] WITH (HOLDLOCK) AS t")
+    assert "ON t.[transaction_id] = s.[transaction_id]" in statement
+    assert "UPDATE SET t.[fraud_prediction] = s.[fraud_prediction], t.[updated_at] = s.[updated_at]" in statement
+    assert "[amount]" not in statement
+
+def test_save_to_sql_without_a_database(monkeypatch):
+    """Test that saving is a no-op that succeeds when SQL_CONNECTION_STRING is unset."""
+    monkeypatch.setattr(sql_sink, "SQL_CONNECTION_STRING", None)
+    monkeypatch.setattr(sql_sink, "SQL_SINK", None)
+    assert sql_sink.save_to_sql(create_transactions(3)) is True
+    assert sql_sink.get_sql_sink() is None
+
+def main():
+    """Main function to execute the SQL sink tests that need no temporary directory."""
+    test_pool_times_out_and_recovers_failed_connections()
+    test_azure_sql_merge_statement()
+
+if __name__ == "__main__":
+    main()